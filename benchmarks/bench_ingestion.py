@@ -0,0 +1,159 @@
+"""End-to-end scaling benchmark of the CSAF ingestion.
+
+    For every scale point a synthetic corpus (see synthetic_csaf.py) is written and run
+    through the stages
+
+        sources   get_csaf_sources
+        flatten   process_csaf_sources
+        vendor    PrecleaningVendor (audit off)
+        product   clean_dataframe_product
+        version   clean_dataframe_version and clean_dataframe_version_range
+
+    Every scale point runs in a new process, so the peak RSS (resource.getrusage) belongs to
+    this scale point only. Reported are the time per stage, documents/s and rows/s of the
+    whole pipeline and the peak RSS. Everything runs offline.
+
+    Run from the repository root:
+
+        python -m benchmarks.bench_ingestion --scales 1000 10000 100000 --output ingestion.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import resource
+import tempfile
+import multiprocessing
+from benchmarks.bench_strings import git_commit
+from benchmarks.synthetic_csaf import write_corpus, BRANCH_LEVELS
+from benchmarks.synthetic_csaf import DEFAULT_BRANCH_DEPTH, DEFAULT_VENDOR_COUNT
+from benchmarks.synthetic_csaf import DEFAULT_PRODUCT_FANOUT, DEFAULT_PAYLOAD_SIZE, DEFAULT_SEED
+
+# Number of documents per scale point
+DEFAULT_SCALES = [1000, 10000, 100000]
+# Stages of the pipeline in the order of execution
+STAGES = ["sources", "flatten", "vendor", "product", "version"]
+
+
+def run_pipeline(corpus_dir: str):
+    """
+    Runs the ingestion stages on a corpus and measures the time per stage.
+
+    Returns:
+    - result: dict with documents, rows, time per stage (seconds) and the frame after the
+      last stage
+    """
+    # imported here, so the import time is not part of the first stage
+    from process_csaf_files import get_csaf_sources, process_csaf_sources
+    from string_normalization import PrecleaningVendor, clean_dataframe_product
+    from string_normalization import clean_dataframe_version, clean_dataframe_version_range
+
+    timings = {}
+    start = time.perf_counter()
+    sources = get_csaf_sources(corpus_dir)
+    timings["sources"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = process_csaf_sources(sources)
+    timings["flatten"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = PrecleaningVendor(df, audit="off").result
+    timings["vendor"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = clean_dataframe_product(df)
+    timings["product"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = clean_dataframe_version(df)
+    df = clean_dataframe_version_range(df)
+    timings["version"] = time.perf_counter() - start
+    return {"docs": len(sources), "rows": len(df), "stages_s": timings, "df": df}
+
+
+def run_scale_point(docs: int, corpus_root: str = None, **corpus_options):
+    """
+    Writes a corpus of docs documents and runs the pipeline on it.
+
+    Parameters:
+    - docs: int, number of documents
+    - corpus_root: str, directory of the corpora (kept for later runs), a temporary
+      directory if None
+    - corpus_options: parameters of write_corpus (branch_depth, vendor_count, ...)
+
+    Returns:
+    - result: dict with the measurements of the scale point
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = os.path.join(corpus_root or temp_dir, f"csaf_{docs}")
+        start = time.perf_counter()
+        if not os.path.isdir(corpus_dir):
+            write_corpus(corpus_dir, docs, **corpus_options)
+        generate_s = time.perf_counter() - start
+        result = run_pipeline(corpus_dir)
+    result.pop("df")
+    total = sum(result["stages_s"].values())
+    result.update({
+        "generate_s": generate_s,
+        "total_s": total,
+        "docs_per_s": result["docs"] / total if total else None,
+        "rows_per_s": result["rows"] / total if total else None,
+        # ru_maxrss is given in KiB on Linux
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+    return result
+
+
+def _run_in_process(docs: int, corpus_root: str, corpus_options: dict):
+    """Runs a scale point in a new process (own peak RSS)."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_scale_point, (docs, corpus_root), corpus_options)
+
+
+def main(argv: list = None):
+    """Command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="number of documents per scale point")
+    parser.add_argument("--branch-depth", type=int, choices=sorted(BRANCH_LEVELS),
+                        default=DEFAULT_BRANCH_DEPTH)
+    parser.add_argument("--vendors", type=int, default=DEFAULT_VENDOR_COUNT)
+    parser.add_argument("--fanout", type=int, default=DEFAULT_PRODUCT_FANOUT)
+    parser.add_argument("--payload", type=int, default=DEFAULT_PAYLOAD_SIZE)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--corpus-root", help="keep the corpora in this directory")
+    parser.add_argument("--output", help="result file (json)")
+    args = parser.parse_args(argv)
+
+    corpus_options = {"branch_depth": args.branch_depth, "vendor_count": args.vendors,
+                      "product_fanout": args.fanout, "payload_size": args.payload,
+                      "seed": args.seed}
+    report = {"meta": {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "commit": git_commit(), "python": platform.python_version(),
+                       "platform": platform.platform(), "cpus": os.cpu_count(),
+                       **corpus_options},
+              "results": {}}
+    print(f"{'docs':>8} {'rows':>9} " + " ".join(f"{stage:>9}" for stage in STAGES)
+          + f" {'docs/s':>9} {'rows/s':>10} {'RSS MiB':>9}")
+    for docs in args.scales:
+        result = _run_in_process(docs, args.corpus_root, corpus_options)
+        report["results"][str(docs)] = result
+        print(f"{result['docs']:>8} {result['rows']:>9} "
+              + " ".join(f"{result['stages_s'][stage]:>8.2f}s" for stage in STAGES)
+              + f" {result['docs_per_s']:>9.1f} {result['rows_per_s']:>10.1f}"
+              f" {result['peak_rss_mib']:>9.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""Microbenchmarks of StringMiner, StringChecker and StringSynonym.
+
+    Every method is called for all inputs of a data set: the test strings of the modules
+    (nmap annotations, manual strings and CSAF sentences of string_miner.py, the check strings of
+    string_checker.py, the synonym cases of test/synonym_test_ref.txt) and synthetic strings.
+    The time per call is measured with time.perf_counter over several repeats, the peak memory
+    of one pass with tracemalloc. The results are written as JSON, so runs can be compared.
+
+    Run from the repository root:
+
+        python -m benchmarks.bench_strings --synthetic 200 --output results.json
+        python -m benchmarks.bench_strings --compare results_old.json results.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import datetime
+import statistics
+import subprocess
+import tracemalloc
+
+# Number of timed passes per benchmark
+DEFAULT_REPEAT = 5
+# Number of synthetic strings per data set
+DEFAULT_SYNTHETIC_SIZE = 100
+# Seed of the synthetic strings, the same seed gives the same strings
+DEFAULT_SEED = 0
+# Directory of the result files
+DEFAULT_RESULT_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Ratio of the median time per call (new / old) reported as regression
+REGRESSION_THRESHOLD = 1.1
+# Reference results of the synonym test cases
+SYNONYM_REF_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "test", "synonym_test_ref.txt")
+# Line of the reference file: 'test string' -> 'master word'
+SYNONYM_REF_LINE = re.compile(r"^'(.*)' -> '(.*)'$")
+
+# Building blocks of the synthetic strings
+SYNTHETIC_VENDORS = ["Siemens", "SIEMENS AG", "Phoenix Contact", "PxC", "Beckhoff", "ABB",
+                     "Schneider Electric", "Rockwell Automation", "WAGO", "Hirschmann"]
+SYNTHETIC_FAMILIES = ["SIMATIC S7-1200", "SIMATIC S7-1500", "SIMATIC S7-400", "SCALANCE X-200",
+                      "SCALANCE SC-600", "RUGGEDCOM RM1224", "AXC F 2152", "AXL F BK PN",
+                      "CX9020", "ET 200SP", "LOGO! 8", "PLCnext"]
+SYNTHETIC_TEMPLATES = ["annotation: {family}    {article}    {digit} V{version}\x00",
+                       "{vendor} {family} ({article})",
+                       "{family} V{version}",
+                       "Vulnerabilities in {family} before V{version}",
+                       "{vendor} has released an update for {family} ({article})"]
+
+
+def synthetic_article():
+    """Random article number like 6ES7 212-1AE40-0XB0."""
+    chars = "ABCDEFGHJKLMNPQRSTUVWXYZ0123456789"
+    return (f"6ES7 {random.randint(100, 999)}-{random.randint(1, 9)}"
+            f"{''.join(random.choices(chars, k=4))}-0{''.join(random.choices(chars, k=3))}")
+
+
+def add_typo(text: str):
+    """Swaps, drops or replaces one random character of the text."""
+    if len(text) < 2:
+        return text
+    position = random.randrange(len(text) - 1)
+    kind = random.choice(["swap", "drop", "replace"])
+    if kind == "swap":
+        return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+    if kind == "drop":
+        return text[:position] + text[position + 1:]
+    return text[:position] + random.choice("abcdefghijklmnopqrstuvwxyz") + text[position + 1:]
+
+
+def synthetic_strings(size: int = DEFAULT_SYNTHETIC_SIZE, seed: int = DEFAULT_SEED,
+                      typo_rate: float = 0.3):
+    """
+    Generates product strings like nmap annotations, product names and CSAF titles.
+
+    Parameters:
+    - size: int, number of strings
+    - seed: int, seed of the random generator
+    - typo_rate: float, share of the strings with a typo
+
+    Returns:
+    - strings: list of str
+    """
+    random.seed(seed)
+    strings = []
+    for _ in range(size):
+        text = random.choice(SYNTHETIC_TEMPLATES).format(
+            vendor=random.choice(SYNTHETIC_VENDORS), family=random.choice(SYNTHETIC_FAMILIES),
+            article=synthetic_article(), digit=random.randint(0, 9),
+            version=".".join(str(random.randint(0, 12)) for _ in range(3)))
+        strings.append(add_typo(text) if random.random() < typo_rate else text)
+    return strings
+
+
+def synthetic_words(size: int = DEFAULT_SYNTHETIC_SIZE, seed: int = DEFAULT_SEED):
+    """Generates single vendor and family words, partially with typos (spell checking)."""
+    random.seed(seed)
+    words = [word for text in SYNTHETIC_VENDORS + SYNTHETIC_FAMILIES for word in text.split()]
+    return [add_typo(word) if random.random() < 0.5 else word
+            for word in random.choices(words, k=size)]
+
+
+def synthetic_vendors(size: int = DEFAULT_SYNTHETIC_SIZE, seed: int = DEFAULT_SEED):
+    """Generates vendor names with legal forms and typos (synonym normalization)."""
+    random.seed(seed)
+    suffixes = ["", " GmbH", " AG", " Inc.", " & Co. KG", ".com"]
+    return [(add_typo(vendor) if random.random() < 0.3 else vendor) + random.choice(suffixes)
+            for vendor in random.choices(SYNTHETIC_VENDORS, k=size)]
+
+
+def read_synonym_reference(path: str = SYNONYM_REF_FILE):
+    """
+    Reads the expected master words of the synonym test cases.
+
+    Returns:
+    - reference: list of (test string, master word) in the order of TEST_SYNONYM_CASES
+    """
+    reference = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            match = SYNONYM_REF_LINE.match(line.rstrip("\n"))
+            if match:
+                reference.append(match.groups())
+    return reference
+
+
+def measure(func, inputs: list, repeat: int = DEFAULT_REPEAT):
+    """
+    Times func for every input and measures the peak memory of one pass.
+
+    One untimed pass warms up caches (e.g. the compiled patterns of the regex module).
+
+    Returns:
+    - result: dict with the number of calls, the time per pass and per call (in
+      microseconds) and the peak memory of one pass (in KiB)
+    """
+    for value in inputs:
+        func(value)
+    pass_times, call_times = [], []
+    for _ in range(repeat):
+        start_pass = time.perf_counter()
+        for value in inputs:
+            start = time.perf_counter()
+            func(value)
+            call_times.append(time.perf_counter() - start)
+        pass_times.append(time.perf_counter() - start_pass)
+    tracemalloc.start()
+    for value in inputs:
+        func(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    call_times_us = sorted(value * 1e6 for value in call_times)
+    return {
+        "calls": len(inputs),
+        "repeat": repeat,
+        "pass_s": {"min": min(pass_times), "median": statistics.median(pass_times)},
+        "per_call_us": {"min": call_times_us[0],
+                        "median": statistics.median(call_times_us),
+                        "mean": statistics.fmean(call_times_us),
+                        "p95": call_times_us[int(0.95 * (len(call_times_us) - 1))]},
+        "peak_memory_kib": peak / 1024,
+    }
+
+
+def _miner_cases(size: int, seed: int):
+    """Benchmark cases of StringMiner (component, method, data set, function, inputs)."""
+    from string_miner import StringMiner, IS_LEV, TEST_NMAP_ANNOTATIONS
+    from string_miner import TEST_MANUAL_STRINGS, TEST_CSAF_SENTENCES
+    miner = StringMiner()
+    datasets = {"nmap": TEST_NMAP_ANNOTATIONS, "manual": TEST_MANUAL_STRINGS,
+                "csaf": TEST_CSAF_SENTENCES, "synthetic": synthetic_strings(size, seed)}
+    methods = {"match": miner.match,
+               "match_fuzzy": lambda text: miner.match_fuzzy(text, max_errors=1)}
+    if IS_LEV:
+        methods["match_levenshtein"] = miner.match_levenshtein
+    cases = [("StringMiner", method, dataset, func, inputs)
+             for method, func in methods.items() for dataset, inputs in datasets.items()]
+    skipped = {} if IS_LEV else {"StringMiner.match_levenshtein": "Levenshtein not installed"}
+    return cases, skipped
+
+
+def _checker_cases(size: int, seed: int):
+    """Benchmark cases of StringChecker."""
+    from string_checker import StringChecker, TEST_CHECKER_STRINGS
+    checker = StringChecker()
+    words = synthetic_words(size, seed)
+    cases = []
+    for method, inputs in TEST_CHECKER_STRINGS.items():
+        cases.append(("StringChecker", method, "examples", getattr(checker, method), inputs))
+        cases.append(("StringChecker", method, "synthetic", getattr(checker, method), words))
+    return cases, {}
+
+
+def _synonym_cases(size: int, seed: int):
+    """Benchmark cases of StringSynonym."""
+    from string_synonym import StringSynonym, TEST_SYNONYM_CASES
+    synonym = StringSynonym()
+    cases = [("StringSynonym", "normalize", "reference",
+              lambda case: synonym.normalize(*case), TEST_SYNONYM_CASES),
+             ("StringSynonym", "normalize", "synthetic",
+              lambda vendor: synonym.normalize(vendor, "Manufacturer"),
+              synthetic_vendors(size, seed))]
+    return cases, {}
+
+
+def check_synonym_reference():
+    """
+    Share of the synonym test cases returning the master word of test/synonym_test_ref.txt.
+
+    Returns:
+    - result: dict with the number of cases, the number of matching results and the cases
+      with a different result
+    """
+    from string_synonym import StringSynonym, TEST_SYNONYM_CASES
+    synonym = StringSynonym()
+    reference = read_synonym_reference()
+    differences = []
+    for (test_str, specific_dict), (ref_str, expected) in zip(TEST_SYNONYM_CASES, reference):
+        result = synonym.normalize(test_str, specific_dict)
+        if ref_str != test_str or result != expected:
+            differences.append({"test_str": test_str, "specific_dict": specific_dict,
+                                "expected": expected, "result": result})
+    return {"cases": len(reference), "matching": len(reference) - len(differences),
+            "differences": differences}
+
+
+def git_commit():
+    """Commit of the repository or None."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(components: list = None, repeat: int = DEFAULT_REPEAT,
+                   size: int = DEFAULT_SYNTHETIC_SIZE, seed: int = DEFAULT_SEED):
+    """
+    Runs the benchmarks of the components.
+
+    Parameters:
+    - components: list, names of the components (default: all)
+    - repeat: int, number of timed passes
+    - size: int, number of synthetic strings per data set
+    - seed: int, seed of the synthetic strings
+
+    Returns:
+    - report: dict with meta data, results per "<component>.<method>/<data set>" and skipped
+      benchmarks with the reason (e.g. missing package or data file)
+    """
+    loaders = {"StringMiner": _miner_cases, "StringChecker": _checker_cases,
+               "StringSynonym": _synonym_cases}
+    report = {"meta": {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "commit": git_commit(), "python": platform.python_version(),
+                       "platform": platform.platform(), "repeat": repeat,
+                       "synthetic_size": size, "seed": seed},
+              "results": {}, "skipped": {}}
+    for component in components or list(loaders):
+        try:
+            cases, skipped = loaders[component](size, seed)
+        except Exception as e:  # missing optional package or data file
+            report["skipped"][component] = f"{type(e).__name__}: {e}"
+            print(f"{component} skipped: {report['skipped'][component]}")
+            continue
+        report["skipped"].update(skipped)
+        for component_name, method, dataset, func, inputs in cases:
+            key = f"{component_name}.{method}/{dataset}"
+            report["results"][key] = measure(func, inputs, repeat)
+            print(f"{key:<55} {report['results'][key]['per_call_us']['median']:>12.1f} us/call "
+                  f"{report['results'][key]['peak_memory_kib']:>10.1f} KiB")
+        if component == "StringSynonym":
+            report["synonym_reference"] = check_synonym_reference()
+    return report
+
+
+def compare(old: dict, new: dict, threshold: float = REGRESSION_THRESHOLD):
+    """
+    Compares the median time per call of two reports.
+
+    Returns:
+    - regressions: list of the keys with a ratio new / old above the threshold
+    """
+    regressions = []
+    print(f"{'benchmark':<55} {'old us':>10} {'new us':>10} {'ratio':>7}")
+    for key in sorted(set(old["results"]) | set(new["results"])):
+        if key not in old["results"] or key not in new["results"]:
+            print(f"{key:<55} only in {'new' if key in new['results'] else 'old'} report")
+            continue
+        old_us = old["results"][key]["per_call_us"]["median"]
+        new_us = new["results"][key]["per_call_us"]["median"]
+        ratio = new_us / old_us if old_us else float("inf")
+        flag = " REGRESSION" if ratio > threshold else ""
+        if flag:
+            regressions.append(key)
+        print(f"{key:<55} {old_us:>10.1f} {new_us:>10.1f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main(argv: list = None):
+    """Command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--components", nargs="+",
+                        choices=["StringMiner", "StringChecker", "StringSynonym"])
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--synthetic", type=int, default=DEFAULT_SYNTHETIC_SIZE,
+                        help="number of synthetic strings per data set")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="result file (default: results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, "r", encoding="utf-8") as file:
+                reports.append(json.load(file))
+        return 1 if compare(*reports, threshold=args.threshold) else 0
+
+    report = run_benchmarks(args.components, args.repeat, args.synthetic, args.seed)
+    output = args.output or os.path.join(
+        DEFAULT_RESULT_DIR, f"{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Generator of synthetic CSAF documents for the ingestion benchmarks.
+
+    The documents satisfy the checks of process_csaf_files.py (document, product_tree and
+    vulnerabilities) and use the branch categories of the flattened frame (vendor,
+    product_family, product_name, product_version). Vendor names are written in several
+    spellings (legal forms, upper case, domains), so the vendor cleaning has work to do.
+
+    python -m benchmarks.synthetic_csaf <directory> --docs 1000
+"""
+
+import os
+import json
+import gzip
+import random
+import argparse
+
+# Number of documents
+DEFAULT_DOCS = 1000
+# Depth of the branches: 2 = vendor/product_name, 3 adds product_version, 4 adds product_family
+DEFAULT_BRANCH_DEPTH = 4
+# Number of distinct vendors (before the spelling variants)
+DEFAULT_VENDOR_COUNT = 50
+# Maximum number of child branches per branch below the vendor
+DEFAULT_PRODUCT_FANOUT = 3
+# Size of the vulnerability notes per document in bytes
+DEFAULT_PAYLOAD_SIZE = 2000
+# Seed of the generator, the same seed gives the same corpus
+DEFAULT_SEED = 0
+# Branch categories from the top to the leaf per branch depth
+BRANCH_LEVELS = {2: ["vendor", "product_name"],
+                 3: ["vendor", "product_name", "product_version"],
+                 4: ["vendor", "product_family", "product_name", "product_version"]}
+# Building blocks of the names
+VENDOR_STEMS = ["Siemens", "Phoenix Contact", "Schneider Electric", "Rockwell Automation",
+                "Beckhoff", "ABB", "WAGO", "Hirschmann", "Moxa", "Mitsubishi Electric",
+                "Honeywell", "Emerson", "Yokogawa", "Bosch Rexroth", "Pilz", "Festo"]
+VENDOR_SPELLINGS = ["{stem}", "{stem} AG", "{stem} GmbH", "{upper}", "{stem} Inc.",
+                    "{stem} GmbH & Co. KG", "www.{domain}.com", "{stem} (Germany)"]
+FAMILY_STEMS = ["SIMATIC", "SCALANCE", "RUGGEDCOM", "SINEC", "AXC", "PLCnext", "Modicon",
+                "ControlLogix", "CX", "ET", "LOGO!", "SENTRON", "SIPROTEC", "MELSEC"]
+WORDS = ["attacker", "remote", "could", "exploit", "vulnerability", "device", "firmware",
+         "denial", "service", "memory", "buffer", "overflow", "authentication", "bypass",
+         "affected", "update", "version", "network", "access", "web", "server", "the", "to"]
+
+
+def vendor_names(vendor_count: int, rng: random.Random):
+    """Vendor names with spelling variants, several names belong to the same vendor."""
+    names = []
+    for index in range(vendor_count):
+        stem = VENDOR_STEMS[index % len(VENDOR_STEMS)]
+        if index >= len(VENDOR_STEMS):
+            stem = f"{stem} {index // len(VENDOR_STEMS)}"
+        spelling = rng.choice(VENDOR_SPELLINGS)
+        names.append(spelling.format(stem=stem, upper=stem.upper(),
+                                     domain=stem.lower().replace(" ", "-")))
+    return names
+
+
+def _branch(levels: list, level: int, name: str, fanout: int, rng: random.Random,
+            product_ids: list, parents: list):
+    """Branch of the given level with random children down to the leaf products."""
+    branch = {"category": levels[level], "name": name}
+    if level == len(levels) - 1:
+        product_id = f"CSAFPID-{len(product_ids) + 1:04d}"
+        product_ids.append(product_id)
+        branch["product"] = {"name": " ".join(parents + [name]), "product_id": product_id}
+        if rng.random() < 0.5:
+            branch["product"]["product_identification_helper"] = {
+                "model_numbers": [f"6ES7 {rng.randint(100, 999)}-{rng.randint(1, 9)}"
+                                  f"AE{rng.randint(10, 99)}-0XB0"]}
+        return branch
+    children = []
+    for _ in range(rng.randint(1, fanout)):
+        child = levels[level + 1]
+        if child == "product_family":
+            child_name = f"{rng.choice(FAMILY_STEMS)} {rng.choice('SXMCP')}{rng.randint(1, 9)}"
+        elif child == "product_name":
+            child_name = f"{rng.choice(FAMILY_STEMS)} {rng.choice('SXMCP')}" \
+                         f"{rng.randint(1, 9)}-{rng.randint(100, 1600)}"
+        else:
+            child_name = f"V{rng.randint(1, 12)}.{rng.randint(0, 9)}"
+        children.append(_branch(levels, level + 1, child_name, fanout, rng, product_ids,
+                                parents + [name]))
+    branch["branches"] = children
+    return branch
+
+
+def generate_document(index: int, vendors: list, rng: random.Random,
+                      branch_depth: int = DEFAULT_BRANCH_DEPTH,
+                      product_fanout: int = DEFAULT_PRODUCT_FANOUT,
+                      payload_size: int = DEFAULT_PAYLOAD_SIZE):
+    """
+    Generates one CSAF document.
+
+    Parameters:
+    - index: int, number of the document (used for ids and urls)
+    - vendors: list, vendor names to choose from (see vendor_names)
+    - rng: random.Random, random generator
+    - branch_depth: int, key of BRANCH_LEVELS
+    - product_fanout: int, maximum number of child branches per branch
+    - payload_size: int, size of the vulnerability notes in bytes
+
+    Returns:
+    - document: dict
+    """
+    product_ids = []
+    vendor = rng.choice(vendors)
+    tree = _branch(BRANCH_LEVELS[branch_depth], 0, vendor, product_fanout, rng, product_ids, [])
+    tracking_id = f"SSA-{index:06d}"
+    notes = []
+    while sum(len(note["text"]) for note in notes) < payload_size:
+        notes.append({"category": "description", "title": "Vulnerability Description",
+                      "text": " ".join(rng.choice(WORDS) for _ in range(50))})
+    return {
+        "document": {
+            "category": "csaf_security_advisory",
+            "csaf_version": "2.0",
+            "title": f"Synthetic advisory {tracking_id} for {vendor}",
+            "publisher": {"category": "vendor", "name": vendor.split(" (")[0],
+                          "namespace": "https://example.com"},
+            "references": [{"category": "self", "summary": "CSAF document",
+                            "url": f"https://example.com/csaf/{tracking_id.lower()}.json"}],
+            "tracking": {"id": tracking_id, "status": "final", "version": "1",
+                         "initial_release_date": "2024-01-01T00:00:00Z",
+                         "current_release_date": "2024-01-01T00:00:00Z",
+                         "revision_history": [{"date": "2024-01-01T00:00:00Z",
+                                               "number": "1", "summary": "Initial"}]},
+        },
+        "product_tree": {"branches": [tree]},
+        "vulnerabilities": [{"cve": f"CVE-2024-{index % 100000:05d}", "notes": notes,
+                             "product_status": {"known_affected": product_ids}}],
+    }
+
+
+def write_corpus(directory: str, docs: int = DEFAULT_DOCS,
+                 branch_depth: int = DEFAULT_BRANCH_DEPTH,
+                 vendor_count: int = DEFAULT_VENDOR_COUNT,
+                 product_fanout: int = DEFAULT_PRODUCT_FANOUT,
+                 payload_size: int = DEFAULT_PAYLOAD_SIZE, seed: int = DEFAULT_SEED,
+                 compress: bool = False):
+    """
+    Writes a corpus of synthetic CSAF documents as json files (one per document).
+
+    Parameters:
+    - directory: str, target directory (created if missing)
+    - docs: int, number of documents
+    - compress: bool, write .json.gz files instead of .json files
+    - further parameters see generate_document and vendor_names
+
+    Returns:
+    - paths: list of the written files
+    """
+    rng = random.Random(seed)
+    vendors = vendor_names(vendor_count, rng)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(docs):
+        document = generate_document(index, vendors, rng, branch_depth, product_fanout,
+                                     payload_size)
+        # 1000 files per sub directory, like the yearly folders of CSAF providers
+        path = os.path.join(directory, f"{index // 1000:04d}", f"ssa-{index:06d}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = json.dumps(document).encode("utf-8")
+        if compress:
+            path += ".gz"
+            with gzip.open(path, "wb") as file:
+                file.write(content)
+        else:
+            with open(path, "wb") as file:
+                file.write(content)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--docs", type=int, default=DEFAULT_DOCS)
+    parser.add_argument("--branch-depth", type=int, choices=sorted(BRANCH_LEVELS),
+                        default=DEFAULT_BRANCH_DEPTH)
+    parser.add_argument("--vendors", type=int, default=DEFAULT_VENDOR_COUNT)
+    parser.add_argument("--fanout", type=int, default=DEFAULT_PRODUCT_FANOUT)
+    parser.add_argument("--payload", type=int, default=DEFAULT_PAYLOAD_SIZE)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+    written = write_corpus(args.directory, args.docs, args.branch_depth, args.vendors,
+                           args.fanout, args.payload, args.seed, args.compress)
+    print(f"{len(written)} documents written to {args.directory}")
@@ -1,19 +1,176 @@
 """Module provides functions to look at CSAf file for corpus and for matching."""
 
+import bz2
+import gzip
 import json
+import lzma
 import os
+import tarfile
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+from itertools import groupby
 import pandas as pd
 import numpy as np
 from utils.string_helperfunctions import read_json_file, find_file
 from utils.string_helperfunctions import LogStyle
+from utils.instrumentation import METRICS
 
 # Encoding
 ENCODING = "utf-8"
 
+# Flattened fields of the product_identification_helper (strong identifiers for Modi 1)
+IDENTIFICATION_HELPER_COLUMNS = ["cpe", "purls", "model_numbers", "skus", "serial_numbers",
+                                 "hashes"]
+# Columns added while flattening which are not part of the predefined columns in config.json
+DERIVED_COLUMNS = ["publisher"] + IDENTIFICATION_HELPER_COLUMNS
+# Repetitive columns which are held as categories (dictionary encoded) in the flattened frame
+CATEGORICAL_COLUMNS = ["vendor", "product_family", "product_name", "product_version",
+                       "product_version_range", "data_source", "publisher"]
+# Default location of the flattened CSAF store (parquet dataset)
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(__file__), "test", "df_CSAF")
+# Partition columns of the store: vendor (first branch level) and publisher of the document
+STORE_PARTITION_COLUMNS = ["vendor", "publisher"]
+# Value used for missing partition values, so rows without vendor stay readable by filter
+STORE_MISSING_PARTITION = "None"
+
+# Single compressed json files and the matching decompression
+COMPRESSED_SUFFIXES = {".json.gz": gzip.GzipFile, ".json.xz": lzma.LZMAFile,
+                       ".json.bz2": bz2.BZ2File}
+# Archives containing several (compressed) json files
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.xz", ".txz", ".tar.bz2", ".zip")
+# Separator between path of the archive and path of the member in column path
+ARCHIVE_MEMBER_SEPARATOR = "!/"
+
+
+def is_json_source(file_name: str):
+    '''Check if the file name belongs to a plain or compressed json file.'''
+    return file_name.endswith(".json") or file_name.endswith(tuple(COMPRESSED_SUFFIXES))
+
+
+def split_archive_path(file_path: str):
+    '''Split a path of column path into path of the archive and path of the member.
+
+    Return:
+        (file_path, None) for files which are not part of an archive
+    '''
+    if ARCHIVE_MEMBER_SEPARATOR in file_path:
+        archive, member = file_path.split(ARCHIVE_MEMBER_SEPARATOR, 1)
+        return archive, member
+    return file_path, None
+
+
+def _decompress(stream, file_name: str):
+    '''Wrap a binary stream with the decompression belonging to the file name.'''
+    for suffix, decompressor in COMPRESSED_SUFFIXES.items():
+        if file_name.endswith(suffix):
+            return decompressor(fileobj=stream) if decompressor is gzip.GzipFile \
+                else decompressor(stream)
+    return stream
+
+
+@contextmanager
+def open_csaf_source(file_path: str):
+    '''Open a (compressed) json file or a member of an archive as decompressed binary stream.
+
+    Members of archives are addressed by <path to archive>!/<path of member>.'''
+    archive, member = split_archive_path(file_path)
+    if member is None:
+        with open(file_path, 'rb') as raw, _decompress(raw, file_path) as stream:
+            yield stream
+    elif archive.endswith(".zip"):
+        with zipfile.ZipFile(archive) as zip_file:
+            try:
+                raw = zip_file.open(member)
+            except KeyError as e:
+                raise FileNotFoundError("Could not find the file at: " + file_path) from e
+            with raw, _decompress(raw, member) as stream:
+                yield stream
+    else:
+        with tarfile.open(archive, 'r:*') as tar_file:
+            try:
+                raw = tar_file.extractfile(member)
+            except KeyError as e:
+                raise FileNotFoundError("Could not find the file at: " + file_path) from e
+            with raw, _decompress(raw, member) as stream:
+                yield stream
+
+
+def iter_archive_members(archive_path: str):
+    '''Stream the json members of a tar or zip archive.
+
+    Tar archives are read sequentially, so compressed bundles are decompressed only once.
+
+    Yield:
+        (member path, decompressed binary stream of the member)
+    '''
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir() or not is_json_source(info.filename):
+                    continue
+                with zip_file.open(info) as raw, _decompress(raw, info.filename) as stream:
+                    yield info.filename, stream
+    else:
+        with tarfile.open(archive_path, 'r|*') as tar_file:
+            for info in tar_file:
+                if not info.isfile() or not is_json_source(info.name):
+                    continue
+                with tar_file.extractfile(info) as raw, _decompress(raw, info.name) as stream:
+                    yield info.name, stream
+
+
+def _parse_csaf(stream, file_path: str, log):
+    '''Read json data from a binary stream and check if it is a CSAF document.
+
+    Return:
+        json data as dict or None if the stream is empty, no json or not a CSAF document
+    '''
+    with METRICS.timer("csaf_parse"):
+        return _parse_csaf_content(stream, file_path, log)
+
+
+def _parse_csaf_content(stream, file_path: str, log):
+    '''Read and check the json data of _parse_csaf (without instrumentation).'''
+    try:
+        content = stream.read()
+    except (OSError, EOFError, lzma.LZMAError) as e:
+        log.logger.error('Filepath %s could not be decompressed: %s. File is excluded.',
+                         file_path, e)
+        return None
+    if len(content) == 0:
+        log.logger.debug('Filepath %s lead to a empty json file. File is excluded.', file_path)
+        return None
+    try:
+        dummy = json.loads(content.decode(ENCODING))
+    except (json.decoder.JSONDecodeError, UnicodeDecodeError) as e:
+        log.logger.error('Filepath %s lead to Error: %s. File is excluded. '
+                         ' Check it out.', file_path, e)
+        return None
+    # Check if it is a CSAF file
+    try:
+        dummy1 = dummy.get('document')
+        dummy2 = dummy.get('product_tree')
+        dummy3 = dummy.get('vulnerabilities')
+    except AttributeError as e:
+        log.logger.error('Filepath %s lead to a non CSAF file with Error: %s. '
+                         'File is excluded', file_path, e)
+        return None
+    if None in (dummy1, dummy2, dummy3):
+        log.logger.info('File with path %s fits not the CSAF standard. '
+                        'File is excluded.', file_path)
+        return None
+    return dummy
+
+
 # def process_json_files_in_directory(directory_path):
 def get_csaf_sources(path_directory: str):
     '''Get paths to json source files from a directory and check if it is a CSAF one.
 
+    Besides plain json files, compressed json files (.json.gz, .json.xz, .json.bz2) and
+    the json members of archives (.tar(.gz/.xz/.bz2), .zip) are read without extracting
+    them to disk. Members are recorded as <path to archive>!/<path of member>.
+
     Parameter:
         path_directory:str  path to the directory where the CSAf json files are.
     
@@ -27,72 +184,80 @@ def get_csaf_sources(path_directory: str):
         source = os.path.normpath(source)
         for root, _, files in os.walk(source):
             for file in files:
-                if file.endswith(".json") is False:
-                    log.logger.debug('Filepath %s is not a json file. File is excluded.', file)
-                    continue
+                file_path = os.path.join(root, file)
                 try:
-                    file_path = os.path.join(root, file)
-                    with open(file_path, 'r', encoding=ENCODING) as filename:
-                        #os.path.getsize(fullpathhere) > 0
-                        if os.stat(file_path).st_size == 0:
-                            log.logger.debug('Filepath %s lead to a empty json file. '
-                                             'File is excluded.', file_path)
-                            continue
-                        try:
-                            dummy = json.load(filename)
-                        except json.decoder.JSONDecodeError as e:
-                            log.logger.error('Filepath %s lead to Error: %s. File is excluded. '
-                                             ' Check it out.', file_path, e)
-                        # Check if it is a CSAF file
-                        try:
-                            dummy1 = dummy.get('document')
-                            dummy2 = dummy.get('product_tree')
-                            dummy3 = dummy.get('vulnerabilities')
-                            if None in (dummy1, dummy2, dummy3):
-                                log.logger.info('File with path %s fits not the CSAF standard. '
-                                                'File is excluded.', file_path)
-                            else:
-                                file_list.append([os.path.join(root, file), file])
-                        except (KeyError, json.decoder.JSONDecodeError) as e:
-                            log.logger.error('Filepath %s lead to a non CSAF file with Error: %s. '
-                                             'File is excluded', file_path, e)
+                    if file.endswith(ARCHIVE_SUFFIXES):
+                        for member, stream in iter_archive_members(file_path):
+                            member_path = file_path + ARCHIVE_MEMBER_SEPARATOR + member
+                            if _parse_csaf(stream, member_path, log) is not None:
+                                file_list.append([member_path, os.path.basename(member)])
+                        continue
+                    if not is_json_source(file):
+                        log.logger.debug('Filepath %s is not a json file. File is excluded.', file)
+                        continue
+                    with open_csaf_source(file_path) as stream:
+                        if _parse_csaf(stream, file_path, log) is not None:
+                            file_list.append([file_path, file])
+                except (tarfile.TarError, zipfile.BadZipFile) as e:
+                    log.logger.error('Archive %s could not be read: %s. File is excluded.',
+                                     file_path, e)
                 except FileNotFoundError as e:
                     raise FileNotFoundError("Could not find the file at: " + file_path) from e
     return pd.DataFrame(file_list, columns=['path', 'file'])
 
 def read_csaf_file(file_path):
-    '''Read json file of a CSAF document.'''
+    '''Read json file of a CSAF document.
+
+    The file may be compressed or a member of an archive (see get_csaf_sources).
+
+    Return:
+        json data as dict or None if the file contains no CSAF document
+    '''
     formatting = "[%(asctime)s - %(levelname)s - process_csaf_files  %(funcName)s] %(message)s"
     log = LogStyle(formatting)
     try:
-        with open(file_path, 'r', encoding=ENCODING) as filename:
-            #os.path.getsize(fullpathhere) > 0
-            if os.stat(file_path).st_size == 0:
-                log.logger.warning('Filepath %s lead to a empty json file.'
-                                   ' File is excluded.', file_path)
-            try:
-                dummy = json.load(filename)
-            except json.decoder.JSONDecodeError as e:
-                log.logger.warning('Filepath %s lead to Error: %s. File is excluded. '
-                                   'Check it out.', file_path, e)
-            except FileNotFoundError:
-                log.logger.warning('Could not find the file at: %s', file_path)
-            # Check if it is a CSAF file
-            try:
-                dummy1 = dummy.get('document')
-                dummy2 = dummy.get('product_tree')
-                dummy3 = dummy.get('vulnerabilities')
-                if None in (dummy1, dummy2, dummy3):
-                    log.logger.info('File with path %s fits not the CSAF standard.'
-                                    , file_path)
-                    return True
-                else:
-                    return dummy
-            except (KeyError, json.decoder.JSONDecodeError) as e:
-                log.logger.info('Filepath %s lead to a non CSAF file with Error: %s.',
-                                file_path, e)
-    except FileNotFoundError as e:
+        with open_csaf_source(file_path) as stream:
+            return _parse_csaf(stream, file_path, log)
+    except FileNotFoundError:
         log.logger.warning("Could not find the file at: %s", file_path)
+    except (tarfile.TarError, zipfile.BadZipFile) as e:
+        log.logger.warning("Archive of %s could not be read: %s", file_path, e)
+    return None
+
+
+def iter_csaf_files(file_paths):
+    '''Read the CSAF documents of the given paths in order.
+
+    Consecutive members of the same tar archive are read in one sequential pass over the
+    archive instead of opening (and decompressing) the archive for every member.
+
+    Yield:
+        (file_path, json data as dict or None)
+    '''
+    formatting = "[%(asctime)s - %(levelname)s - process_csaf_files  %(funcName)s] %(message)s"
+    log = LogStyle(formatting)
+    for archive, group in groupby(file_paths, key=lambda path: split_archive_path(path)[0]):
+        group = deque(group)
+        if (split_archive_path(group[0])[1] is None or archive.endswith(".zip")
+                or len(group) == 1):
+            for file_path in group:
+                yield file_path, read_csaf_file(file_path)
+            continue
+        pending = {split_archive_path(file_path)[1]: file_path for file_path in group}
+        parsed = {}
+        try:
+            for member, stream in iter_archive_members(archive):
+                if member not in pending:
+                    continue
+                parsed[member] = _parse_csaf(stream, pending[member], log)
+                # members are yielded in the requested order as soon as possible
+                while group and split_archive_path(group[0])[1] in parsed:
+                    file_path = group.popleft()
+                    yield file_path, parsed.pop(split_archive_path(file_path)[1])
+        except (tarfile.TarError, FileNotFoundError) as e:
+            log.logger.warning("Archive %s could not be read: %s", archive, e)
+        for file_path in group:
+            yield file_path, parsed.pop(split_archive_path(file_path)[1], None)
 
 
 def flatten_tree_data(json_data, input_type="product_tree"):
@@ -100,8 +265,11 @@ def flatten_tree_data(json_data, input_type="product_tree"):
     tree = json_data.get(input_type, {})
     # if full product names instead of branches
     if 'full_product_names' in tree:
-        df_json = pd.DataFrame(tree['full_product_names']
-                               ).rename(columns={'name': 'full_product_names'})
+        df_json = pd.DataFrame([{'full_product_names': product.get('name', ''),
+                                 'product_id': product.get('product_id', ''),
+                                 **flatten_identification_helper(
+                                     product.get('product_identification_helper', {}))}
+                                for product in tree['full_product_names']])
         return df_json
     tree_data = tree.get('branches', [])
     flattened_data = []
@@ -128,54 +296,177 @@ def flatten_branch(branch, parent_attributes):
                 'full_product_name_branch': branch['product'].get('name', ''),
                 'product_id': branch['product'].get('product_id', '')
             })
+            attributes.update(flatten_identification_helper(
+                branch['product'].get('product_identification_helper', {})))
         return [attributes]
 
 
+def flatten_identification_helper(helper: dict):
+    '''Flatten the product_identification_helper of a product.
+
+    cpe is kept as string, the other fields as lists of strings. Hashes are written as
+    "<algorithm>:<value>" per file hash. purl (CSAF 2.0) and purls (CSAF 2.1) both end in
+    the column purls. Missing fields are left out.
+
+    Return:
+        dict with the IDENTIFICATION_HELPER_COLUMNS found in helper
+    '''
+    flat = {}
+    if helper.get('cpe'):
+        flat['cpe'] = helper['cpe']
+    purls = helper.get('purls', []) + ([helper['purl']] if helper.get('purl') else [])
+    if purls:
+        flat['purls'] = purls
+    for field in ('model_numbers', 'skus', 'serial_numbers'):
+        if helper.get(field):
+            flat[field] = list(helper[field])
+    hashes = [f"{file_hash.get('algorithm', '')}:{file_hash.get('value', '')}"
+              for entry in helper.get('hashes', [])
+              for file_hash in entry.get('file_hashes', [])]
+    if hashes:
+        flat['hashes'] = hashes
+    return flat
+
+
 def process_csaf_sources(csaf_sources: pd.DataFrame):
     '''Process the csaf json list'''
     formatting = "[%(asctime)s - %(levelname)s - process_csaf_files  %(funcName)s] %(message)s"
     log = LogStyle(formatting)
-    combined_df = pd.DataFrame()
+    # frames are concatenated once at the end, concatenating per file copies all previous
+    # rows again for every file
+    frames = []
     predefined_columns = read_json_file(find_file('config.json')
                                         )['df_columns']['predefined_columns']
     fac = np.round(len(csaf_sources) / 30,0) + 1
-    for i in range(len(csaf_sources)):
+    for i, (file_path, json_data) in enumerate(iter_csaf_files(csaf_sources.path)):
         if i > 0:
             if i % fac == 0:
                 print(f"{np.round(i / len(csaf_sources) * 100, 2)}% of files processed.")
-        file_path = csaf_sources.path.loc[i]
         try:
-            json_data = read_csaf_file(file_path)
             if json_data is None:
                 log.logger.info("Filepath contains no CSAF data. %s", file_path)
+                METRICS.count("csaf_files", status="skipped")
                 continue
-            df_flattened = flatten_tree_data(json_data, 'product_tree')
-            # Lege fehlende Spalten an
-            df_flattened['data_source'] = get_url_from_csaf(json_data, file_path)
-            for fix_column in predefined_columns:
-                if fix_column not in df_flattened.columns:
-                    df_flattened[fix_column] = None
-            if set(df_flattened.columns).issubset(set(predefined_columns)) is False:
+            with METRICS.timer("csaf_flatten"):
+                df_flattened = flatten_tree_data(json_data, 'product_tree')
+                # Lege fehlende Spalten an
+                df_flattened['data_source'] = get_url_from_csaf(json_data, file_path)
+                df_flattened['publisher'] = get_publisher_from_csaf(json_data, file_path)
+                for fix_column in predefined_columns:
+                    if fix_column not in df_flattened.columns:
+                        df_flattened[fix_column] = None
+            METRICS.count("csaf_files", status="flattened")
+            METRICS.count("csaf_rows", len(df_flattened))
+            if set(df_flattened.columns).issubset(set(predefined_columns + DERIVED_COLUMNS)) is False:
                 log.logger.error("There are undefined columns in %s", file_path)
             # df_flattened = df_flattened[predefined_columns]
-            combined_df = pd.concat([combined_df, df_flattened], ignore_index=True)
+            frames.append(df_flattened)
         except json.JSONDecodeError as e:
             log.logger.warning(" Error by reading the file %s %s", file_path, e)
-    return combined_df
+    combined_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return to_categorical_columns(combined_df,
+                                  [col for col in predefined_columns + DERIVED_COLUMNS
+                                   if col in CATEGORICAL_COLUMNS])
+
+
+def to_categorical_columns(df: pd.DataFrame, columns: list = CATEGORICAL_COLUMNS):
+    '''Convert the given columns of the flattened frame to categories.
+
+    Every distinct string is held once, the rows only keep an integer code. Columns
+    missing in df are skipped.
+    '''
+    for col in columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
 
 
 def get_url_from_csaf(d, path):
     '''Extract url from CSAf file.'''
-    formatting = "[%(asctime)s - %(levelname)s - process_csaf_files  %(funcName)s] %(message)s"
-    log = LogStyle(formatting)
     try:
         for ref in d['document']['references']:
             if ref.get('url', '').endswith('.json'):
                 return ref['url']
     except KeyError as e:
+        # the logger is only created when needed, creating it per document is expensive
+        formatting = "[%(asctime)s - %(levelname)s - process_csaf_files  %(funcName)s] %(message)s"
+        log = LogStyle(formatting)
         log.logger.info("%s: No url for json document provided in %s", e, path)
         return 'missing'
 
+
+def get_publisher_from_csaf(d, path):
+    '''Extract name of the publisher from CSAf file.'''
+    try:
+        return d['document']['publisher']['name']
+    except KeyError as e:
+        # the logger is only created when needed, creating it per document is expensive
+        formatting = "[%(asctime)s - %(levelname)s - process_csaf_files  %(funcName)s] %(message)s"
+        log = LogStyle(formatting)
+        log.logger.info("%s: No publisher provided in %s", e, path)
+        return 'missing'
+
+
+def write_csaf_store(df: pd.DataFrame, store_path: str = DEFAULT_STORE_PATH,
+                     partition_cols: list = STORE_PARTITION_COLUMNS):
+    '''Write flattened CSAF rows as parquet dataset partitioned by vendor and publisher.
+
+    Parameter:
+        df:pd.DataFrame         output of process_csaf_sources
+        store_path:str          directory of the parquet dataset. Existing partitions are
+                                extended, so new batches can be appended.
+        partition_cols:list     columns used for the directory partitioning
+
+    Return:
+        store_path:str
+    '''
+    df = df.copy()
+    for col in partition_cols:
+        if col not in df.columns:
+            df[col] = STORE_MISSING_PARTITION
+        df[col] = df[col].astype(object).where(df[col].notna() & (df[col] != ''),
+                                               STORE_MISSING_PARTITION).astype(str)
+    df.to_parquet(store_path, engine='pyarrow', partition_cols=partition_cols, index=False)
+    return store_path
+
+
+def read_csaf_store(store_path: str = DEFAULT_STORE_PATH, columns: list = None,
+                    vendor=None, publisher=None, filters: list = None):
+    '''Read flattened CSAF rows from the parquet dataset written by write_csaf_store.
+
+    Only the requested columns are read (projection) and the vendor/publisher selection
+    is pushed down to the partitions, so only matching directories are touched.
+
+    Parameter:
+        store_path:str      directory of the parquet dataset
+        columns:list        columns to read, all columns if None
+        vendor:str|list     vendor(s) (first branch level) to read
+        publisher:str|list  publisher(s) to read
+        filters:list        additional pyarrow filter tuples, e.g. [('product_name', '==', 'X')]
+
+    Return:
+        pd.DataFrame with the selected rows and columns
+    '''
+    predicates = list(filters) if filters else []
+    for col, value in (('vendor', vendor), ('publisher', publisher)):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            predicates.append((col, '==', value))
+        else:
+            predicates.append((col, 'in', list(value)))
+    df = pd.read_parquet(store_path, engine='pyarrow', columns=columns,
+                         filters=predicates or None)
+    # partition columns are read as categories of all partitions, drop the unused ones
+    # and restore the missing values replaced while writing
+    for col in STORE_PARTITION_COLUMNS:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+            if STORE_MISSING_PARTITION in df[col].cat.categories:
+                df[col] = df[col].cat.remove_categories(STORE_MISSING_PARTITION)
+    return to_categorical_columns(df)
+
+
 if __name__ == "__main__":
     print('Call process_csaf_sources(get_csaf_sources(<PATH_directory>))')
     df = process_csaf_sources(get_csaf_sources(os.path.join(os.getcwd(), 'test')))
@@ -1,8 +1,11 @@
 import pprint
 import os
+import numpy as np
 import pandas as pd
 from spellchecker import SpellChecker
 from utils.string_helperfunctions import find_file
+from utils.footprint import footprint_report
+from utils.shared_segment import Segment, create_shared_segment, write_segment_file
 
 # NOTE: The following definitions are used by default and can be customized if changes are made to the regex collection or corpus.
 
@@ -18,6 +21,13 @@ DEFAULT_COLUMNS_WHITESPACE_SPLIT = ["Device Family", "Device Type"]
 DEFAULT_SPECIFIC_CHECKING_ENABLED = False
 # Default column used for specific checking, e.g. Manufacturer specific dictionaries are used.
 DEFAULT_SPECIFIC_CHECKING_COLUMN = None
+# Test strings per check method, used by the examples below and by the benchmarks (see benchmarks/bench_strings.py).
+TEST_CHECKER_STRINGS = {
+    "check_best_candidate": ["Simens", "Simens", "S7 1500", "S7:1500", "Beckhoff", "XCM325", "Plcnext"],
+    "check_best_candidate_split": ["Simens", "S7 1500", "S7:1500", "Beckhoff", "AXCF 2152"],
+    "check_candidates": ["Simens", "S7 1501", "S7-1512-1", "S7:1513-2", "Beckhoff", "XCM325", "Plcnext",
+                         "S6"],
+}
 
 
 class StringChecker:
@@ -76,6 +86,102 @@ class StringChecker:
                 self.load_splitted_words(df_specific, self.corpus_cols_spell_split, id, False)
                 self.load_splitted_words(df_specific, self.corpus_cols_whitespace_split, id, True)
 
+    def footprint(self):
+        """
+        Retained memory of the spell checkers and the custom words.
+
+        Build the checker with utils.footprint.measure_construction(StringChecker) to add the
+        allocations traced while loading.
+
+        Returns:
+        - report: dict with the bytes per spell checker (spell_checkers[<key>]), of the
+          custom words (all_custom_words), the remaining attributes (other) and in total
+        """
+        structures = {f"spell_checkers[{key}]": checker
+                      for key, checker in self.spell_checkers.items()}
+        structures["all_custom_words"] = self.all_custom_words
+        return footprint_report(self, structures)
+
+    def segment_content(self):
+        """
+        Flat content of the spell dictionaries and the custom words for utils.shared_segment.
+
+        Returns:
+        - content: dict with the string tables (spell/<n> words of the n-th spell checker, custom_words), the count arrays (spell/<n>/counts), the indexes and the meta data
+        """
+        strings = {"custom_words": sorted(self.all_custom_words)}
+        arrays = {}
+        spell_checkers = []
+        for n, (key, spell_checker) in enumerate(self.spell_checkers.items()):
+            word_frequency = spell_checker.word_frequency
+            strings[f"spell/{n}"] = list(word_frequency.dictionary.keys())
+            arrays[f"spell/{n}/counts"] = np.fromiter(word_frequency.dictionary.values(), dtype=np.int64,
+                                                      count=len(word_frequency.dictionary))
+            spell_checkers.append({"key": key, "distance": spell_checker.distance,
+                                   "case_sensitive": word_frequency._case_sensitive,
+                                   "total_words": word_frequency.total_words,
+                                   "unique_words": word_frequency.unique_words,
+                                   "longest_word_length": word_frequency.longest_word_length,
+                                   "letters": sorted(word_frequency.letters)})
+        meta = {"component": "StringChecker", "spell_checkers": spell_checkers,
+                "additional_language": self.additional_language, "corpus_file": self.corpus_file,
+                "enable_specific_checkers": self.enable_specific_checkers,
+                "specific_checkers_id": self.specific_checkers_id, "corpus_cols_to_use": self.corpus_cols_to_use,
+                "corpus_cols_spell_split": self.corpus_cols_spell_split,
+                "corpus_cols_whitespace_split": self.corpus_cols_whitespace_split}
+        return {"strings": strings, "arrays": arrays, "meta": meta, "indexes": list(strings)}
+
+    def export_segment(self, path: str = None):
+        """
+        Writes the spell dictionaries and the custom words into a segment which worker processes attach to with from_segment.
+
+        Parameters:
+        - path: str, file of the segment (mmap), a shared memory block if None (default: None)
+
+        Returns:
+        - segment: str or SharedMemory, the path or the block (the caller closes and unlinks the block when the workers are finished)
+        """
+        if path is not None:
+            return write_segment_file(path, **self.segment_content())
+        return create_shared_segment(**self.segment_content())
+
+    @classmethod
+    def from_segment(cls, segment: Segment):
+        """
+        Creates a checker on a segment of export_segment without reading the corpus file.
+
+        The word frequencies of the spell checkers are looked up in the segment (hash index) instead of a dictionary per process. The dictionaries are read-only, load_words and load_splitted_words can not be used.
+
+        Parameters:
+        - segment: utils.shared_segment.Segment, the attached segment
+
+        Returns:
+        - checker: StringChecker
+        """
+        meta = segment.meta
+        checker = cls.__new__(cls)
+        checker.additional_language = meta["additional_language"]
+        checker.corpus_file = meta["corpus_file"]
+        checker.enable_specific_checkers = meta["enable_specific_checkers"]
+        checker.specific_checkers_id = meta["specific_checkers_id"]
+        checker.corpus_cols_to_use = meta["corpus_cols_to_use"]
+        checker.corpus_cols_spell_split = meta["corpus_cols_spell_split"]
+        checker.corpus_cols_whitespace_split = meta["corpus_cols_whitespace_split"]
+        checker.all_custom_words = segment.index("custom_words")
+        checker.spell_checkers = {}
+        for n, settings in enumerate(meta["spell_checkers"]):
+            spell_checker = SpellChecker(None, distance=settings["distance"],
+                                         case_sensitive=settings["case_sensitive"])
+            # the word frequency keeps its counts in slots, replace them by the segment
+            word_frequency = spell_checker.word_frequency
+            word_frequency._dictionary = segment.counter(f"spell/{n}", f"spell/{n}/counts")
+            word_frequency._total_words = settings["total_words"]
+            word_frequency._unique_words = settings["unique_words"]
+            word_frequency._longest_word_length = settings["longest_word_length"]
+            word_frequency._letters = set(settings["letters"])
+            checker.spell_checkers[settings["key"]] = spell_checker
+        return checker
+
     def load_xlsx_to_df(self, file: str):
         """
         Loads an Excel file into a pandas DataFrame.
@@ -316,29 +422,15 @@ if __name__ == "__main__":
 
     # Test StringChecker with 'check_best_candidate'
     print("\n# Test StringChecker with 'check_best_candidate'")
-    test_best("Simens", )
-    test_best("Simens")
-    test_best("S7 1500")
-    test_best("S7:1500")
-    test_best("Beckhoff")
-    test_best("XCM325")
-    test_best("Plcnext")
+    for test_str in TEST_CHECKER_STRINGS["check_best_candidate"]:
+        test_best(test_str)
 
     # Test StringChecker with 'check_best_candidate_split'
     print("\n# Test StringChecker with 'check_best_candidate_split'")
-    test_best_split("Simens")
-    test_best_split("S7 1500")
-    test_best_split("S7:1500")
-    test_best_split("Beckhoff")
-    test_best_split("AXCF 2152")
+    for test_str in TEST_CHECKER_STRINGS["check_best_candidate_split"]:
+        test_best_split(test_str)
 
     # Test StringChecker with 'check_candidates'
     print("\n# Test StringChecker with 'check_candidates'")
-    test_candidates("Simens")
-    test_candidates("S7 1501")
-    test_candidates("S7-1512-1")
-    test_candidates("S7:1513-2")
-    test_candidates("Beckhoff")
-    test_candidates("XCM325")
-    test_candidates("Plcnext")
-    test_candidates("S6")
+    for test_str in TEST_CHECKER_STRINGS["check_candidates"]:
+        test_candidates(test_str)
@@ -0,0 +1,304 @@
+"""Module provides a command line interface for the bulk normalization of asset records.
+
+    A CSV, JSONL or Parquet file is read in chunks of --chunk-size rows, every chunk runs
+    through the selected stages and is appended to the output file (CSV, JSONL or Parquet by
+    suffix) before the next chunks are read. With --workers > 1 the chunks are processed in
+    worker processes; at most two chunks per worker are in flight and the output keeps the
+    input order, so the memory stays bounded by the chunk size. The corpus and the spell
+    dictionaries of StringMiner and StringChecker are loaded once into shared memory
+    segments (utils.shared_segment), the workers attach to them instead of loading copies.
+    With --snapshot all components are created from a snapshot file (string_snapshot.py),
+    which every process maps.
+
+    Stages:
+        vendor    cleaned vendor (normalize_vendor) of --vendor-column in vendor_modified
+        synonym   master word of --synonym-column (StringSynonym) in <column>_synonym
+        checker   best spell candidate of --checker-column (StringChecker) in <column>_checked
+        miner     attributes mined out of --miner-column (StringMiner) in miner_<attribute>
+
+    python string_cli.py assets.csv assets_clean.parquet --stages vendor synonym --workers 4
+"""
+
+import os
+import sys
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from utils.log_class import LogStyle
+from utils.instrumentation import METRICS
+from utils.shared_segment import Segment
+
+IS_ARROW = False
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ModuleNotFoundError:
+    IS_ARROW = False
+else:
+    IS_ARROW = True
+
+# Stages in the order of execution
+STAGES = ("vendor", "synonym", "checker", "miner")
+# Rows per chunk
+DEFAULT_CHUNK_SIZE = 50_000
+# Number of worker processes, 1 processes the chunks in the main process
+DEFAULT_WORKERS = 1
+# Chunks in flight per worker
+CHUNKS_PER_WORKER = 2
+# Distinct values kept per stage across chunks, the cache is cleared when it is full
+CACHE_LIMIT = 200_000
+# Supported file formats by suffix
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+
+# Stages whose components are shared with the workers as segments
+SHARED_STAGES = ("checker", "miner")
+# Components and caches of the current process (loaded once per worker)
+_STATE = {}
+
+
+def file_format(path: str):
+    """Format of a file by its suffix, raises ValueError for unknown suffixes."""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Unknown file format {suffix}, use one of {sorted(FORMATS)}.")
+    return FORMATS[suffix]
+
+
+def read_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield the rows of a CSV, JSONL or Parquet file as DataFrames of chunk_size rows."""
+    fmt = file_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                               na_values=[""])
+    elif fmt == "jsonl":
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        if not IS_ARROW:
+            raise ModuleNotFoundError("pyarrow is needed for parquet files.")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+def parquet_schema(df: pd.DataFrame):
+    """
+    Parquet schema of the chunks, object columns are strings.
+
+    The types are not inferred from the values of the first chunk, a column that is empty
+    there (all None) would get the null type and fail for the strings of later chunks.
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for name, dtype in df.dtypes.items():
+        if dtype == object:
+            index = schema.get_field_index(name)
+            schema = schema.set(index, pa.field(name, pa.string()))
+    return schema
+
+
+class ChunkWriter:
+    """Appends chunks to a CSV, JSONL or Parquet file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.format = file_format(path)
+        self.parquet_writer = None
+        self.rows = 0
+        if self.format == "parquet" and not IS_ARROW:
+            raise ModuleNotFoundError("pyarrow is needed for parquet files.")
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df: pd.DataFrame):
+        """Append a chunk, the first chunk defines the columns (and the parquet schema, see parquet_schema)."""
+        if self.format == "csv":
+            df.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        elif self.format == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as file:
+                df.to_json(file, orient="records", lines=True, force_ascii=False)
+        else:
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.path, parquet_schema(df))
+            table = pa.Table.from_pandas(df, schema=self.parquet_writer.schema,
+                                         preserve_index=False)
+            self.parquet_writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+def _init_state(options: dict):
+    """Loads the components of the selected stages (once per process)."""
+    _STATE.clear()
+    _STATE["options"] = options
+    _STATE["caches"] = {stage: {} for stage in STAGES}
+    stages = options["stages"]
+    if options.get("snapshot"):
+        from string_snapshot import Snapshot
+        snapshot = Snapshot(options["snapshot"])
+        for stage in stages:
+            _STATE[stage] = snapshot.component(stage)
+        return
+    if "vendor" in stages:
+        from string_normalization import normalize_vendor
+        _STATE["vendor"] = normalize_vendor
+    if "synonym" in stages:
+        from string_synonym import StringSynonym
+        _STATE["synonym"] = StringSynonym()
+    segments = options.get("segments", {})
+    if "checker" in stages:
+        from string_checker import StringChecker
+        _STATE["checker"] = (StringChecker.from_segment(Segment.from_shared_memory(
+            segments["checker"])) if "checker" in segments else StringChecker())
+    if "miner" in stages:
+        from string_miner import StringMiner
+        _STATE["miner"] = (StringMiner.from_segment(Segment.from_shared_memory(
+            segments["miner"])) if "miner" in segments else StringMiner())
+
+
+def _export_segments(stages: list):
+    """Loads the shared components once and writes them into shared memory blocks."""
+    blocks = {}
+    if "checker" in stages:
+        from string_checker import StringChecker
+        blocks["checker"] = StringChecker().export_segment()
+    if "miner" in stages:
+        from string_miner import StringMiner
+        blocks["miner"] = StringMiner().export_segment()
+    return blocks
+
+
+def _map_cached(stage: str, values: pd.Series, func):
+    """Applies func once per distinct value, the results are kept for the next chunks."""
+    cache = _STATE["caches"][stage]
+    if len(cache) > CACHE_LIMIT:
+        cache.clear()
+    for value in values.dropna().unique():
+        if value not in cache:
+            cache[value] = func(value)
+    return values.map(lambda value: cache.get(value) if isinstance(value, str) else None)
+
+
+def process_chunk(df: pd.DataFrame):
+    """Runs the selected stages on a chunk (components loaded by _init_state)."""
+    options = _STATE["options"]
+    stages = options["stages"]
+    if "vendor" in stages:
+        with METRICS.timer("cli_stage", stage="vendor"):
+            df["vendor_modified"] = _map_cached("vendor", df[options["vendor_column"]],
+                                                _STATE["vendor"])
+    if "synonym" in stages:
+        column = options["synonym_column"]
+        dictionary = options["synonym_dictionary"]
+        with METRICS.timer("cli_stage", stage="synonym"):
+            df[f"{column}_synonym"] = _map_cached(
+                "synonym", df[column], lambda value: _STATE["synonym"].normalize(value,
+                                                                                 dictionary))
+    if "checker" in stages:
+        column = options["checker_column"]
+        with METRICS.timer("cli_stage", stage="checker"):
+            df[f"{column}_checked"] = _map_cached("checker", df[column],
+                                                  _STATE["checker"].check_best_candidate)
+    if "miner" in stages:
+        column = options["miner_column"]
+        with METRICS.timer("cli_stage", stage="miner"):
+            mined = _map_cached("miner", df[column], _STATE["miner"].match)
+            # one column per attribute of the miner in every chunk, also without a match
+            attributes = [attribute for attribute in _STATE["miner"].re_attributes
+                          if not options["miner_attributes"]
+                          or attribute in options["miner_attributes"]]
+            for attribute in attributes:
+                df[f"miner_{attribute.lower().replace(' ', '_')}"] = [
+                    result.get(attribute) if isinstance(result, dict) else None
+                    for result in mined]
+    return df
+
+
+def run(input_path: str, output_path: str, options: dict, chunk_size: int = DEFAULT_CHUNK_SIZE,
+        workers: int = DEFAULT_WORKERS):
+    """
+    Streams input_path through the stages into output_path.
+
+    Parameters:
+    - input_path: str, CSV, JSONL or Parquet file
+    - output_path: str, CSV, JSONL or Parquet file (replaced)
+    - options: dict, stages and columns (see main)
+    - chunk_size: int, rows per chunk
+    - workers: int, number of worker processes
+
+    Returns:
+    - rows: int, number of written rows
+    """
+    log = LogStyle(module_name="string_cli", file_name="string_cli.py").logger
+    if options.get("snapshot"):
+        from string_snapshot import Snapshot
+        missing = set(options["stages"]) - set(Snapshot(options["snapshot"]).components)
+        if missing:
+            raise ValueError(f"Stages {sorted(missing)} are not part of the snapshot "
+                             f"{options['snapshot']}.")
+    writer = ChunkWriter(output_path)
+    chunks = read_chunks(input_path, chunk_size)
+    blocks = {}
+    try:
+        if workers <= 1:
+            _init_state(options)
+            for chunk in chunks:
+                writer.write(process_chunk(chunk))
+        else:
+            if not options.get("snapshot"):
+                blocks = _export_segments([stage for stage in options["stages"]
+                                           if stage in SHARED_STAGES])
+            options = {**options, "segments": {stage: block.name
+                                               for stage, block in blocks.items()}}
+            with ProcessPoolExecutor(workers, initializer=_init_state,
+                                     initargs=(options,)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(process_chunk, chunk))
+                    if len(pending) >= workers * CHUNKS_PER_WORKER:
+                        writer.write(pending.popleft().result())
+                while pending:
+                    writer.write(pending.popleft().result())
+    finally:
+        writer.close()
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+    log.info(f"{writer.rows} rows of {input_path} written to {output_path}.")
+    return writer.rows
+
+
+def main(argv: list = None):
+    """Command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(description="Bulk normalization of asset records.")
+    parser.add_argument("input", help="CSV, JSONL or Parquet file")
+    parser.add_argument("output", help="CSV, JSONL or Parquet file (replaced)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=["vendor"])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--vendor-column", default="vendor")
+    parser.add_argument("--synonym-column", default=None,
+                        help="default: vendor_modified with stage vendor, otherwise vendor")
+    parser.add_argument("--synonym-dictionary", default="Manufacturer")
+    parser.add_argument("--checker-column", default="product_name")
+    parser.add_argument("--miner-column", default="product_name")
+    parser.add_argument("--miner-attributes", nargs="*", default=None,
+                        help="mined attributes written as columns (default: all attributes "
+                             "of the miner)")
+    parser.add_argument("--snapshot", help="snapshot file of string_snapshot.py")
+    args = parser.parse_args(argv)
+    stages = [stage for stage in STAGES if stage in args.stages]
+    options = {"stages": stages, "vendor_column": args.vendor_column,
+               "synonym_column": args.synonym_column
+               or ("vendor_modified" if "vendor" in stages else args.vendor_column),
+               "synonym_dictionary": args.synonym_dictionary,
+               "checker_column": args.checker_column, "miner_column": args.miner_column,
+               "miner_attributes": args.miner_attributes, "snapshot": args.snapshot}
+    rows = run(args.input, args.output, options, args.chunk_size, args.workers)
+    print(f"{rows} rows written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
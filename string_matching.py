@@ -0,0 +1,451 @@
+"""Module provides the matching of flattened CSAF data with the assets of an asset data base.
+
+    The CSAF frame (see process_csaf_files.py) is indexed once by blocking keys: the
+    normalized vendor and the normalized product family. An asset is only compared with the
+    CSAF rows of its blocks instead of all CSAF rows, so the costs grow with the block sizes
+    and not with the product of both frame sizes.
+"""
+
+import re
+import time
+import difflib
+from fnmatch import fnmatchcase
+from collections import defaultdict
+from urllib.parse import unquote
+import pandas as pd
+from process_csaf_files import IDENTIFICATION_HELPER_COLUMNS
+from string_normalization import normalize_vendor, remove_special_characters
+from string_normalization import remove_letters_from_string
+from utils.log_class import LogStyle
+
+IS_LEV = False
+try:
+    import Levenshtein
+except ModuleNotFoundError:
+    IS_LEV = False
+else:
+    IS_LEV = True
+
+# Columns of the flattened CSAF frame used for matching. Assets are expected with the same
+# attributes, other column names can be mapped with the parameter asset_columns.
+MATCHING_COLUMNS = ["vendor", "product_family", "product_name", "product_version"]
+# Minimum score of a match
+DEFAULT_THRESHOLD = 0.8
+# Weights of the compared attributes in the score
+DEFAULT_WEIGHTS = {"product_family": 0.3, "product_name": 0.5, "product_version": 0.2}
+# Score of the version, if the CSAF row provides no version (e.g. only a version range)
+VERSION_UNKNOWN_SCORE = 0.5
+# Number of components of a CPE 2.3 formatted string (after "cpe:2.3")
+CPE_COMPONENTS = 11
+# Position of the version in the CPE components
+CPE_VERSION = 3
+# Separator of the CPE 2.3 components (colons escaped by a backslash are part of a value)
+CPE_SEPARATOR = re.compile(r'(?<!\\):')
+# Characters of CPE 2.2 values which are escaped in CPE 2.3 formatted strings
+CPE_QUOTED = re.compile(r'[^0-9a-z_.\-*?]')
+# Identifiers compared separator insensitive (wildcards * and ? of CSAF are kept)
+PLAIN_IDENTIFIERS = ["model_numbers", "skus", "serial_numbers"]
+# Characters removed from the plain identifiers
+IDENTIFIER_SEPARATORS = re.compile(r'[^0-9a-z*?]')
+# purl types with case insensitive names (see purl specification)
+PURL_LOWER_CASE_TYPES = {"bitbucket", "composer", "deb", "github", "golang", "hex", "npm",
+                         "pypi"}
+
+
+def similarity(first: str, second: str):
+    """Similarity of two strings between 0 and 1 (Levenshtein ratio if installed)."""
+    if not first or not second:
+        return 0.0
+    if IS_LEV:
+        return Levenshtein.ratio(first, second)
+    return difflib.SequenceMatcher(None, first, second).ratio()
+
+
+def _split_cpe(cpe: str):
+    """Components of a CPE 2.3 formatted string (escaped colons are kept)."""
+    return CPE_SEPARATOR.split(cpe)
+
+
+def canonical_cpe(cpe: str):
+    """
+    Canonical CPE 2.3 formatted string of a CPE 2.2 URI or CPE 2.3 string.
+
+    Lower case, percent escapes of CPE 2.2 bound as backslash escapes, packed edition of
+    CPE 2.2 unpacked and missing or empty components filled with the wildcard *. Returns
+    None for invalid values.
+    """
+    if not isinstance(cpe, str):
+        return None
+    cpe = cpe.strip().lower()
+    if cpe.startswith("cpe:2.3:"):
+        components = _split_cpe(cpe)[2:]
+    elif cpe.startswith("cpe:/"):
+        components = [CPE_QUOTED.sub(r'\\\g<0>', unquote(component))
+                      for component in cpe[len("cpe:/"):].split(":")]
+        # packed edition of CPE 2.2: ~edition~sw_edition~target_sw~target_hw~other
+        if len(components) > 5 and components[5].startswith("\\~"):
+            packed = components[5].split("\\~")[1:]
+            components = components[:5] + packed[:1] + (components[6:7] or ["*"]) + packed[1:]
+    else:
+        return None
+    components = (components + ["*"] * CPE_COMPONENTS)[:CPE_COMPONENTS]
+    return "cpe:2.3:" + ":".join(component or "*" for component in components)
+
+
+def canonical_purl(purl: str):
+    """
+    Canonical purl: lower case type, percent escapes resolved, names of case insensitive
+    types in lower case (pypi with - instead of _), qualifiers sorted. Returns None for
+    invalid values.
+    """
+    if not isinstance(purl, str) or not purl.strip().lower().startswith("pkg:"):
+        return None
+    rest = purl.strip()[len("pkg:"):].lstrip("/")
+    rest, _, subpath = rest.partition("#")
+    rest, _, qualifiers = rest.partition("?")
+    rest, _, version = rest.rpartition("@") if "@" in rest else (rest, "", "")
+    purl_type, _, name = rest.partition("/")
+    purl_type = purl_type.lower()
+    name = unquote(name.strip("/"))
+    if purl_type in PURL_LOWER_CASE_TYPES:
+        name = name.lower()
+    if purl_type == "pypi":
+        name = name.replace("_", "-")
+    canonical = f"pkg:{purl_type}/{name}"
+    if version:
+        canonical += "@" + unquote(version)
+    if qualifiers:
+        pairs = sorted(pair.split("=", 1) for pair in qualifiers.split("&") if "=" in pair)
+        canonical += "?" + "&".join(f"{key.lower()}={unquote(value)}" for key, value in pairs)
+    if subpath.strip("/"):
+        canonical += "#" + unquote(subpath.strip("/"))
+    return canonical
+
+
+def canonical_identifier(identifier: str):
+    """Separator insensitive key of a model number, SKU or serial number."""
+    if not isinstance(identifier, str):
+        return None
+    return IDENTIFIER_SEPARATORS.sub("", identifier.lower()) or None
+
+
+def canonical_hash(file_hash: str):
+    """Key of a hash given as "<algorithm>:<value>" (algorithm without separators)."""
+    if not isinstance(file_hash, str) or ":" not in file_hash:
+        return None
+    algorithm, _, value = file_hash.rpartition(":")
+    return f"{re.sub(r'[^0-9a-z]', '', algorithm.lower())}:{value.strip().lower()}"
+
+
+def _as_list(value):
+    """Values of an identifier cell (single string, list or missing)."""
+    if isinstance(value, str):
+        return [value]
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    return list(value)
+
+
+class IdentifierIndex:
+    """
+    Hash indexes of the strong identifiers (product_identification_helper) of flattened CSAF
+    rows. An asset is looked up per identifier in O(1) (matching priority Modi 1).
+    """
+
+    def __init__(self, df_csaf: pd.DataFrame):
+        """
+        Builds one index per identifier of IDENTIFICATION_HELPER_COLUMNS. Columns missing in
+        df_csaf are skipped.
+
+        CPEs with version * and purls without version are found for every version of the
+        asset. Model numbers, SKUs and serial numbers with the CSAF wildcards * and ? are
+        kept by their literal prefix and confirmed by pattern matching.
+        """
+        self.indexes = {column: defaultdict(list) for column in IDENTIFICATION_HELPER_COLUMNS}
+        self.wildcards = {column: defaultdict(list) for column in PLAIN_IDENTIFIERS}
+        for column in IDENTIFICATION_HELPER_COLUMNS:
+            if column not in df_csaf.columns:
+                continue
+            for position, values in enumerate(df_csaf[column]):
+                for key in self._keys(column, values):
+                    if column in PLAIN_IDENTIFIERS and ("*" in key or "?" in key):
+                        prefix = re.split(r'[*?]', key, maxsplit=1)[0]
+                        self.wildcards[column][prefix].append((key, position))
+                    else:
+                        self.indexes[column][key].append(position)
+
+    @staticmethod
+    def _keys(column: str, values):
+        """Canonical keys of the values of an identifier column."""
+        canonical = {"cpe": canonical_cpe, "purls": canonical_purl,
+                     "hashes": canonical_hash}.get(column, canonical_identifier)
+        keys = (canonical(value) for value in _as_list(values))
+        return list(dict.fromkeys(key for key in keys if key))
+
+    def lookup(self, column: str, values):
+        """
+        Positions of the CSAF rows with one of the identifiers.
+
+        Parameters:
+        - column: str, one of IDENTIFICATION_HELPER_COLUMNS
+        - values: str or list of identifiers of the asset
+
+        Returns:
+        - positions: list of the CSAF row positions, empty if there is no match
+        """
+        index = self.indexes.get(column)
+        if not index and not self.wildcards.get(column):
+            return []
+        positions = []
+        for key in self._keys(column, values):
+            positions.extend(index.get(key, []))
+            if column == "cpe":
+                components = _split_cpe(key)
+                components[2 + CPE_VERSION] = "*"
+                positions.extend(index.get(":".join(components), []))
+            elif column == "purls" and "@" in key:
+                positions.extend(index.get(key.split("@", 1)[0], []))
+            elif column in PLAIN_IDENTIFIERS:
+                wildcards = self.wildcards[column]
+                for length in range(len(key) + 1):
+                    for pattern, position in wildcards.get(key[:length], []):
+                        if fnmatchcase(key, pattern):
+                            positions.append(position)
+        return list(dict.fromkeys(positions))
+
+    def match(self, df_assets: pd.DataFrame):
+        """
+        Looks up the identifier columns of the assets.
+
+        Returns:
+        - matches: list of (asset position, CSAF position, identifier column)
+        """
+        matches = []
+        columns = [column for column in IDENTIFICATION_HELPER_COLUMNS
+                   if column in df_assets.columns
+                   and (self.indexes[column] or self.wildcards.get(column))]
+        for column in columns:
+            for asset_position, values in enumerate(df_assets[column]):
+                matches.extend((asset_position, csaf_position, column)
+                               for csaf_position in self.lookup(column, values))
+        return matches
+
+
+class CsafMatcher:
+    """
+    Matches assets with the flattened CSAF rows of the same vendor and product family block.
+    """
+
+    def __init__(self, df_csaf: pd.DataFrame, synonym=None, miner=None,
+                 threshold: float = DEFAULT_THRESHOLD, weights: dict = DEFAULT_WEIGHTS):
+        """
+        Initializes the matcher and builds the identifier and blocking indexes of the CSAF
+        frame.
+
+        Parameters:
+        - df_csaf: pd.DataFrame, flattened CSAF rows with the MATCHING_COLUMNS, an existing
+          column vendor_modified is used instead of cleaning the vendor again
+        - synonym: StringSynonym, optional, maps the cleaned vendors to their master words
+        - miner: StringMiner, optional, extracts the device family out of the product name if
+          the product family is missing
+        - threshold: float, minimum score of a match (default: DEFAULT_THRESHOLD)
+        - weights: dict, weights of the compared attributes (default: DEFAULT_WEIGHTS)
+        """
+        self.logger = LogStyle(module_name=self.__class__.__name__,
+                               file_name="string_matching.py").logger
+        self.synonym = synonym
+        self.miner = miner
+        self.threshold = threshold
+        self.weights = weights
+        self.timings = {}
+        self._vendor_keys = {}
+        self._family_keys = {}
+        start = time.perf_counter()
+        self.df_csaf = df_csaf
+        self.csaf_keys = self._normalize(df_csaf)
+        self.timings["normalize_csaf"] = time.perf_counter() - start
+        start = time.perf_counter()
+        # vendor key -> family key -> positions of the CSAF rows
+        self.blocks = defaultdict(lambda: defaultdict(list))
+        for position, (vendors, family) in enumerate(zip(self.csaf_keys.vendor_key,
+                                                         self.csaf_keys.family_key)):
+            for vendor in vendors:
+                self.blocks[vendor][family].append(position)
+        self.timings["build_index"] = time.perf_counter() - start
+        start = time.perf_counter()
+        self.identifiers = IdentifierIndex(df_csaf)
+        self.timings["build_identifier_index"] = time.perf_counter() - start
+
+    def _vendor_key(self, vendor, vendor_modified=None):
+        """Blocking keys of a vendor: cleaned, lower case vendors (master words if synonyms
+        are given). Several vendors of one entry lead to several keys."""
+        raw = vendor_modified if isinstance(vendor_modified, str) and vendor_modified else vendor
+        if raw not in self._vendor_keys:
+            cleaned = raw if raw is vendor_modified else normalize_vendor(raw)
+            keys = []
+            for part in cleaned.split(', '):
+                if self.synonym is not None:
+                    master = self.synonym.normalize(part, "Manufacturer")
+                    part = master if isinstance(master, str) and master else part
+                keys.append(part.lower())
+            self._vendor_keys[raw] = tuple(dict.fromkeys(keys))
+        return self._vendor_keys[raw]
+
+    def _family_key(self, family, name, vendor_key: tuple):
+        """Blocking key of the product family, empty string if unknown."""
+        key = (family, name, vendor_key)
+        if key not in self._family_keys:
+            cleaned = remove_special_characters(family.lower().strip()) \
+                if isinstance(family, str) else None
+            if not cleaned and self.miner is not None and isinstance(name, str):
+                cleaned = self.miner.match(name).get("Device Family")
+                cleaned = remove_special_characters(cleaned.lower()) if cleaned else None
+            self._family_keys[key] = cleaned or ""
+        return self._family_keys[key]
+
+    def _normalize(self, df: pd.DataFrame):
+        """Normalized blocking keys and compared attributes of a frame."""
+        vendors_modified = df["vendor_modified"] if "vendor_modified" in df.columns \
+            else pd.Series(None, index=df.index, dtype=object)
+        vendor_keys = [self._vendor_key(vendor, modified)
+                       for vendor, modified in zip(df["vendor"], vendors_modified)]
+        family_keys = [self._family_key(family, name, vendor_key)
+                       for family, name, vendor_key in zip(df["product_family"],
+                                                           df["product_name"], vendor_keys)]
+        names = [remove_special_characters(name.lower().strip()) or ""
+                 if isinstance(name, str) else "" for name in df["product_name"]]
+        versions = [remove_letters_from_string(version) if isinstance(version, str) else None
+                    for version in df["product_version"]]
+        return pd.DataFrame({"vendor_key": vendor_keys, "family_key": family_keys,
+                             "name_key": names, "version_key": versions}, index=df.index)
+
+    def candidates(self, vendor_keys: tuple, family_key: str):
+        """Positions of the CSAF rows in the blocks of an asset.
+
+        With a known family the rows of this family and the rows without family of the
+        vendor are returned, otherwise all rows of the vendor."""
+        positions = []
+        for vendor in vendor_keys:
+            block = self.blocks.get(vendor)
+            if block is None:
+                continue
+            if family_key:
+                positions.extend(block.get(family_key, []))
+                positions.extend(block.get("", []))
+            else:
+                for rows in block.values():
+                    positions.extend(rows)
+        return list(dict.fromkeys(positions))
+
+    def _score(self, asset, csaf):
+        """
+        Weighted score of an asset and a CSAF row (both normalized).
+
+        If the asset or the CSAF row provides no product family, the family is not compared
+        (score None) and its weight is distributed over the other attributes in proportion
+        to their weights.
+        """
+        scores = {
+            "product_family": None if not asset.family_key or not csaf.family_key
+            else 1.0 if asset.family_key == csaf.family_key
+            else similarity(asset.family_key, csaf.family_key),
+            "product_name": similarity(asset.name_key, csaf.name_key),
+            "product_version": VERSION_UNKNOWN_SCORE if csaf.version_key is None
+            else float(asset.version_key == csaf.version_key),
+        }
+        compared = {attribute: value for attribute, value in scores.items()
+                    if value is not None}
+        weight = sum(self.weights.get(attribute, 0) for attribute in compared)
+        total_weight = sum(self.weights.get(attribute, 0) for attribute in scores)
+        scores["score"] = (sum(self.weights.get(attribute, 0) * value
+                               for attribute, value in compared.items())
+                           * total_weight / weight) if weight else 0.0
+        return scores
+
+    def match(self, df_assets: pd.DataFrame, asset_columns: dict = None):
+        """
+        Matches the assets with the CSAF rows.
+
+        First the strong identifiers (IDENTIFICATION_HELPER_COLUMNS) are looked up (Modi 1).
+        Only the assets without identifier match are compared with the CSAF rows of their
+        blocks (Modi 2).
+
+        Parameters:
+        - df_assets: pd.DataFrame, assets with the MATCHING_COLUMNS and optionally identifier
+          columns
+        - asset_columns: dict, optional mapping of the MATCHING_COLUMNS and identifier columns
+          to the column names of df_assets, e.g. {"vendor": "manufacturer"}
+
+        Returns:
+        - result: pd.DataFrame with the columns asset_index, csaf_index, score, the scores
+          of the single attributes and the matched identifier (None for Modi 2), ordered by
+          asset and descending score. The time per stage is provided in self.timings.
+        """
+        if asset_columns:
+            df_assets = df_assets.rename(columns={value: key
+                                                  for key, value in asset_columns.items()})
+        start = time.perf_counter()
+        results = []
+        identified = set()
+        for asset_position, csaf_position, column in self.identifiers.match(df_assets):
+            identified.add(asset_position)
+            results.append([df_assets.index[asset_position], self.df_csaf.index[csaf_position],
+                            1.0, None, None, None, column])
+        self.timings["identifiers"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asset_keys = self._normalize(df_assets)
+        self.timings["normalize_assets"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pairs = []
+        for asset_position, (vendor_keys, family_key) in enumerate(
+                zip(asset_keys.vendor_key, asset_keys.family_key)):
+            if asset_position in identified:
+                continue
+            pairs.extend((asset_position, csaf_position)
+                         for csaf_position in self.candidates(vendor_keys, family_key))
+        self.timings["candidates"] = time.perf_counter() - start
+        self.timings["candidate_pairs"] = len(pairs)
+
+        start = time.perf_counter()
+        assets = list(asset_keys.itertuples(index=False))
+        csafs = list(self.csaf_keys.itertuples(index=False))
+        for asset_position, csaf_position in pairs:
+            scores = self._score(assets[asset_position], csafs[csaf_position])
+            if scores["score"] >= self.threshold:
+                results.append([df_assets.index[asset_position],
+                                self.df_csaf.index[csaf_position], scores["score"],
+                                scores["product_family"], scores["product_name"],
+                                scores["product_version"], None])
+        self.timings["compare"] = time.perf_counter() - start
+        self.logger.info(f"{len(identified)} assets identified, {len(pairs)} candidate pairs "
+                         f"instead of {len(df_assets) * len(self.df_csaf)}, "
+                         f"{len(results)} matches.")
+        result = pd.DataFrame(results, columns=["asset_index", "csaf_index", "score",
+                                                "score_family", "score_name", "score_version",
+                                                "identifier"])
+        return result.sort_values(["asset_index", "score"], ascending=[True, False],
+                                  ignore_index=True)
+
+
+def verify_missing_family(threshold: float = DEFAULT_THRESHOLD):
+    """
+    Check that a product family missing on one or both sides does not prevent a match of
+    the same vendor, product name and version.
+
+    Returns:
+    - failed: pd.DataFrame with the asset and CSAF families of the cases without match
+      (empty if all cases match)
+    """
+    cases = [(None, None), (None, "SCALANCE X"), ("SCALANCE X", None)]
+    failed = []
+    for asset_family, csaf_family in cases:
+        row = {"vendor": "Siemens", "product_name": "SCALANCE X200",
+               "product_version": "V1.2"}
+        matcher = CsafMatcher(pd.DataFrame([{**row, "product_family": csaf_family}]),
+                              threshold=threshold)
+        result = matcher.match(pd.DataFrame([{**row, "product_family": asset_family}]))
+        if result.empty:
+            failed.append({"asset_family": asset_family, "csaf_family": csaf_family})
+    return pd.DataFrame(failed, columns=["asset_family", "csaf_family"])
@@ -5,12 +5,27 @@
 """
 
 
-import re as regex
+import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import yaml
 from utils.string_helperfunctions import find_file
+from utils.instrumentation import METRICS
+from utils.footprint import footprint_report
+from utils.shared_segment import Segment, create_shared_segment, write_segment_file
 
 
+# The fuzzy syntax {e<=n} and the concurrent matching need the regex module, the standard
+# re module finds no fuzzy patterns.
+IS_REGEX = False
+try:
+    import regex
+except ModuleNotFoundError:
+    import re as regex
+    IS_REGEX = False
+else:
+    IS_REGEX = True
+
 IS_LEV = False
 try:
     import Levenshtein
@@ -32,6 +47,74 @@ DEFAULT_CORPUS_FILE = find_file("device_list.xlsx")
 DEFAULT_CORPUS_COLUMNS = ["Device Family", "Device Type", "Article Number"]
 # Default column for filtering, here manufacturer specific filtering from the corpus file.
 DEFAULT_FILTER_COLUMN = "Manufacturer"
+# Number of errors up to which the fuzzy patterns are compiled at start, patterns with more errors are compiled per call.
+MAX_PRECOMPILED_ERRORS = 2
+# Arguments of the search of the compiled patterns, concurrent=True releases the GIL while matching (regex module only).
+SEARCH_ARGS = {"concurrent": True} if IS_REGEX else {}
+
+# NOTE: The following test strings are used by the examples below and by the benchmarks (see benchmarks/bench_strings.py).
+
+# Annotations of nmap scans (S7 and PROFINET devices), partially with typos
+TEST_NMAP_ANNOTATIONS = [
+    "annotation: SIMATIC S7-1500                   6ES7 672-5DC01-0YA0      0 V  2  1  7\x00",
+    "annotation: SIMATIC S7-1200                   6ES7 212-1AE40-0XB0      7 V  4  5  1\x00",
+    "annotation: SIMATIC S7-1500                   6ES7 672-5DC01-0YA0      0 V2.1.7\x00",
+    "annotation: SIMATIC S7-1200                   6ES7 212-1AE40-0XB0      7 V4.5.1\x00",
+    "annotation: SIMATIC S7-1500                   6ES7 672-5DC01-0YA0      0 V 2.1.7\x00",
+    "annotation: SIMATIC S7-1200                   6ES7 212-1AE40-0XB0      7 V 4.5.1\x00",
+    "annotation: S7-1200                   6ES7 212-1AE40-0XB0      7 V  4  5  1\x00",
+    "annotation: S7-1500                   6ES7 512-1DK01-0AB0      4 V  2  9  2\x00",
+    "annotation: AXL F BK PN               2701815                  2 V  1  0  4\x00",
+    "annotation: JVL-MOTOR                 MIS340C12EPH285          4 V  3 40 12\x00",
+    "annotation: S7=1500                   6ES7672-5DC01-0YA0      0 V  2  1  7\x00",
+    "annotation: S71200                   6ES7:212-1AE40-0XB0      7 V  4  5  1\x00",
+    "annotation: S6-1200                   6ES7 212-1AE40-0XB0      7 V  4  5  1\x00",
+    "annotation: S7-150                    6ES7 512-1DK01:0AB0      4 V  2  9  2\x00",
+    "annotation: AXL F BK PN               2701815                  2 V  1  0  4\x00",
+    "annotation: JVL-MOTOR                 MIS340C12EPH285          4 V  3 40 12\x00",
+    "annotation: PlcNext Axc f 2152",
+    "SIMATIC CP 1623 (6GK1162-3AA00)",
+    "SIMATIC CP 1628 (6GK1162-8AA00)",
+    "SIMATIC CP 1543-1 (6GK7543-1AX00-0XE0)",
+    "SIMATIC MV540 H (6GF3540-0GE10)",
+    "SIMATIC MV550 H (6GF3550-0GE10)",
+    "SIMATIC MV560 U (6GF3560-0LE10)",
+    "RUGGEDCOM RM1224 family (6GK6108-4AM00)"
+]
+# Manual test strings provided by BSI
+TEST_MANUAL_STRINGS = [
+    "SSA-350757: Improper Access Control [...] Related ET200 CPUs and SIPLUS variants.",
+    "SSA-350757: Improper Access Control [...] Related ET 200 CPUs and SIPLUS variants.",
+    "SIMATIC CP 1623 (6GK1162-3AA00)",
+    "SIMATIC CP 1628 (6GK1162-8AA00)",
+    "SIMATIC CP 1543-1 (6GK7543-1AX00-0XE0)",
+    "SIMATIC MV540 H (6GF3540-0GE10)",
+    "SIMATIC MV550 H (6GF3550-0GE10)",
+    "SIMATIC MV560 U (6GF3560-0LE10)",
+    "RUGGEDCOM RM1224 family (6GK6108-4AM00)",
+]
+# Sentences of Siemens CSAF files
+TEST_CSAF_SENTENCES = [
+    "SIMATIC S7-400 CPU devices contain an input validation vulnerability that could allow an attacker to create a Denial-of-Service condition.",
+    "A restart is needed to restore normal operations.\n\nSiemens has released an update for SIMATIC S7-410 V10 CPU family",
+    "and SIMATIC S7-400 H V6 CPU family.",
+    "(incl. SIPLUS variants for both) and recommends to update to the latest version.",
+    "Affected models of the S7-1500 CPU product family do not contain an Immutable Root of Trust in Hardware.",
+    "Two vulnerabilities have been identified in the SIMATIC S7-400 CPU family.",
+    "Multiple Vulnerabilities in SCALANCE SC-600 Family before V3.0",
+    "Multiple vulnerabilities affecting various third-party components of the SCALANCE SC-600 family.",
+    "SIMATIC S7-1500 CPUs and related products protect the built-in global private key in a way that cannot be considered sufficient any longer.",
+    "SIMATIC S7-1200 CPUs and related products protect the built-in global private key in a way that cannot be considered sufficient any longer.",
+    "Vulnerabilities in Third-Party Component Mbed TLS of LOGO! CMR Family and SIMATIC RTU 3000 Family",
+    "Web Vulnerabilities in SCALANCE S-600 Family",
+    "SIMATIC S7-400 CPU devices contain an input validation vulnerability that could allow an attacker to create a Denial-of-Service condition.",
+    "A restart is needed to restore normal operations.\n\nSiemens has released an update for SIMATIC S7-410 V10 CPU family",
+    "and SIMATIC S7-400 H V6 CPU family",
+    "(incl. SIPLUS variants for both)",
+    "Improper Access Control Vulnerability in TIA Portal Affecting S7-1200 and ... Web Server",
+    "Improper Access Control Vulnerability in TIA Portal Affecting ... and S7-1500 CPUs Web Server",
+    "(Incl. Related ET200 CPUs and SIPLUS variants)",
+]
 
 
 class StringMiner:
@@ -67,6 +150,146 @@ class StringMiner:
         self.re_attributes = regex_categories
         self.corpus_search_cols = corpus_search_cols
         self.corpus_vendor_col = corpus_filter_col
+        # Compiled patterns per attribute, key, regex and number of errors. Like regex_dict
+        # and search_strings_df they are only read after the construction, so one miner can
+        # be used by several threads (see match_batch).
+        self.compiled_patterns = self._compile_patterns()
+        # Corpus columns of an attached segment (see from_segment), search_strings_df is None then
+        self.corpus_tables = None
+
+    def segment_content(self):
+        """
+        Flat content of the regex collection and the corpus for utils.shared_segment.
+
+        Returns:
+        - content: dict with the string tables (regex_sources, corpus/<column>) and the meta data to rebuild the regex collection
+        """
+        regex_sources = []
+        regex_layout = []
+        for attribute, entries in self.regex_dict.items():
+            for k, regex_str in (entries or {}).items():
+                regex_list = regex_str if type(regex_str) is list else [regex_str] if regex_str else []
+                regex_layout.append([attribute, k, type(regex_str) is list, len(regex_list)])
+                regex_sources.extend(regex_list)
+        strings = {"regex_sources": regex_sources}
+        for column in dict.fromkeys(self.corpus_search_cols + [self.corpus_vendor_col]):
+            strings[f"corpus/{column}"] = [str(value) if value else "" for value in self.search_strings_df[column]]
+        meta = {"component": "StringMiner", "regex_layout": regex_layout, "re_attributes": self.re_attributes,
+                "corpus_search_cols": self.corpus_search_cols, "corpus_vendor_col": self.corpus_vendor_col}
+        return {"strings": strings, "meta": meta}
+
+    def export_segment(self, path: str = None):
+        """
+        Writes the regex collection and the corpus into a segment which worker processes attach to with from_segment.
+
+        Parameters:
+        - path: str, file of the segment (mmap), a shared memory block if None (default: None)
+
+        Returns:
+        - segment: str or SharedMemory, the path or the block (the caller closes and unlinks the block when the workers are finished)
+        """
+        if path is not None:
+            return write_segment_file(path, **self.segment_content())
+        return create_shared_segment(**self.segment_content())
+
+    @classmethod
+    def from_segment(cls, segment: Segment):
+        """
+        Creates a miner on a segment of export_segment without reading the regex collection and the corpus file.
+
+        The corpus is read from the segment without copying it, only the (small) regex collection and its compiled patterns are built per process.
+
+        Parameters:
+        - segment: utils.shared_segment.Segment, the attached segment
+
+        Returns:
+        - miner: StringMiner
+        """
+        meta = segment.meta
+        miner = cls.__new__(cls)
+        regex_sources = iter(segment.strings["regex_sources"])
+        miner.regex_dict = {}
+        for attribute, k, is_list, count in meta["regex_layout"]:
+            regex_list = [next(regex_sources) for _ in range(count)]
+            miner.regex_dict.setdefault(attribute, {})[k] = regex_list if is_list else (regex_list[0] if regex_list else None)
+        miner.search_strings_df = None
+        miner.re_attributes = meta["re_attributes"]
+        miner.corpus_search_cols = meta["corpus_search_cols"]
+        miner.corpus_vendor_col = meta["corpus_vendor_col"]
+        miner.compiled_patterns = miner._compile_patterns()
+        miner.corpus_tables = {column: segment.strings[f"corpus/{column}"]
+                               for column in dict.fromkeys(miner.corpus_search_cols + [miner.corpus_vendor_col])}
+        return miner
+
+    def _corpus_rows(self, vendor_filter: str = ""):
+        """
+        Yields the search attributes of the corpus rows (of the vendor) as (column, value) pairs, from the DataFrame or the segment.
+        """
+        if self.corpus_tables is None:
+            if vendor_filter:
+                search_df = self.search_strings_df[self.search_strings_df[self.corpus_vendor_col] == vendor_filter]
+                search_df = search_df[self.corpus_search_cols]
+            else:
+                search_df = self.search_strings_df[self.corpus_search_cols]
+            for _, search_attributes in search_df.iterrows():
+                yield search_attributes.items()
+            return
+        vendors = self.corpus_tables[self.corpus_vendor_col]
+        for i in range(len(vendors)):
+            if vendor_filter and vendors[i] != vendor_filter:
+                continue
+            yield ((column, self.corpus_tables[column][i]) for column in self.corpus_search_cols)
+
+    def _compile_patterns(self):
+        """
+        Compiles the regular expressions of the used attributes for 0 to MAX_PRECOMPILED_ERRORS errors.
+
+        Returns:
+        - compiled_patterns: dict, attribute -> key -> list (one entry per regex of the key) of lists of compiled patterns (index: number of errors)
+        """
+        compiled_patterns = {}
+        for attribute in self.re_attributes:
+            compiled_patterns[attribute] = {}
+            for k, regex_str in self.regex_dict[attribute].items():
+                if not regex_str:
+                    continue
+                regex_list = regex_str if type(regex_str) is list else [regex_str]
+                compiled_patterns[attribute][k] = [
+                    [regex.compile(self._fuzzy_pattern(re_str, i), flags=regex.I)
+                     for i in range(MAX_PRECOMPILED_ERRORS + 1)]
+                    for re_str in regex_list]
+        return compiled_patterns
+
+    @staticmethod
+    def _fuzzy_pattern(regex_str: str, errors: int):
+        """Regular expression allowing the given number of errors."""
+        return "(?:" + regex_str + "){e<=" + str(errors) + "}"
+
+    def _search(self, attribute: str, k: str, index: int, errors: int, target_string: str):
+        """Searches with the compiled pattern of the index-th regex of a key, patterns with more errors than MAX_PRECOMPILED_ERRORS are compiled here."""
+        if errors <= MAX_PRECOMPILED_ERRORS:
+            return self.compiled_patterns[attribute][k][index][errors].search(target_string,
+                                                                              **SEARCH_ARGS)
+        regex_str = self.regex_dict[attribute][k]
+        regex_str = regex_str[index] if type(regex_str) is list else regex_str
+        return regex.search(self._fuzzy_pattern(regex_str, errors), target_string,
+                            flags=regex.I, **SEARCH_ARGS)
+
+    def footprint(self):
+        """
+        Retained memory of the loaded regex collection and corpus.
+
+        Build the miner with utils.footprint.measure_construction(StringMiner) to add the
+        allocations traced while loading.
+
+        Returns:
+        - report: dict with the bytes per structure (regex_dict, compiled_patterns,
+          search_strings_df, corpus_tables, other) and in total
+        """
+        return footprint_report(self, {"regex_dict": self.regex_dict,
+                                       "compiled_patterns": self.compiled_patterns,
+                                       "search_strings_df": self.search_strings_df,
+                                       "corpus_tables": self.corpus_tables})
 
     def match(
         self, target_string: str, vendor_filter: str = "", strip_target: bool = False
@@ -109,17 +332,57 @@ class StringMiner:
         if strip_target:
             target_string = target_string.strip()
 
-        for attribute in self.re_attributes:
-            if (
-                matching_attributes := self._match_attribute_fuzzy(
-                    target_string, max_errors, attribute, vendor_filter
-                )
-            ) is not None:
-                if matching_attributes:
-                    result[attribute] = matching_attributes
+        mode = "match" if max_errors == 0 else "match_fuzzy"
+        with METRICS.timer("miner_call", mode=mode):
+            for attribute in self.re_attributes:
+                with METRICS.timer("miner_attribute", mode=mode, attribute=attribute):
+                    matching_attributes = self._match_attribute_fuzzy(
+                        target_string, max_errors, attribute, vendor_filter)
+                if matching_attributes is not None:
+                    if matching_attributes:
+                        result[attribute] = matching_attributes
 
         return result
 
+    def match_batch(
+        self,
+        target_strings: list,
+        max_errors: int = 0,
+        vendor_filter: str = "",
+        strip_target: bool = False,
+        workers: int = None,
+        executor: ThreadPoolExecutor = None,
+    ):
+        """
+        Matches a batch of target strings in a thread pool, every distinct string is matched once.
+
+        The compiled patterns release the GIL while matching (regex module), so the threads mine in parallel within one process and share the loaded regex collection and corpus.
+
+        Parameters:
+        - target_strings: list, the target strings to match with search strings
+        - max_errors: int, the maximum number of errors allowed in the fuzzy matching (default: 0, see match)
+        - vendor_filter: str, the vendor name to filter the search strings (default: "")
+        - strip_target: bool, whether to strip leading/trailing whitespace from the target strings (default: False)
+        - workers: int, the number of threads if no executor is given (default: number of CPUs)
+        - executor: ThreadPoolExecutor, a pool shared by several calls, e.g. of a web server (default: a pool per call)
+
+        Returns:
+        - results: list, the result dictionaries of match_fuzzy in the order of target_strings
+        """
+        distinct = list(dict.fromkeys(target_strings))
+
+        def match_one(target_string):
+            return self.match_fuzzy(target_string, max_errors, vendor_filter, strip_target)
+
+        with METRICS.timer("miner_batch", mode="match" if max_errors == 0 else "match_fuzzy"):
+            if executor is not None:
+                matched = list(executor.map(match_one, distinct))
+            else:
+                with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+                    matched = list(pool.map(match_one, distinct))
+        results = dict(zip(distinct, matched))
+        return [results[target_string] for target_string in target_strings]
+
     def _match_attribute_fuzzy(
         self, target_string: str, max_errors: int, attribute: str, vendor_filter: str = ""):
         """
@@ -142,19 +405,20 @@ class StringMiner:
             if vendor_filter and vendor_filter != k:
                 continue
             if type(regex_str) is list:
-                for re_list in regex_str:
+                for index in range(len(regex_str)):
                     for i in range(max_errors + 1):
-                        pattern = "(?:" + re_list + "){e<=" + str(i) + "}"
-                        if match := regex.search(pattern, target_string, flags=regex.I):
+                        if match := self._search(attribute, k, index, i, target_string):
                             result = match.group(0)
+                            METRICS.count("miner_pattern_hits", attribute=attribute, key=k,
+                                          errors=i)
                             break
                     if result != None:
                         break
             else:
                 for i in range(max_errors + 1):
-                    pattern = "(?:" + regex_str + "){e<=" + str(i) + "}"
-                    if match := regex.search(pattern, target_string, flags=regex.I):
+                    if match := self._search(attribute, k, 0, i, target_string):
                         result = match.group(0)
+                        METRICS.count("miner_pattern_hits", attribute=attribute, key=k, errors=i)
                         break
                 if result is not None:
                     break
@@ -205,18 +469,23 @@ class StringMiner:
         if not IS_LEV:
             return None
 
+        with METRICS.timer("miner_call", mode="match_levenshtein"):
+            result_dict = self._match_levenshtein(target_string, threshold, vendor_filter,
+                                                  strip_target)
+        if METRICS.enabled:
+            for attribute in result_dict:
+                METRICS.count("miner_levenshtein_hits", attribute=attribute)
+        return result_dict
+
+    def _match_levenshtein(self, target_string: str, threshold: float, vendor_filter: str,
+                           strip_target: bool):
+        """Levenshtein matching of match_levenshtein (without instrumentation)."""
         results = []
         if strip_target:
             target_string = target_string.strip()
 
-        if vendor_filter:
-            search_df = self.search_strings_df[self.search_strings_df[self.corpus_vendor_col] == vendor_filter]
-            search_df = search_df[self.corpus_search_cols]
-        else:
-            search_df = self.search_strings_df[self.corpus_search_cols]
-
-        for _, search_attributes in search_df.iterrows():
-            for search_key, search_string in search_attributes.items():
+        for search_attributes in self._corpus_rows(vendor_filter):
+            for search_key, search_string in search_attributes:
                 if search_string:
                     res = self._find_similar_substrings(target_string, str(search_string), threshold)
                     if len(res) > 0:
@@ -256,109 +525,47 @@ if __name__ == "__main__":
         print("Fuzzy RE   : ", sm.match_fuzzy(target_string, vendor_filter=vendor_filter, max_errors=1))
         print("Levenshtein: ", sm.match_levenshtein(target_string, vendor_filter=vendor_filter))
 
-    test_nmap = [
-        "annotation: SIMATIC S7-1500                   6ES7 672-5DC01-0YA0      0 V  2  1  7\x00",
-        "annotation: SIMATIC S7-1200                   6ES7 212-1AE40-0XB0      7 V  4  5  1\x00",
-        "annotation: SIMATIC S7-1500                   6ES7 672-5DC01-0YA0      0 V2.1.7\x00",
-        "annotation: SIMATIC S7-1200                   6ES7 212-1AE40-0XB0      7 V4.5.1\x00",
-        "annotation: SIMATIC S7-1500                   6ES7 672-5DC01-0YA0      0 V 2.1.7\x00",
-        "annotation: SIMATIC S7-1200                   6ES7 212-1AE40-0XB0      7 V 4.5.1\x00",
-        "annotation: S7-1200                   6ES7 212-1AE40-0XB0      7 V  4  5  1\x00",
-        "annotation: S7-1500                   6ES7 512-1DK01-0AB0      4 V  2  9  2\x00",
-        "annotation: AXL F BK PN               2701815                  2 V  1  0  4\x00",
-        "annotation: JVL-MOTOR                 MIS340C12EPH285          4 V  3 40 12\x00",
-        "annotation: S7=1500                   6ES7672-5DC01-0YA0      0 V  2  1  7\x00",
-        "annotation: S71200                   6ES7:212-1AE40-0XB0      7 V  4  5  1\x00",
-        "annotation: S6-1200                   6ES7 212-1AE40-0XB0      7 V  4  5  1\x00",
-        "annotation: S7-150                    6ES7 512-1DK01:0AB0      4 V  2  9  2\x00",
-        "annotation: AXL F BK PN               2701815                  2 V  1  0  4\x00",
-        "annotation: JVL-MOTOR                 MIS340C12EPH285          4 V  3 40 12\x00",
-        "annotation: PlcNext Axc f 2152",
-        "SIMATIC CP 1623 (6GK1162-3AA00)",
-        "SIMATIC CP 1628 (6GK1162-8AA00)",
-        "SIMATIC CP 1543-1 (6GK7543-1AX00-0XE0)",
-        "SIMATIC MV540 H (6GF3540-0GE10)",
-        "SIMATIC MV550 H (6GF3550-0GE10)",
-        "SIMATIC MV560 U (6GF3560-0LE10)",
-        "RUGGEDCOM RM1224 family (6GK6108-4AM00)"
-    ]
 
     # ----------- default regex ----------- #
     print("\n# ----------- default regex ----------- #")
-    for l in test_nmap:
+    for l in TEST_NMAP_ANNOTATIONS:
         print(sm.match(l))
 
     # ----------- default regex only Siemens ----------- #
     print("\n# ----------- default regex only Siemens ----------- #")
-    for l in test_nmap:
+    for l in TEST_NMAP_ANNOTATIONS:
         print(sm.match(l, vendor_filter="Siemens"))
 
     # ----------- default regex only PhoenixContact ----------- #
     print("\n# ----------- default regex only PhoenixContact ----------- #")
-    for l in test_nmap:
+    for l in TEST_NMAP_ANNOTATIONS:
         print(sm.match(l, vendor_filter="Phoenix Contact"))
 
     # ----------- default regex stripping whitespaces + ignorecase ----------- #
     print("\n# ----------- default regex stripping whitespaces + ignorecase ----------- #")
-    for l in test_nmap:
+    for l in TEST_NMAP_ANNOTATIONS:
         print(sm.match(l, strip_target=True))
 
     # ----------- Tests with fuzzy regex ----------- #
     print("\n# ----------- Tests with fuzzy regex ----------- #")
-    for l in test_nmap:
+    for l in TEST_NMAP_ANNOTATIONS:
         print(sm.match_fuzzy(l, max_errors=1))
 
     # ----------- Tests with levenshtein distance ----------- #
     print("\n# ----------- Tests with levenshtein distance ----------- #")
-    for l in test_nmap:
+    for l in TEST_NMAP_ANNOTATIONS:
         print(sm.match_levenshtein(l, 0.8))
 
     # ----------- Tests with levenshtein distance only Siemens ----------- #
     print("\n# ----------- Tests with levenshtein distance ----------- #")
-    for l in test_nmap:
+    for l in TEST_NMAP_ANNOTATIONS:
         print(sm.match_levenshtein(l, threshold=0.85, vendor_filter="Siemens"))
 
     # ----------- Some manual test string provied by BSI ----------- #
-    test_all("SSA-350757: Improper Access Control [...] Related ET200 CPUs and SIPLUS variants.")
-    test_all("SSA-350757: Improper Access Control [...] Related ET 200 CPUs and SIPLUS variants.")
-    test_all("SIMATIC CP 1623 (6GK1162-3AA00)")
-    test_all("SIMATIC CP 1628 (6GK1162-8AA00)")
-    test_all("SIMATIC CP 1543-1 (6GK7543-1AX00-0XE0)")
-    test_all("SIMATIC MV540 H (6GF3540-0GE10)")
-    test_all("SIMATIC MV550 H (6GF3550-0GE10)")
-    test_all("SIMATIC MV560 U (6GF3560-0LE10)")
-    test_all("RUGGEDCOM RM1224 family (6GK6108-4AM00)")
+    for l in TEST_MANUAL_STRINGS:
+        test_all(l)
 
     # ----------- Tests with data from Siemens CSAF files ----------- #
     print("\n# Test StringChecker with data from Siemens CSAF files")
-    test_all(
-        "SIMATIC S7-400 CPU devices contain an input validation vulnerability that could allow an attacker to create a Denial-of-Service condition."
-    )
-    test_all(
-        "A restart is needed to restore normal operations.\n\nSiemens has released an update for SIMATIC S7-410 V10 CPU family"
-    )
-    test_all("and SIMATIC S7-400 H V6 CPU family.")
-    test_all("(incl. SIPLUS variants for both) and recommends to update to the latest version.")
-    test_all("Affected models of the S7-1500 CPU product family do not contain an Immutable Root of Trust in Hardware.")
-    test_all("Two vulnerabilities have been identified in the SIMATIC S7-400 CPU family.")
-    test_all("Multiple Vulnerabilities in SCALANCE SC-600 Family before V3.0")
-    test_all("Multiple vulnerabilities affecting various third-party components of the SCALANCE SC-600 family.")
-    test_all(
-        "SIMATIC S7-1500 CPUs and related products protect the built-in global private key in a way that cannot be considered sufficient any longer."
-    )
-    test_all(
-        "SIMATIC S7-1200 CPUs and related products protect the built-in global private key in a way that cannot be considered sufficient any longer."
-    )
-    test_all("Vulnerabilities in Third-Party Component Mbed TLS of LOGO! CMR Family and SIMATIC RTU 3000 Family")
-    test_all("Web Vulnerabilities in SCALANCE S-600 Family")
-    test_all(
-        "SIMATIC S7-400 CPU devices contain an input validation vulnerability that could allow an attacker to create a Denial-of-Service condition."
-    )
-    test_all(
-        "A restart is needed to restore normal operations.\n\nSiemens has released an update for SIMATIC S7-410 V10 CPU family"
-    )
-    test_all("and SIMATIC S7-400 H V6 CPU family")
-    test_all("(incl. SIPLUS variants for both)")
-    test_all("Improper Access Control Vulnerability in TIA Portal Affecting S7-1200 and ... Web Server")
-    test_all("Improper Access Control Vulnerability in TIA Portal Affecting ... and S7-1500 CPUs Web Server")
-    test_all("(Incl. Related ET200 CPUs and SIPLUS variants)")
+    for l in TEST_CSAF_SENTENCES:
+        test_all(l)
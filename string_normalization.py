@@ -2,22 +2,400 @@
 
 import os
 import re
+import json
+import uuid
+import queue
+import atexit
+import hashlib
+import sqlite3
 import datetime
+import threading
+from collections import deque
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 from utils.string_helperfunctions import read_json_file
 from utils.string_helperfunctions import find_file
 from utils.log_class import LogStyle
+from utils.instrumentation import METRICS
+from process_csaf_files import read_csaf_store, DEFAULT_STORE_PATH
+from string_version import normalize_version_range
+
+IS_ARROW = False
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ModuleNotFoundError:
+    IS_ARROW = False
+else:
+    IS_ARROW = True
 
 #Encoding
 ENCODING = "uft-8"
 
+# Version of the vendor cleaning stages. Increase it if a stage changes its output, so
+# entries of persistent vendor caches are invalidated.
+VENDOR_PIPELINE_VERSION = "1"
+# Maximum number of vendors per lookup in the vendor cache (SQLite variable limit)
+VENDOR_CACHE_LOOKUP_SIZE = 500
+
+# Modes of the vendor audit trail: no trail, a sample of the vendors or all vendors
+AUDIT_MODES = ("off", "sampled", "full")
+DEFAULT_AUDIT_MODE = "full"
+# Fraction of the vendors written to the audit trail in mode "sampled"
+DEFAULT_AUDIT_SAMPLE_RATE = 0.1
+# ID of the run, all audit entries of a process are written to one file per run
+RUN_ID = os.environ.get("STRING_ATLAS_RUN_ID") or uuid.uuid4().hex[:12]
+
+# Backends of the vendor cleaning stages: pandas string methods or Arrow compute kernels
+VENDOR_BACKENDS = ("pandas", "arrow")
+DEFAULT_VENDOR_BACKEND = "pandas"
+# Python's \s matches unicode whitespaces, the Arrow (RE2) one only ASCII ones
+RE2_WHITESPACE = r'[\t\n\v\f\r\x{1c}-\x{1f}\x{85}\p{Z}]'
+
+# Number of rows per chunk in the chunked mode of the vendor cleaning
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Run the cleaning functions once per distinct value (factorize-then-map) by default
+DEFAULT_DEDUP = True
+
+# Leading global inline flags of a pattern, e.g. (?i)
+INLINE_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+# Patterns of the vendor cleaning stages, shared by PrecleaningVendor and normalize_vendor
+VENDOR_SPLIT = re.compile(r', | and ')
+VENDOR_BRACKETS = re.compile(r'\(.*?\)')
+VENDOR_WHITESPACES = re.compile(r'\s+')
+VENDOR_AMPERSAND = re.compile(r' & ')
+VENDOR_KG = re.compile(r'(?i)\bKG$')
+VENDOR_DOTS = re.compile(r'\s?\.$|^\.\s?|\s\.\s')
+VENDOR_SLASHES = re.compile(r'[\/\\]')
+VENDOR_COPYRIGHT = re.compile(r'(?i)\(c\)|©')
+VENDOR_URL = re.compile(r'\.(com|de|org|net|info|gov|io|uk|eu|nl|fr)$')
+VENDOR_DOUBLE_SEPARATOR = re.compile(r'(, ){2}')
+VENDOR_TRAILING_SEPARATOR = re.compile(r'\b,\s?$')
+
+
+# Cleaning config set by use_cleaning_config (e.g. of a snapshot), None reads normalisation.json
+_CLEANING_CONFIG = None
+
+
+@lru_cache(maxsize=None)
+def load_cleaning_config():
+    """Read the cleaning section of normalisation.json once per process (or return the
+    config set by use_cleaning_config).
+
+    The returned dict is shared between all callers and must not be modified."""
+    if _CLEANING_CONFIG is not None:
+        return _CLEANING_CONFIG
+    return read_json_file(find_file('normalisation.json'))['cleaning']
+
+
+def use_cleaning_config(config: dict = None):
+    """Use the given cleaning config instead of normalisation.json, None reads the file
+    again. Used to start from a snapshot (see string_snapshot.py)."""
+    global _CLEANING_CONFIG
+    _CLEANING_CONFIG = config
+    load_cleaning_config.cache_clear()
+
+
+def cleaning_config_hash():
+    """Hash of the cleaning config and the version of the vendor cleaning stages."""
+    content = json.dumps(load_cleaning_config(), sort_keys=True) + VENDOR_PIPELINE_VERSION
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _scope_pattern(pattern: str):
+    """Wrap a pattern into a group, leading global flags become flags of the group."""
+    flags = ''
+    while match := INLINE_FLAGS.match(pattern):
+        flags += match.group(1)
+        pattern = pattern[match.end():]
+    return f'(?{flags}:{pattern})' if flags else f'(?:{pattern})'
+
+
+@lru_cache(maxsize=None)
+def compile_pre_delete(patterns: tuple):
+    """Compile the pre_delete patterns into one alternation, so all fragments are deleted
+    in one pass over a string instead of one pass per pattern."""
+    return re.compile('|'.join(_scope_pattern(pattern) for pattern in patterns))
+
+
+def verify_pre_delete_pattern(values: pd.Series = None, patterns: list = None):
+    """Compare the combined pre_delete pattern with the sequential application of the
+    single patterns (as done by Series.replace with a list).
+
+    Parameters:
+        values: strings to check, default: vendors of test/vendor_testfile.csv
+        patterns: pre_delete patterns, default: pre_delete_vendor of normalisation.json
+
+    Returns:
+        DataFrame with the values where both results differ (empty if identical)
+    """
+    if values is None:
+        values = pd.read_csv("test/vendor_testfile.csv").vendor.dropna()
+    if patterns is None:
+        patterns = load_cleaning_config()['pre_delete_vendor']
+    values = pd.Series(values, dtype=object).drop_duplicates().reset_index(drop=True)
+    df = pd.DataFrame({'value': values,
+                       'sequential': values.replace(patterns, ' ', regex=True),
+                       'combined': values.str.replace(compile_pre_delete(tuple(patterns)),
+                                                      ' ', regex=True)})
+    return df[df.sequential != df.combined]
+
+
+def normalize_vendor(vendor: str):
+    """Clean a single manufacturer string without building a DataFrame.
+
+    Applies the same split, bracket, phrase and postcleaning rules as PrecleaningVendor
+    (without audit trail). Check the equivalence with verify_normalize_vendor.
+
+    Parameters:
+        vendor: raw manufacturer string, missing or empty values result in 'None'
+
+    Returns:
+        str: the cleaned manufacturer(s) separated by ', '
+    """
+    if not isinstance(vendor, str) or vendor == "":
+        vendor = 'None'
+    pre_delete = compile_pre_delete(tuple(load_cleaning_config()['pre_delete_vendor']))
+    cleaned = []
+    for part in VENDOR_SPLIT.split(vendor):
+        # precleaning
+        part = VENDOR_BRACKETS.sub(" ", part)
+        part = VENDOR_WHITESPACES.sub(" ", part).strip()
+        # phrases
+        part = pre_delete.sub(" ", part)
+        # postcleaning
+        part = VENDOR_AMPERSAND.sub(" ", part)
+        part = VENDOR_WHITESPACES.sub(" ", part)
+        part = VENDOR_KG.sub(" ", part).strip()
+        part = VENDOR_DOTS.sub("", part)
+        part = VENDOR_SLASHES.sub("", part)
+        part = VENDOR_COPYRIGHT.sub("", part)
+        cleaned.append(VENDOR_URL.sub("", part))
+    # consolidation
+    vendor_modified = VENDOR_DOUBLE_SEPARATOR.sub(', ', ', '.join(cleaned))
+    return VENDOR_TRAILING_SEPARATOR.sub('', vendor_modified)
+
+
+def verify_normalize_vendor(test_file: str = "test/vendor_testfile.csv"):
+    """Compare normalize_vendor with the DataFrame pipeline of PrecleaningVendor.
+
+    Returns:
+        DataFrame with the vendors where both results differ (empty if identical)
+    """
+    df = PrecleaningVendor(pd.read_csv(test_file)).result.drop_duplicates(subset="vendor")
+    df["vendor_scalar"] = df.vendor.apply(normalize_vendor)
+    return df[df.vendor_modified != df.vendor_scalar]
+
+
+def _to_arrow(series: pd.Series):
+    """Convert a series of strings to an Arrow string array."""
+    return pa.array(series.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+
+
+@lru_cache(maxsize=None)
+def _re2_source(source: str):
+    translated = []
+    escaped = in_class = False
+    for char in source:
+        if escaped:
+            if not in_class and char == 's':
+                translated[-1] = RE2_WHITESPACE
+            else:
+                translated.append(char)
+            escaped = False
+            continue
+        translated.append(char)
+        if char == '\\':
+            escaped = True
+        elif char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+    return ''.join(translated)
+
+
+def _re2_pattern(pattern: re.Pattern):
+    """Translate a python pattern to RE2 (Arrow), \\s matches unicode whitespaces like in
+    python. \\b of RE2 is ASCII only, unsupported syntax (e.g. look-arounds) raises
+    ArrowInvalid when used."""
+    return _re2_source(pattern.pattern)
+
+
+def verify_vendor_backend(test_file: str = "test/vendor_testfile.csv", backend: str = "arrow",
+                          reference_file: str = None):
+    """Compare the vendor cleaning of a backend with the pandas backend on the same input.
+
+    Parameters:
+        reference_file: optional reference output (e.g. test/vendor_testoutput_ref.csv)
+            checked in addition, it is only up to date for the cleaning config it was
+            created with
+
+    Returns:
+        DataFrame with the vendors where the backend differs from the pandas backend (or
+        from the reference), empty if identical
+    """
+    df_input = pd.read_csv(test_file)
+    df = PrecleaningVendor(df_input.copy(), audit="off",
+                           backend=backend).result.drop_duplicates(subset="vendor")
+    df_pandas = PrecleaningVendor(df_input, audit="off", backend="pandas").result
+    df_pandas = df_pandas.drop_duplicates(subset="vendor")[["vendor", "vendor_modified"]]
+    df = df.merge(df_pandas.rename(columns={"vendor_modified": "pandas"}), on="vendor",
+                  how="left")
+    differs = df.vendor_modified.fillna('') != df.pandas.fillna('')
+    if reference_file:
+        df_ref = pd.read_csv(reference_file).rename(columns={"vendor_modified": "reference"})
+        df = df.merge(df_ref, on="vendor", how="left")
+        differs = differs.to_numpy() | (df.vendor_modified.fillna('')
+                                        != df.reference.fillna('')).to_numpy()
+    return df[differs]
+
+
+class VendorCache():
+    """Persistent mapping of raw vendor strings to cleaned vendor strings in a SQLite file.
+
+    Entries are keyed by the raw vendor and the hash of the cleaning config, so a change of
+    normalisation.json or of the cleaning stages does not return outdated results."""
+
+    def __init__(self, cache_path: str, config_hash: str = "") -> None:
+        self.cache_path = cache_path
+        self.config_hash = config_hash or cleaning_config_hash()
+        with sqlite3.connect(self.cache_path) as con:
+            con.execute("CREATE TABLE IF NOT EXISTS vendor_cache ("
+                        "vendor TEXT NOT NULL, config_hash TEXT NOT NULL, "
+                        "vendor_modified TEXT, PRIMARY KEY (vendor, config_hash))")
+        con.close()
+
+    def get(self, vendors: list):
+        """Return the cached cleaned vendors as dict {vendor: vendor_modified}."""
+        vendors = [vendor for vendor in vendors if isinstance(vendor, str)]
+        found = {}
+        with sqlite3.connect(self.cache_path) as con:
+            for i in range(0, len(vendors), VENDOR_CACHE_LOOKUP_SIZE):
+                chunk = vendors[i:i + VENDOR_CACHE_LOOKUP_SIZE]
+                rows = con.execute("SELECT vendor, vendor_modified FROM vendor_cache "
+                                   "WHERE config_hash = ? AND vendor IN "
+                                   f"({', '.join('?' * len(chunk))})",
+                                   [self.config_hash, *chunk])
+                found.update(rows)
+        con.close()
+        return found
+
+    def put(self, mapping: dict):
+        """Store cleaned vendors given as dict {vendor: vendor_modified}."""
+        rows = [(vendor, self.config_hash, modified) for vendor, modified in mapping.items()
+                if isinstance(vendor, str)]
+        with sqlite3.connect(self.cache_path) as con:
+            con.executemany("INSERT OR REPLACE INTO vendor_cache "
+                            "(vendor, config_hash, vendor_modified) VALUES (?, ?, ?)", rows)
+        con.close()
+
+
+class VendorAuditTrail():
+    """Background writer for the manipulations of the vendor strings.
+
+    Frames passed by add are written by a separate thread as row groups of one parquet
+    file per run (logs/log_vendor_<date>_<runID>.parquet). Frames queued while a row group
+    is written are combined into the next row group. The file is completed by close,
+    which is called at exit of the process."""
+
+    def __init__(self, run_id: str = RUN_ID, directory: str = "logs") -> None:
+        time = datetime.datetime.now().strftime("%y-%m-%d")
+        self.path = os.path.join(directory, 'log_vendor_' + time + '_' + run_id + '.parquet')
+        self.log = LogStyle(module_name=self.__class__.__name__,
+                            file_name="string_normalization.py").logger
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write, name="vendor-audit", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, df: pd.DataFrame):
+        """Queue entries of the audit trail, returns without waiting for the disk."""
+        if self._thread.is_alive():
+            self._queue.put(df.astype(object).where(df.notna(), None))
+
+    def close(self):
+        """Write the queued entries and complete the parquet file."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _write(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        closed = False
+        try:
+            while not closed:
+                frames = [self._queue.get()]
+                # combine everything queued in the meantime into one row group
+                while not self._queue.empty():
+                    frames.append(self._queue.get())
+                if frames[-1] is None:
+                    closed = True
+                frames = [frame for frame in frames if frame is not None]
+                if not frames:
+                    continue
+                table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True),
+                                             schema=pa.schema([(col, pa.string())
+                                                               for col in frames[0].columns]),
+                                             preserve_index=False)
+                if writer is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    writer = pq.ParquetWriter(self.path, table.schema)
+                writer.write_table(table)
+        except Exception as e:
+            self.log.error(f"Audit trail {self.path} could not be written: {e}")
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+_AUDIT_TRAIL = None
+_AUDIT_TRAIL_LOCK = threading.Lock()
+
+
+def get_audit_trail():
+    """Return the audit trail of this process and run, it is started with the first call."""
+    global _AUDIT_TRAIL
+    with _AUDIT_TRAIL_LOCK:
+        if _AUDIT_TRAIL is None:
+            _AUDIT_TRAIL = VendorAuditTrail()
+        return _AUDIT_TRAIL
+
 
 class PrecleaningVendor():
     """Precleaning of attribute vendor."""
 
-    def __init__(self, df_load: pd.DataFrame=pd.DataFrame()) -> None:
+    def __init__(self, df_load: pd.DataFrame=pd.DataFrame(), cache_path: str = "",
+                 audit: str = DEFAULT_AUDIT_MODE,
+                 audit_sample_rate: float = DEFAULT_AUDIT_SAMPLE_RATE,
+                 backend: str = DEFAULT_VENDOR_BACKEND) -> None:
+        """
+        Parameters:
+            df_load: DataFrame with columns "vendor", "vendor_modified"
+            cache_path: path to a SQLite file used as persistent vendor cache,
+                        no cache if empty
+            audit: audit trail of the manipulations, one of AUDIT_MODES
+            audit_sample_rate: fraction of the vendors logged in audit mode "sampled"
+            backend: one of VENDOR_BACKENDS, "arrow" runs the regular expressions as Arrow
+                     compute kernels and falls back to "pandas" if pyarrow is missing
+        """
+        if audit not in AUDIT_MODES:
+            raise ValueError(f"Unknown audit mode {audit}, use one of {AUDIT_MODES}.")
+        if backend not in VENDOR_BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, use one of {VENDOR_BACKENDS}.")
         self.log = LogStyle()
+        if backend == "arrow" and not IS_ARROW:
+            self.log.logger.warning("pyarrow is not installed. Using pandas backend.")
+            backend = "pandas"
+        self.backend = backend
         self.df_init = df_load
+        self.cache = VendorCache(cache_path) if cache_path else None
+        self.audit = audit
+        self.audit_sample_rate = audit_sample_rate
         self.result = self._clean_vendor()
 
 
@@ -31,18 +409,52 @@ class PrecleaningVendor():
 
             Returns:
                 Filled columns of vendor_modified
+
+            Use clean_vendor_parquet for data which does not fit into memory.
         """
         if len(self.df_init) == 0:
-            self.df_init= pd.read_parquet(os.path.join(os.path.dirname(__file__),
-                                                       "test", "df_CSAF"))
-        df = pd.DataFrame(self.df_init.vendor.unique(), columns=["vendor"])
-        df = self._vendor_preparation(df)
-        df = self._vendor_precleaning(df)
-        df = self._vendor_phrases(df)
-        df = self._vendor_postcleaning(df)
-        self.df_init.vendor_modified = self._vendor_consolidate(df, self.df_init)
+            self.df_init = read_csaf_store()
+        METRICS.count("vendor_rows", len(self.df_init))
+        # categorical vendor columns are processed as plain strings on their unique values
+        df_fin = self._vendor_mapping(np.asarray(self.df_init.vendor.unique(), dtype=object))
+        with METRICS.timer("vendor_stage", stage="merge", backend=self.backend):
+            self.df_init.vendor_modified = self.df_init.merge(df_fin,
+                                                              on='vendor',
+                                                              how ='left',
+                                                              suffixes=('del','_fin')
+                                                              ).vendor_modified_fin
         return self.df_init
 
+    def _vendor_mapping(self, vendors: np.ndarray):
+        """Clean the unique vendors, only vendors missing in the vendor cache are processed.
+
+            Returns:
+                DataFrame with columns "vendor_modified", "vendor"
+        """
+        cached = self.cache.get(list(vendors)) if self.cache else {}
+        new_vendors = [vendor for vendor in vendors
+                       if not (isinstance(vendor, str) and vendor in cached)]
+        METRICS.count("vendor_unique", len(vendors), backend=self.backend)
+        METRICS.count("vendor_cache_hits", len(cached))
+        df_fin = pd.DataFrame({'vendor_modified': list(cached.values()),
+                               'vendor': list(cached.keys())}, dtype=object)
+        if len(new_vendors) == 0:
+            return df_fin
+        df = pd.DataFrame(np.asarray(new_vendors, dtype=object), columns=["vendor"])
+        with METRICS.timer("vendor_stage", stage="preparation", backend=self.backend):
+            df = self._vendor_preparation(df)
+        with METRICS.timer("vendor_stage", stage="precleaning", backend=self.backend):
+            df = self._vendor_precleaning(df)
+        with METRICS.timer("vendor_stage", stage="phrases", backend=self.backend):
+            df = self._vendor_phrases(df)
+        with METRICS.timer("vendor_stage", stage="postcleaning", backend=self.backend):
+            df = self._vendor_postcleaning(df)
+        with METRICS.timer("vendor_stage", stage="consolidate", backend=self.backend):
+            df_new = self._vendor_consolidate(df, new_vendors)
+        if self.cache:
+            self.cache.put(dict(zip(df_new.vendor, df_new.vendor_modified)))
+        return pd.concat([df_fin, df_new], ignore_index=True)
+
 
     def _vendor_preparation(self, df :pd.DataFrame):
         """Add new columns for string manipulation."""
@@ -51,7 +463,13 @@ class PrecleaningVendor():
         df.vendor_prep.fillna('None', inplace=True)
         df.vendor_prep.loc[df.vendor_prep == ""] = 'None'
         # single the vendor
-        df.vendor_prep = df.vendor_prep.str.split(', | and ')
+        if self.backend == "arrow":
+            splitted = pc.split_pattern_regex(_to_arrow(df.vendor_prep),
+                                              pattern=_re2_pattern(VENDOR_SPLIT))
+            df = df.iloc[pc.list_parent_indices(splitted).to_numpy()].copy()
+            df["vendor_prep"] = pc.list_flatten(splitted).to_numpy(zero_copy_only=False)
+            return df
+        df.vendor_prep = df.vendor_prep.str.split(VENDOR_SPLIT)
         #df.vendor_prep = df.vendor_prep.str.split(' and |, ')
         df = df.explode(column='vendor_prep')
         return df
@@ -60,38 +478,63 @@ class PrecleaningVendor():
         """Common precleaning."""
         df["vendor_precl"] = df.vendor_prep.copy()
         # get rid of abbreviations in brackets
-        pattern_brack = r'\(.*?\)'
-        df.vendor_precl.replace(pattern_brack," ", regex=True, inplace=True)
+        df["vendor_precl"] = self._replace(df.vendor_precl, VENDOR_BRACKETS, " ")
         # replace doubles spaces
-        df.vendor_precl.replace(r'\s+'," ", regex=True, inplace=True)
-        df.vendor_precl = df.vendor_precl.str.strip()
+        df["vendor_precl"] = self._replace(df.vendor_precl, VENDOR_WHITESPACES, " ")
+        df["vendor_precl"] = self._strip(df.vendor_precl)
         return df
 
     def _vendor_postcleaning(self, df :pd.DataFrame):
         """Postcleaning of vendor column."""
         df["vendor_poscl"] = df.vendor_del.copy()
-        df.vendor_poscl.replace(" & ", " ", regex=True, inplace=True)
-        df.vendor_poscl.replace(r'\s+'," ", regex=True, inplace=True)
-        df.vendor_poscl.replace(r'(?i)\bKG$'," ", regex=True, inplace=True)
+        df["vendor_poscl"] = self._replace(df.vendor_poscl, VENDOR_AMPERSAND, " ")
+        df["vendor_poscl"] = self._replace(df.vendor_poscl, VENDOR_WHITESPACES, " ")
+        df["vendor_poscl"] = self._replace(df.vendor_poscl, VENDOR_KG, " ")
         #replace missing . and -
-        df.vendor_poscl = df.vendor_poscl.str.strip()
-        df.vendor_poscl.replace(r'\s?\.$|^\.\s?|\s\.\s', '', regex=True, inplace=True)
+        df["vendor_poscl"] = self._strip(df.vendor_poscl)
+        df["vendor_poscl"] = self._replace(df.vendor_poscl, VENDOR_DOTS, '')
         # remove / and \ from strings and replace it with a space
-        df.vendor_poscl.replace(r'[\/\\]', '', regex=True, inplace=True)
+        df["vendor_poscl"] = self._replace(df.vendor_poscl, VENDOR_SLASHES, '')
         # remove copyright
-        df.vendor_poscl.replace(r'(?i)\(c\)|©', '', regex=True, inplace=True)
+        df["vendor_poscl"] = self._replace(df.vendor_poscl, VENDOR_COPYRIGHT, '')
         # remove url fragments
-        df.vendor_poscl.replace(r'\.(com|de|org|net|info|gov|io|uk|eu|nl|fr)$', '', regex=True, inplace=True)
+        df["vendor_poscl"] = self._replace(df.vendor_poscl, VENDOR_URL, '')
         return df
 
     def _vendor_phrases(self, df :pd.DataFrame):
         """Delete unnecessary name fragments."""
         df["vendor_del"] = df.vendor_precl.copy()
-        pre_delete = read_json_file(find_file('normalisation.json')
-                                    )['cleaning']['pre_delete_vendor']
-        df["vendor_del"] = df.vendor_del.replace(pre_delete, ' ', regex=True)
+        pre_delete = load_cleaning_config()['pre_delete_vendor']
+        # one combined pattern, check with verify_pre_delete_pattern after changing the list
+        df["vendor_del"] = self._replace(df.vendor_del, compile_pre_delete(tuple(pre_delete)), ' ')
         return df
 
+    def _replace(self, series: pd.Series, pattern: re.Pattern, repl: str):
+        """Replace all matches of pattern with the selected backend."""
+        if self.backend == "arrow":
+            array = _to_arrow(series)
+            try:
+                # word boundaries of RE2 are only equal to python for ASCII strings
+                if '\\b' in pattern.pattern and not pc.all(pc.string_is_ascii(array)).as_py():
+                    raise pa.ArrowInvalid("\\b with non ASCII strings")
+                replaced = pc.replace_substring_regex(array,
+                                                      pattern=_re2_pattern(pattern),
+                                                      replacement=repl)
+                return pd.Series(replaced.to_numpy(zero_copy_only=False), index=series.index,
+                                 dtype=object)
+            except pa.ArrowInvalid:
+                # syntax not supported by RE2, e.g. look-arounds
+                self.log.logger.debug(f"Pattern {pattern.pattern} not supported by Arrow. "
+                                      "Using pandas.")
+        return series.replace(pattern, repl, regex=True)
+
+    def _strip(self, series: pd.Series):
+        """Strip whitespaces with the selected backend."""
+        if self.backend == "arrow":
+            return pd.Series(pc.utf8_trim_whitespace(_to_arrow(series)).to_numpy(
+                zero_copy_only=False), index=series.index, dtype=object)
+        return series.str.strip()
+
     def _vendor_synonym(self, df:pd.DataFrame):
         """Deprecated."""
         from string_synonym import StringSynonym
@@ -140,8 +583,12 @@ class PrecleaningVendor():
         df.drop(['ind', 'vendor_mod_Syn'], axis=1, inplace=True)
         return df
 
-    def _vendor_consolidate(self, df :pd.DataFrame, df_load :pd.DataFrame):
-        """Delete the temporary files."""
+    def _vendor_consolidate(self, df :pd.DataFrame, vendors: list):
+        """Delete the temporary files.
+
+            Returns:
+                DataFrame with columns "vendor_modified", "vendor" for the given vendors
+        """
         # log manipulations of the vendor string
         df[[col + '_fin' for col in df.columns[1:]]] = df[df.columns[1:]].copy()
         df.vendor_precl_fin.where(~(df.vendor_precl == df.vendor_prep) , '', inplace=True)
@@ -149,28 +596,114 @@ class PrecleaningVendor():
         df.vendor_poscl_fin.where(~(df.vendor_del == df.vendor_poscl) , '', inplace=True)
         df_mod_col = [col for col in df.columns if '_fin' in col]
         df_mod_col.insert(0,'vendor')
-        time = datetime.datetime.now().strftime("%y-%m-%d")
-        df[df_mod_col].to_parquet('logs/log_vendor_'+time+'_<runID>.parquet')
+        if self.audit == "full":
+            get_audit_trail().add(df[df_mod_col])
+        elif self.audit == "sampled":
+            sample = df.vendor.drop_duplicates().sample(frac=self.audit_sample_rate)
+            get_audit_trail().add(df.loc[df.vendor.isin(sample), df_mod_col])
         # generate final column modified
         df['vendor_modified'] = ''
         df.vendor_modified.where(~(df.vendor_modified == '') , df.vendor_poscl, inplace=True)
         if len(df.groupby(df.index)['vendor_modified'].apply(list)
-            .reset_index(drop=True))!= len(df_load.vendor.unique()):
+            .reset_index(drop=True))!= len(vendors):
             print('WARNING: column modified as not as many entries as the original one! ')
         df_fin = pd.DataFrame()
         df_fin['vendor_modified'] = df.groupby(df.index)['vendor_modified'].apply(list).reset_index(
             drop=True)
         df_fin['vendor_modified'] = df_fin['vendor_modified'].str.join(', ')
-        df_fin.vendor_modified.replace(r'(, ){2}', ', ', regex=True, inplace=True)
-        df_fin.vendor_modified.replace(r'\b,\s?$', '', regex=True, inplace=True)
-        df_fin['vendor'] = df_load.vendor.unique()
-        return df_load.merge(df_fin,
-                             on='vendor',
-                             how ='left',
-                             suffixes=('del','_fin')).vendor_modified_fin
+        df_fin.vendor_modified.replace(VENDOR_DOUBLE_SEPARATOR, ', ', regex=True, inplace=True)
+        df_fin.vendor_modified.replace(VENDOR_TRAILING_SEPARATOR, '', regex=True, inplace=True)
+        df_fin['vendor'] = vendors
+        return df_fin
+
+
+def clean_vendor_parquet(target_path: str, source_path: str = DEFAULT_STORE_PATH,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE, cache_path: str = "",
+                         audit: str = DEFAULT_AUDIT_MODE):
+    """Chunked mode of PrecleaningVendor for data which does not fit into memory.
+
+    The parquet file or dataset at source_path is streamed in chunks of chunk_size rows.
+    Only vendors not seen in an earlier chunk run through PrecleaningVendor, every chunk
+    is written to target_path with the filled column vendor_modified right away. Peak
+    memory is one chunk plus the mapping of the distinct vendors.
+
+    Parameters:
+        target_path: path of the parquet file to write
+        source_path: parquet file or (partitioned) dataset, e.g. written by write_csaf_store
+        chunk_size: number of rows per chunk
+        cache_path, audit: see PrecleaningVendor
+
+    Returns:
+        number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    dataset = ds.dataset(source_path, format="parquet", partitioning="hive")
+    schema = dataset.schema
+    if "vendor_modified" in schema.names:
+        schema = schema.remove(schema.get_field_index("vendor_modified"))
+    schema = schema.append(pa.field("vendor_modified", pa.string()))
+    seen = {}
+    rows = 0
+    with pq.ParquetWriter(target_path, schema) as writer:
+        for batch in dataset.to_batches(batch_size=chunk_size):
+            vendors = batch.column("vendor").to_pylist()
+            new_vendors = [vendor for vendor in dict.fromkeys(vendors) if vendor not in seen]
+            if new_vendors:
+                df_new = PrecleaningVendor(pd.DataFrame({"vendor": new_vendors,
+                                                         "vendor_modified": ""}, dtype=object),
+                                           cache_path, audit).result
+                seen.update(zip(new_vendors, df_new.vendor_modified))
+            table = pa.Table.from_batches([batch])
+            table = table.select([name for name in table.column_names
+                                  if name != "vendor_modified"]).append_column(
+                "vendor_modified", pa.array([seen[vendor] for vendor in vendors], pa.string()))
+            writer.write_table(table.cast(schema))
+            rows += len(vendors)
+    return rows
 
 
 # helperfunctions
+def map_unique(series: pd.Series, func, dedup: bool = DEFAULT_DEDUP, report: dict = None,
+               name: str = ""):
+    '''Apply func once per distinct value of series instead of once per row.
+
+    Categorical series are processed per category, other series are factorized if dedup
+    is set and processed row by row otherwise. The results are broadcast back to the rows
+    via the codes, missing values are passed to func as NaN.
+
+    Parameters:
+        report: dict to add the numbers of rows and distinct values under name
+    '''
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        values = list(series.cat.categories) + [np.nan]
+    elif dedup:
+        codes, uniques = pd.factorize(series)
+        values = list(uniques) + [np.nan]
+    else:
+        _add_dedup_report(report, name, len(series), len(series))
+        return series.apply(func)
+    mapped = np.empty(len(values), dtype=object)
+    mapped[:] = [func(value) for value in values]
+    _add_dedup_report(report, name, len(series), len(values))
+    # code -1 (missing value) picks the last entry
+    return pd.Series(mapped[codes], index=series.index, dtype=object)
+
+def _add_dedup_report(report: dict, name: str, rows: int, calls: int):
+    if report is None:
+        return
+    entry = report.setdefault(name, {'rows': 0, 'calls': 0})
+    entry['rows'] += rows
+    entry['calls'] += calls
+    entry['dedup_ratio'] = round(entry['rows'] / entry['calls'], 2) if entry['calls'] else 1.0
+
+def dedup_report(df: pd.DataFrame):
+    '''Return the numbers of rows, function calls and the dedup ratio (rows per call) of
+    the cleaning steps run on df as DataFrame.'''
+    return pd.DataFrame.from_dict(df.attrs.get('dedup_report', {}), orient='index')
+
 def remove_special_characters(text):
     '''The remove_special_characters function is used to clean up the product names. 
     As serial numbers are often separated by a hyphen (e.g. Simatic 7SR1205-2JA87-1CAO/EE), 
@@ -204,11 +737,14 @@ def remove_special_characters(text):
         return cleaned_text
 
 # function to clean product_name and product_family, check for matches in known_branches.json
-def clean_product_column_and_extract_information(df, column_name, regex_dict):
-    # Convert all strings to lowercase
-    cleaned_column = df[column_name].str.lower().str.strip()
-    # Remove all special characters of a string that are separated by space
-    cleaned_column = cleaned_column.apply(lambda x: remove_special_characters(x) if isinstance(x, str) else None)
+def clean_product_column_and_extract_information(df, column_name, regex_dict,
+                                                 dedup: bool = DEFAULT_DEDUP):
+    # Convert all strings to lowercase and remove all special characters of a string that are
+    # separated by space (once per distinct value)
+    cleaned_column = map_unique(df[column_name],
+                                lambda x: remove_special_characters(x.lower().strip())
+                                if isinstance(x, str) else None, dedup,
+                                df.attrs.setdefault('dedup_report', {}), column_name)
     # Advanced cleaning and data extraction
     for index, value in cleaned_column.items():
         # If product_name is empty but product_family is given, copy product_family to product_name_modified
@@ -259,37 +795,248 @@ def clean_product_column_and_extract_information(df, column_name, regex_dict):
             df.at[index, 'product_version_modified'] = df.at[index, 'product_version']
     return cleaned_column
 
-def find_function_keywords(column, function_keywords):
-    function_keywords_found = []
+def _extract_product_information(value, vendor_modified, family_modified, regex_patterns):
+    '''Recognize vendor and product family of one product string (see
+    clean_product_column_and_extract_information), regex_patterns as returned by
+    compile_product_regex.'''
+    for vendor, patterns in regex_patterns:
+        for pattern in patterns:
+            if match := pattern.search(value):
+                # Recognize vendor and move product family
+                if vendor not in vendor_modified.split(', '):
+                    vendor_modified = vendor_modified + f", {vendor}" if vendor_modified else vendor
+                matched_string = match.group(0)
+                if family_modified is None:
+                    family_modified = matched_string
+                else:
+                    family_modified += ', ' + matched_string
+                # Remove matched_string from product_name
+                if matched_string in value:
+                    value = value.replace(matched_string, "").strip()
+    # Remove recognized vendor from product_name or product_family
+    if isinstance(vendor_modified, str):
+        for vendor in vendor_modified.split(', '):
+            if vendor in value:
+                value = value.replace(vendor, "").strip()
+    return value, vendor_modified, family_modified
 
-    for value in column.str.lower().str.strip():
-        if not isinstance(value, str):
-            function_keywords_found.append('')
-            continue
+@lru_cache(maxsize=None)
+def _compile_product_regex(regex_items: tuple):
+    regex_patterns = tuple((vendor, tuple(re.compile('(?i)' + pattern) for pattern in patterns))
+                           for vendor, patterns in regex_items)
+    combined = re.compile('|'.join(_scope_pattern('(?i)' + pattern)
+                                   for _, patterns in regex_items for pattern in patterns))
+    return regex_patterns, combined
+
+def compile_product_regex(regex_dict: dict):
+    '''Compile the vendor regex dict once.
+
+    Returns:
+        tuple of (vendor, compiled patterns) in the order of regex_dict and one combined
+        pattern which matches a string if any of the patterns matches it.'''
+    return _compile_product_regex(tuple((vendor, tuple(patterns))
+                                        for vendor, patterns in regex_dict.items()))
+
+def clean_product_column_and_extract_information_vectorized(df, column_name, regex_dict,
+                                                            dedup: bool = DEFAULT_DEDUP):
+    '''Same results as clean_product_column_and_extract_information, but the cleaning runs
+    once per unique combination of product string, product_family_modified and
+    vendor_modified. Strings without a hit of the combined vendor pattern skip the search
+    of the single patterns, versions are extracted column wise.'''
+    # Convert all strings to lowercase and remove all special characters
+    report = df.attrs.setdefault('dedup_report', {})
+    cleaned_column = map_unique(df[column_name],
+                                lambda x: remove_special_characters(x.lower().strip())
+                                if isinstance(x, str) else None, dedup, report, column_name)
+    valid = cleaned_column.map(lambda x: isinstance(x, str) and x != "").astype(bool)
+    # Empty values: copy product_family_modified or keep the modified column
+    cleaned_column = cleaned_column.astype(object)
+    invalid = cleaned_column.index[~valid.to_numpy()]
+    if len(invalid) and column_name == 'product_name':
+        family = df.loc[invalid, "product_family_modified"]
+        from_family = family.map(lambda x: isinstance(x, str)).to_numpy(dtype=bool)
+        cleaned_column[invalid[from_family]] = family[from_family]
+        invalid = invalid[~from_family]
+    if len(invalid):
+        cleaned_column[invalid] = df.loc[invalid, column_name + "_modified"]
+    if not valid.any():
+        return cleaned_column
+    regex_patterns, combined = compile_product_regex(regex_dict)
+    values = cleaned_column[valid]
+    unique_values = pd.Series(values.unique(), dtype=object)
+    hit_values = set(unique_values[unique_values.str.contains(combined)]) if regex_patterns \
+        else set()
+    family_exists = 'product_family_modified' in df.columns
+    vendors = df.loc[valid, 'vendor_modified'].tolist()
+    families = df.loc[valid, 'product_family_modified'].tolist() if family_exists \
+        else [None] * len(values)
+    # process every unique combination once, the family is only used by hits
+    results = {}
+    new_values, new_vendors, new_families = [], [], []
+    for value, vendor_modified, family_modified in zip(values, vendors, families):
+        hit = value in hit_values
+        key = (value, vendor_modified, family_modified if hit else None)
+        if key not in results:
+            results[key] = _extract_product_information(value, vendor_modified,
+                                                        family_modified,
+                                                        regex_patterns if hit else ())
+        result = results[key]
+        new_values.append(result[0])
+        new_vendors.append(result[1])
+        new_families.append(result[2] if hit else family_modified)
+    _add_dedup_report(report, column_name + '_extract_information', len(values), len(results))
+    index = values.index
+    new_values = pd.Series(new_values, index=index, dtype=object)
+    changed = pd.Series([new is not old for new, old in zip(new_vendors, vendors)], index=index)
+    if changed.any():
+        df.loc[changed[changed].index, 'vendor_modified'] = \
+            pd.Series(new_vendors, index=index, dtype=object)[changed]
+    changed = pd.Series([new is not old for new, old in zip(new_families, families)], index=index)
+    if changed.any():
+        if not family_exists:
+            df['product_family_modified'] = pd.Series(np.nan, index=df.index, dtype=object)
+        df.loc[changed[changed].index, 'product_family_modified'] = \
+            pd.Series(new_families, index=index, dtype=object)[changed]
+    cleaned_column[valid] = new_values
+    # Try to recognize version information from product_names and add it
+    version = df.loc[valid, 'product_version']
+    version_given = version.map(lambda x: isinstance(x, str)).astype(bool)
+    version_found = new_values[~version_given].str.extract(r'(v\d+)$')[0].dropna()
+    version_modified = pd.concat([version[version_given].astype(object), version_found])
+    if len(version_modified):
+        if 'product_version_modified' not in df.columns:
+            df['product_version_modified'] = pd.Series(np.nan, index=df.index, dtype=object)
+        df.loc[version_modified.index, 'product_version_modified'] = version_modified
+    return cleaned_column
+
+class KeywordAutomaton():
+    """Aho-Corasick automaton built once from a list of keywords.
+
+    One pass over a string reports the positions of all keywords in it, so the cost
+    depends on the length of the string and not on the number of keywords."""
+
+    def __init__(self, keywords: list) -> None:
+        self.keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+        # position of each keyword in the list, orders the hits like the keyword list
+        self.rank = {keyword: rank for rank, keyword in enumerate(self.keywords)}
+        # goto[state] maps a character to the next state, out[state] are the keyword ids
+        # ending in state, fail[state] is the state of the longest proper suffix
+        self._goto = [{}]
+        self._out = [[]]
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append(keyword_id)
+        self._fail = [0] * len(self._goto)
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0) \
+                    if self._goto[fail].get(char, 0) != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def hits(self, text: str):
+        """Return all occurrences as list of (start, end, keyword) ordered by end."""
+        found = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword_id in self._out[state]:
+                keyword = self.keywords[keyword_id]
+                found.append((position + 1 - len(keyword), position + 1, keyword))
+        return found
 
+    def find(self, text: str):
+        """Return the set of keywords contained in text (substring match)."""
+        return {keyword for _, _, keyword in self.hits(text)}
+
+    def word_hits(self, text: str):
+        """Return the occurrences with word boundaries at both ends, like r'\\bkeyword\\b'."""
+        return [(start, end, keyword) for start, end, keyword in self.hits(text)
+                if _is_word_boundary(text, start) and _is_word_boundary(text, end)]
+
+    def remove(self, text: str, keywords=None):
+        """Remove the occurrences of keywords (default: all) with word boundaries from text.
+
+        Overlapping occurrences are resolved in the order of the keywords, like removing
+        one keyword after the other with re.sub."""
+        hits = self.word_hits(text)
+        if keywords is not None:
+            allowed = set(keywords)
+            hits = [hit for hit in hits if hit[2] in allowed]
+        hits = sorted(hits, key=lambda hit: (self.rank[hit[2]], hit[0]))
+        removed = []
+        for start, end, _ in hits:
+            if all(end <= other_start or start >= other_end
+                   for other_start, other_end in removed):
+                removed.append((start, end))
+        for start, end in sorted(removed, reverse=True):
+            text = text[:start] + text[end:]
+        return text
+
+
+def _is_word_char(char: str):
+    return char.isalnum() or char == '_'
+
+
+def _is_word_boundary(text: str, position: int):
+    """Same as \\b of the re module at the position of text."""
+    before = position > 0 and _is_word_char(text[position - 1])
+    after = position < len(text) and _is_word_char(text[position])
+    return before != after
+
+
+def find_function_keywords(column, function_keywords, automaton: KeywordAutomaton = None,
+                           dedup: bool = DEFAULT_DEDUP, report: dict = None):
+    if automaton is None:
+        automaton = KeywordAutomaton(function_keywords)
+
+    def keywords_in(value):
+        if not isinstance(value, str):
+            return ''
         # 100% (direct) Match
-        found_keywords = [keyword for keyword in function_keywords if keyword in value]
-        function_keywords_found.append(', '.join(found_keywords) if found_keywords else '')
+        found_keywords = sorted(automaton.find(value.lower().strip()),
+                                key=automaton.rank.__getitem__)
+        return ', '.join(found_keywords) if found_keywords else ''
 
-    return function_keywords_found
+    return map_unique(column, keywords_in, dedup, report,
+                      f'{column.name}_function_keywords').tolist()
 
-def clean_dataframe_product(df):
+def clean_dataframe_product(df, dedup: bool = DEFAULT_DEDUP):
     '''
     filepath='./data/knownBranches.json'
     known_branches = ['ERROR: replace me since load_known_branches(filepath) is not working anymore!']
     regex_patterns = known_branches.get('product_regex', {})
     function_keywords = known_branches.get('function_keywords', [])
     '''
-    regex_patterns = r''
+    regex_patterns = {}
     function_keywords = []
 
     # Cleaning the 'product_name' and 'product_family' columns
-    df['product_family_modified'] = clean_product_column_and_extract_information(df, 'product_family', regex_patterns)
-    df['product_name_modified'] = clean_product_column_and_extract_information(df,'product_name', regex_patterns)
+    df['product_family_modified'] = clean_product_column_and_extract_information_vectorized(
+        df, 'product_family', regex_patterns, dedup)
+    df['product_name_modified'] = clean_product_column_and_extract_information_vectorized(
+        df, 'product_name', regex_patterns, dedup)
     #df['product_family_modified'] = clean_product_column_and_extract_information(df, 'product_family', regex_patterns)
     # Finding function keywords
-    function_keywords_name = find_function_keywords(df['product_name'], function_keywords)
-    function_keywords_family = find_function_keywords(df['product_family'], function_keywords)
+    report = df.attrs.setdefault('dedup_report', {})
+    automaton = KeywordAutomaton(function_keywords)
+    function_keywords_name = find_function_keywords(df['product_name'], function_keywords,
+                                                    automaton, dedup, report)
+    function_keywords_family = find_function_keywords(df['product_family'], function_keywords,
+                                                      automaton, dedup, report)
 
     # Combining the keywords
     df['function_keywords_found'] = [', '.join(filter(None, fk)) for fk in zip(function_keywords_name, function_keywords_family)]
@@ -298,36 +1045,40 @@ def clean_dataframe_product(df):
     df['function_keywords_found'] = df['function_keywords_found'].apply(lambda x: ', '.join(set(x.split(', '))))
     df['vendor_modified'] = df['vendor_modified'].apply(lambda x: ', '.join(set(x.split(', '))) if isinstance(x, str) else None)
 
-    # Removing the found keywords from the modified columns
-    for index, row in df.iterrows():
-        # Ensure function_keywords_found is a string
-        keywords_found = str(row['function_keywords_found']).split(', ') if pd.notna(row['function_keywords_found']) else []
-        for keyword in keywords_found:
-            # remove from product_name_modified
-            try:
-                # Ensure product_name_modified is a string
-                if pd.notna(row['product_name_modified']):
-                    pattern = r'\b' + re.escape(keyword) + r'\b'
-                    df.at[index, 'product_name_modified'] = re.sub(pattern, '', df.at[index, 'product_name_modified'])
-            except KeyError:
-                continue
-            # remove from product_family_modified
-            try:
-                # Ensure product_family_modified is a string
-                if pd.notna(row['product_family_modified']):
-                    pattern = r'\b' + re.escape(keyword) + r'\b'
-                    df.at[index, 'product_family_modified'] = re.sub(pattern, '', df.at[index, 'product_family_modified'])
-            except KeyError:
+    # Removing the found keywords from the modified columns in one pass per value
+    # (once per distinct combination of value and keywords with dedup)
+    for column in ['product_name_modified', 'product_family_modified']:
+        removed = {}
+        cleaned = []
+        rows = calls = 0
+        for value, keywords in zip(df[column], df['function_keywords_found']):
+            if not (pd.notna(value) and keywords):
+                cleaned.append(value)
                 continue
+            rows += 1
+            if not dedup or (value, keywords) not in removed:
+                calls += 1
+                removed[(value, keywords)] = automaton.remove(value, keywords.split(', '))
+            cleaned.append(removed[(value, keywords)])
+        df[column] = cleaned
+        _add_dedup_report(report, column + '_function_keywords_removal', rows, calls)
     return df
 
-def clean_dataframe_version(df):
-    df['product_version_modified'] = df['product_version_modified'].apply(lambda x: remove_letters_from_string(str(x)))
+def clean_dataframe_version(df, dedup: bool = DEFAULT_DEDUP):
+    df['product_version_modified'] = map_unique(df['product_version_modified'],
+                                                lambda x: remove_letters_from_string(str(x)),
+                                                dedup, df.attrs.setdefault('dedup_report', {}),
+                                                'product_version_modified')
     return df
 
-def clean_dataframe_version_range(df):
-    df['product_version_range_modified'] = df['product_version_range'].copy()
-    # more cleaning here
+def clean_dataframe_version_range(df, dedup: bool = DEFAULT_DEDUP):
+    '''Write the version ranges as vers:<scheme>/... with numeric versions (see
+    string_version.py), ranges which can not be parsed are kept unchanged.'''
+    df['product_version_range_modified'] = map_unique(df['product_version_range'],
+                                                      lambda value: normalize_version_range(value)
+                                                      or value, dedup,
+                                                      df.attrs.setdefault('dedup_report', {}),
+                                                      'product_version_range_modified')
     return df
 
 def remove_letters_from_string(text):
@@ -0,0 +1,385 @@
+"""Module provides a local HTTP service holding warm StringMiner, StringChecker and
+StringSynonym instances.
+
+    The components are loaded once at start, so the callers (e.g. jobs of the DDDC Netbox
+    plugin) do not pay the loading of the corpus, the regex collection, the synonyms and the
+    spell checkers per job. All endpoints take and return JSON and work on batches:
+
+        POST /vendor/normalize    {"values": [...]}
+        POST /synonym/normalize   {"values": [...], "dictionary": "Manufacturer"}
+        POST /checker/correct     {"values": [...], "method": "check_best_candidate"}
+        POST /miner/match         {"values": [...], "mode": "match", "vendor_filter": ""}
+        GET  /health              loaded components
+        GET  /metrics             utils.instrumentation.METRICS in Prometheus text format
+
+    Answer: {"results": [...]} in the order of the values.
+
+    Concurrent requests with the same options are coalesced into one batch, every distinct
+    value of a batch is processed once. If a batch fails, its requests are repeated one by
+    one, so only the request causing the error fails. Every component is used by one worker
+    thread only, except the regex matching of the miner, which spreads a batch over a thread
+    pool (the compiled patterns release the GIL, see StringMiner.match_batch).
+    The number of requests in process is limited, further requests get status 503.
+
+    python string_service.py --port 8765 --components vendor synonym miner checker
+
+    With --snapshot the components are created from a snapshot file (string_snapshot.py)
+    instead of their source files.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from utils.log_class import LogStyle
+from utils.instrumentation import METRICS
+
+# Address of the service, only local connections by default
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Components loaded at start
+COMPONENTS = ("vendor", "synonym", "checker", "miner")
+# Maximum number of requests in process, further requests are rejected with 503
+DEFAULT_MAX_CONCURRENT = 16
+# Time a request waits for a free slot before it is rejected (seconds)
+DEFAULT_ADMISSION_TIMEOUT = 1.0
+# Time the worker waits for further requests to coalesce into a batch (seconds)
+DEFAULT_BATCH_WAIT = 0.005
+# Maximum number of values processed in one batch
+DEFAULT_MAX_BATCH = 1000
+# Maximum number of values of a single request
+MAX_REQUEST_VALUES = 10000
+# Maximum size of a request body in bytes
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+# Maximum max_errors of the miner, larger values would compile new patterns per value
+# (precompiled up to MAX_PRECOMPILED_ERRORS of string_miner.py)
+MAX_MINER_ERRORS = 2
+# Threads mining a batch of the miner in parallel
+DEFAULT_MINER_THREADS = os.cpu_count() or 1
+# Methods of StringChecker which can be called
+CHECKER_METHODS = ("check_best_candidate", "check_best_candidate_split", "check_candidates")
+# Modes of StringMiner which can be called
+MINER_MODES = ("match", "match_fuzzy", "match_levenshtein")
+
+
+class BatchCoalescer:
+    """
+    Collects the values of concurrent requests into batches for a single worker thread.
+
+    Requests with the same options are merged, every distinct value is processed once per
+    batch and the results are handed back to the waiting requests.
+    """
+
+    def __init__(self, name: str, process, max_batch: int = DEFAULT_MAX_BATCH,
+                 batch_wait: float = DEFAULT_BATCH_WAIT) -> None:
+        """
+        Parameters:
+        - name: str, name of the endpoint (thread name and metrics label)
+        - process: callable(values: list, options: tuple) -> list of results per value
+        - max_batch: int, maximum number of distinct values per batch
+        - batch_wait: float, time to wait for further requests after the first one
+        """
+        self.name = name
+        self.process = process
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name=f"coalescer-{name}", daemon=True)
+        self.worker.start()
+
+    def submit(self, values: list, options: tuple = ()):
+        """Queues the values of a request, the Future returns the results."""
+        future = Future()
+        self.requests.put((values, options, future))
+        return future
+
+    def _collect(self):
+        """First waiting request and all requests arriving within batch_wait."""
+        batch = [self.requests.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.batch_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[1], []).append(request)
+            for options, requests in groups.items():
+                unique = list(dict.fromkeys(value for values, _, _ in requests
+                                            for value in values))
+                METRICS.count("service_batch_values", len(unique), endpoint=self.name)
+                METRICS.count("service_batch_requests", len(requests), endpoint=self.name)
+                try:
+                    with METRICS.timer("service_batch", endpoint=self.name):
+                        results = dict(zip(unique, self.process(unique, options)))
+                except Exception as e:
+                    if len(requests) == 1:
+                        requests[0][2].set_exception(e)
+                    else:
+                        # the failure is kept with the request(s) causing it
+                        METRICS.count("service_batch_retries", endpoint=self.name)
+                        self._run_single(requests, options)
+                    continue
+                for values, _, future in requests:
+                    future.set_result([results[value] for value in values])
+
+    def _run_single(self, requests: list, options: tuple):
+        """Processes the requests of a failed batch one by one."""
+        for values, _, future in requests:
+            unique = list(dict.fromkeys(values))
+            try:
+                results = dict(zip(unique, self.process(unique, options)))
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            future.set_result([results[value] for value in values])
+
+
+class StringService:
+    """Warm components and their coalescers."""
+
+    def __init__(self, components: tuple = COMPONENTS, max_batch: int = DEFAULT_MAX_BATCH,
+                 batch_wait: float = DEFAULT_BATCH_WAIT,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 miner_threads: int = DEFAULT_MINER_THREADS, snapshot: str = None) -> None:
+        """
+        Loads the components (from the snapshot file if given, components missing in the
+        snapshot from their source files). A component which can not be loaded (missing
+        package, data file or stale snapshot) is reported by /health and its endpoint
+        answers with 503.
+        """
+        self.logger = LogStyle(module_name=self.__class__.__name__,
+                               file_name="string_service.py").logger
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.errors = {}
+        self.instances = {}
+        loaders = {"vendor": self._load_vendor, "synonym": self._load_synonym,
+                   "checker": self._load_checker, "miner": self._load_miner}
+        self.snapshot = None
+        if snapshot is not None:
+            from string_snapshot import Snapshot
+            try:
+                self.snapshot = Snapshot(snapshot)
+            except (OSError, ValueError) as e:
+                self.errors.update({component: f"{type(e).__name__}: {e}"
+                                    for component in components})
+                self.logger.warning(f"Snapshot {snapshot} not loaded: {e}")
+                components = ()
+            else:
+                for component in self.snapshot.components:
+                    loaders[component] = lambda name=component: self.snapshot.component(name)
+        for component in components:
+            start = time.perf_counter()
+            try:
+                self.instances[component] = loaders[component]()
+            except Exception as e:  # missing optional package or data file
+                self.errors[component] = f"{type(e).__name__}: {e}"
+                self.logger.warning(f"Component {component} not loaded: {e}")
+                continue
+            self.logger.info(f"Component {component} loaded in "
+                             f"{time.perf_counter() - start:.2f} s.")
+        processes = {"vendor": self._vendor, "synonym": self._synonym,
+                     "checker": self._checker, "miner": self._miner}
+        self.miner_pool = (ThreadPoolExecutor(miner_threads, thread_name_prefix="miner")
+                           if "miner" in self.instances else None)
+        self.coalescers = {component: BatchCoalescer(component, processes[component],
+                                                     max_batch, batch_wait)
+                           for component in self.instances}
+
+    @staticmethod
+    def _load_vendor():
+        from string_normalization import normalize_vendor
+        normalize_vendor("")  # loads and compiles the cleaning configuration
+        return normalize_vendor
+
+    @staticmethod
+    def _load_synonym():
+        from string_synonym import StringSynonym
+        return StringSynonym()
+
+    @staticmethod
+    def _load_checker():
+        from string_checker import StringChecker
+        return StringChecker()
+
+    @staticmethod
+    def _load_miner():
+        from string_miner import StringMiner
+        return StringMiner()
+
+    def _vendor(self, values: list, options: tuple):
+        return [self.instances["vendor"](value) for value in values]
+
+    def _synonym(self, values: list, options: tuple):
+        dictionary, = options
+        return [self.instances["synonym"].normalize(value, dictionary) for value in values]
+
+    def _checker(self, values: list, options: tuple):
+        method = getattr(self.instances["checker"], options[0])
+        return [method(value) for value in values]
+
+    def _miner(self, values: list, options: tuple):
+        mode, vendor_filter, parameter = options
+        miner = self.instances["miner"]
+        if mode == "match":
+            return miner.match_batch(values, 0, vendor_filter, executor=self.miner_pool)
+        if mode == "match_fuzzy":
+            return miner.match_batch(values, parameter, vendor_filter, executor=self.miner_pool)
+        return [miner.match_levenshtein(value, parameter, vendor_filter) for value in values]
+
+    @staticmethod
+    def options(component: str, body: dict):
+        """Options of a request which have to be equal to coalesce requests.
+
+        Raises ValueError for invalid options."""
+        if component == "synonym":
+            return (str(body.get("dictionary", "")),)
+        if component == "checker":
+            method = body.get("method", CHECKER_METHODS[0])
+            if method not in CHECKER_METHODS:
+                raise ValueError(f"Unknown method {method}, use one of {CHECKER_METHODS}.")
+            return (method,)
+        if component == "miner":
+            mode = body.get("mode", MINER_MODES[0])
+            if mode not in MINER_MODES:
+                raise ValueError(f"Unknown mode {mode}, use one of {MINER_MODES}.")
+            if mode == "match_levenshtein":
+                parameter = float(body.get("threshold", 0.85))
+                if not 0 <= parameter <= 1:
+                    raise ValueError("threshold must be between 0 and 1.")
+            else:
+                parameter = int(body.get("max_errors", 1))
+                if not 0 <= parameter <= MAX_MINER_ERRORS:
+                    raise ValueError(f"max_errors must be between 0 and {MAX_MINER_ERRORS}.")
+            return (mode, str(body.get("vendor_filter", "")), parameter)
+        return ()
+
+    def health(self):
+        return {"loaded": sorted(self.instances), "errors": self.errors}
+
+
+# Endpoint path -> component
+ENDPOINTS = {"/vendor/normalize": "vendor", "/synonym/normalize": "synonym",
+             "/checker/correct": "checker", "/miner/match": "miner"}
+
+
+class StringServiceHandler(BaseHTTPRequestHandler):
+    """JSON handler of the endpoints, the service is set at the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        content = (body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+                   ).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        self.server.service.logger.debug(format % args)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._send(200, service.health())
+        elif self.path == "/metrics":
+            self._send(200, METRICS.to_prometheus(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        component = ENDPOINTS.get(self.path)
+        if component is None:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_REQUEST_BYTES:
+            self._send(413, {"error": f"Request larger than {MAX_REQUEST_BYTES} bytes."})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            values = body["values"]
+            if not isinstance(values, list) or len(values) > MAX_REQUEST_VALUES:
+                raise ValueError(f"values must be a list of at most {MAX_REQUEST_VALUES} "
+                                 "strings.")
+            values = [value if isinstance(value, str) else "" for value in values]
+            options = service.options(component, body)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            self._send(400, {"error": f"Invalid request: {e}"})
+            return
+        if component not in service.coalescers:
+            self._send(503, {"error": f"Component {component} not loaded: "
+                                      f"{service.errors.get(component, 'not requested')}"})
+            return
+        if not service.slots.acquire(timeout=DEFAULT_ADMISSION_TIMEOUT):
+            METRICS.count("service_rejected", endpoint=component)
+            self._send(503, {"error": "Too many requests in process."})
+            return
+        try:
+            with METRICS.timer("service_request", endpoint=component):
+                results = service.coalescers[component].submit(values, options).result()
+            self._send(200, {"results": results})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            service.slots.release()
+
+
+def create_server(service: StringService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """HTTP server of the service (port 0 chooses a free port, see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), StringServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv: list = None):
+    """Command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(description="Local HTTP service of String-Atlas.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--components", nargs="+", choices=COMPONENTS, default=COMPONENTS)
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--batch-wait-ms", type=float, default=DEFAULT_BATCH_WAIT * 1000)
+    parser.add_argument("--miner-threads", type=int, default=DEFAULT_MINER_THREADS)
+    parser.add_argument("--snapshot", help="snapshot file of string_snapshot.py")
+    args = parser.parse_args(argv)
+    service = StringService(tuple(args.components), args.max_batch, args.batch_wait_ms / 1000,
+                            args.max_concurrent, args.miner_threads, args.snapshot)
+    server = create_server(service, args.host, args.port)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]} "
+          f"({', '.join(sorted(service.instances))})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
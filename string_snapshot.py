@@ -0,0 +1,236 @@
+"""Module provides a warm-start snapshot of the loaded components.
+
+    Loading re_data.yaml, device_list.xlsx (miner and checker), synonym_list.yaml
+    and normalisation.json and building the derived structures takes seconds.
+    The snapshot builder loads everything once and writes the derived structures into one
+    file with the layout of utils/shared_segment.py:
+
+        miner/...     regex sources and corpus columns (StringMiner.segment_content)
+        checker/...   spell dictionaries with hash indexes and custom words
+        synonym/...   synonym frame (index, columns, cells)
+        meta          cleaning config, the meta data of the components, the
+                      snapshot format version and the checksums (sha256) of the source files
+
+    At start the file is mapped (mmap) and the components are created from it. Corpus and
+    spell dictionaries are read from the mapped pages, processes on the same host share
+    them. A snapshot is stale if a source file changed after it was built: size or
+    modification time differ and the sha256 differs.
+
+    python string_snapshot.py build string_atlas.snapshot
+    python string_snapshot.py check string_atlas.snapshot
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import datetime
+from utils.string_helperfunctions import find_file
+from utils.shared_segment import Segment, write_segment_file
+from utils.log_class import LogStyle
+
+# Version of the snapshot content, snapshots of other versions have to be built again
+SNAPSHOT_FORMAT_VERSION = 1
+# Components of a snapshot
+COMPONENTS = ("vendor", "synonym", "checker", "miner")
+# Source files per component (searched by find_file)
+SOURCE_FILES = {"vendor": ["normalisation.json"],
+                "synonym": ["synonym_list.yaml", "normalisation.json"],
+                "checker": ["device_list.xlsx"],
+                "miner": ["re_data.yaml", "device_list.xlsx"]}
+# Block size for the checksums of the source files
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def file_checksum(path: str):
+    """sha256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(CHECKSUM_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_info(path: str):
+    """Path, size, modification time and sha256 of a source file."""
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_checksum(path)}
+
+
+def _prefixed(content: dict, prefix: str):
+    """Content of a component with prefixed names of the string tables and arrays."""
+    return {"strings": {prefix + name: values for name, values in content["strings"].items()},
+            "arrays": {prefix + name: values
+                       for name, values in content.get("arrays", {}).items()},
+            "indexes": [prefix + name for name in content.get("indexes", [])],
+            "meta": content["meta"]}
+
+
+def build_snapshot(path: str, components: tuple = COMPONENTS):
+    """
+    Loads the components and writes their derived structures into a snapshot file.
+
+    Parameters:
+    - path: str, snapshot file (replaced)
+    - components: tuple, components of the snapshot (see COMPONENTS)
+
+    Returns:
+    - meta: dict, meta data of the snapshot
+    """
+    components = [component for component in COMPONENTS if component in components]
+    sources = {}
+    for component in components:
+        for file_name in SOURCE_FILES[component]:
+            if file_name not in sources:
+                file_path = find_file(file_name)
+                if not file_path:
+                    raise FileNotFoundError(f"Source file {file_name} of {component} not found.")
+                sources[file_name] = source_info(file_path)
+
+    contents = []
+    meta = {"snapshot_format": SNAPSHOT_FORMAT_VERSION,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "sources": sources, "components": {}}
+    if "vendor" in components:
+        from string_normalization import load_cleaning_config, VENDOR_PIPELINE_VERSION
+        meta["components"]["vendor"] = {"cleaning_config": load_cleaning_config(),
+                                        "pipeline_version": VENDOR_PIPELINE_VERSION}
+    if "synonym" in components:
+        from string_synonym import StringSynonym
+        contents.append(("synonym", StringSynonym().segment_content()))
+    if "checker" in components:
+        from string_checker import StringChecker
+        contents.append(("checker", StringChecker().segment_content()))
+    if "miner" in components:
+        from string_miner import StringMiner
+        contents.append(("miner", StringMiner().segment_content()))
+
+    strings, arrays, indexes = {}, {}, []
+    for component, content in contents:
+        content = _prefixed(content, component + "/")
+        strings.update(content["strings"])
+        arrays.update(content["arrays"])
+        indexes.extend(content["indexes"])
+        meta["components"][component] = content["meta"]
+    write_segment_file(path, strings, arrays, meta, indexes)
+    return meta
+
+
+class Snapshot:
+    """
+    Mapped snapshot file, creates the components without reading their source files.
+
+        snapshot = Snapshot("string_atlas.snapshot")
+        miner = snapshot.component("miner")
+    """
+
+    def __init__(self, path: str, allow_stale: bool = False) -> None:
+        """
+        Maps the snapshot and checks its version and its source files.
+
+        Parameters:
+        - path: str, snapshot file of build_snapshot
+        - allow_stale: bool, use a snapshot whose source files changed (logged), otherwise
+          ValueError is raised
+        """
+        self.logger = LogStyle(module_name=self.__class__.__name__,
+                               file_name="string_snapshot.py").logger
+        self.path = path
+        self.segment = Segment.from_file(path)
+        self.meta = self.segment.meta
+        version = self.meta.get("snapshot_format")
+        if version != SNAPSHOT_FORMAT_VERSION:
+            self.segment.close()
+            raise ValueError(f"Snapshot {path} has format version {version}, expected "
+                             f"{SNAPSHOT_FORMAT_VERSION}. Build it again.")
+        stale = self.stale_sources()
+        if stale and not allow_stale:
+            self.segment.close()
+            raise ValueError(f"Snapshot {path} is stale, changed source files: "
+                             f"{', '.join(stale)}. Build it again.")
+        if stale:
+            self.logger.warning(f"Snapshot {path} is stale, changed source files: "
+                                f"{', '.join(stale)}.")
+
+    @property
+    def components(self):
+        return list(self.meta["components"])
+
+    def stale_sources(self):
+        """Source files which changed (or are missing) since the snapshot was built.
+        Only files with another size or modification time are hashed again."""
+        stale = []
+        for file_name, info in self.meta["sources"].items():
+            try:
+                stat = os.stat(info["path"])
+            except FileNotFoundError:
+                stale.append(file_name)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) == (info["size"], info["mtime_ns"]):
+                continue
+            if stat.st_size != info["size"] or file_checksum(info["path"]) != info["sha256"]:
+                stale.append(file_name)
+        return stale
+
+    def component(self, name: str):
+        """
+        Creates a component from the snapshot.
+
+        Parameters:
+        - name: str, one of the components of the snapshot
+
+        Returns:
+        - vendor: normalize_vendor (using the cleaning config of the snapshot), otherwise
+          the StringSynonym, StringChecker or StringMiner instance
+        """
+        if name not in self.meta["components"]:
+            raise KeyError(f"Component {name} is not part of the snapshot {self.path}.")
+        meta = self.meta["components"][name]
+        if name == "vendor":
+            from string_normalization import normalize_vendor, use_cleaning_config
+            use_cleaning_config(meta["cleaning_config"])
+            return normalize_vendor
+        view = self.segment.view(name + "/", meta)
+        if name == "synonym":
+            from string_synonym import StringSynonym
+            return StringSynonym.from_segment(view)
+        if name == "checker":
+            from string_checker import StringChecker
+            return StringChecker.from_segment(view)
+        from string_miner import StringMiner
+        return StringMiner.from_segment(view)
+
+
+def main(argv: list = None):
+    """Command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(description="Warm-start snapshot of String-Atlas.")
+    parser.add_argument("command", choices=("build", "check"))
+    parser.add_argument("path", help="snapshot file")
+    parser.add_argument("--components", nargs="+", choices=COMPONENTS, default=COMPONENTS)
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        start = time.perf_counter()
+        meta = build_snapshot(args.path, tuple(args.components))
+        print(f"Snapshot {args.path} with {', '.join(meta['components'])} built in "
+              f"{time.perf_counter() - start:.2f} s ({os.path.getsize(args.path)} bytes).")
+        return 0
+    start = time.perf_counter()
+    try:
+        snapshot = Snapshot(args.path, allow_stale=True)
+    except ValueError as e:
+        print(e)
+        return 1
+    for name in snapshot.components:
+        snapshot.component(name)
+    stale = snapshot.stale_sources()
+    print(json.dumps({"path": args.path, "created": snapshot.meta["created"],
+                      "components": snapshot.components, "stale_sources": stale,
+                      "load_s": round(time.perf_counter() - start, 3)}, indent=2))
+    return 1 if stale else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,13 +19,63 @@ import pandas as pd
 import numpy as np
 from utils.string_helperfunctions import find_file
 from utils.log_class import LogStyle, log_test
-from string_normalization import PrecleaningVendor
+from utils.instrumentation import METRICS
+from utils.footprint import footprint_report
+from string_normalization import normalize_vendor
 # Default path to files for loading custom synonym words.
 DEFAULT_SYNONYM_FILENAME = "synonym_list.yaml"
 
 # ENCODING
 ENCODING = 'utf-8'
 
+# Test cases (test string, specific dictionary) of the examples and the benchmarks (see
+# benchmarks/bench_strings.py). The expected master words are listed in the same order in
+# test/synonym_test_ref.txt
+TEST_SYNONYM_CASES = [
+    # Test self synonyms
+    ("Hersteller", ""),
+    ("device role", ""),
+    ("device-role", ""),
+
+    # Test multiple hits
+    ("LS", ""),
+    ("ge", ""),
+
+    # Test "Manufacturer"
+    ("io device", ""),
+    ("SIEMENS", ""),
+    ("Phoenix Contact GmbH", ""),
+    ("PxC", ""),
+    ("Asea Brown Boveri", ""),
+    ("Dräger", ""),
+
+    # Test "Manufacturer" synonyms under restriction of the search space
+    ("SIEMENS", "Device Role"),  # returns '' because of lookup in wrong search space
+    ("SIEMENS", "Manufacturer"),
+    ("siemens.com", "Manufacturer"),
+    ("Phoenix Contact GmbH", "Manufacturer"),
+    ("PxC", "Manufacturer"),
+    ("Asea Brown Boveri", "Manufacturer"),
+
+    # Test "Device Role" synonyms
+    ("PLC", ""),
+    ("SPS", ""),
+    ("io device", ""),
+    ("Firewall", ""),
+    ("switch", ""),
+    ("bus coupler", ""),
+    ("BK", ""),
+    ("Human Machine Interface", ""),
+    ("Domain-Controller", ""),
+
+    # Test "Device Role" synonyms under restriction of the search space
+    ("SPS", "Device Role"),
+    ("io device", "Device Role"),
+    ("Firewall", "Device Role"),
+    ("switch", "Device Role"),
+    ("bus coupler", "Device Role"),
+]
+
 
 class StringSynonym:
     """
@@ -47,6 +97,49 @@ class StringSynonym:
                                file_name="string_synonym.py").logger
         self.df_dict = self._read_synonyms(find_file(synonyms_filename))
 
+    def footprint(self):
+        """
+        Retained memory of the synonym frame.
+
+        Build the object with utils.footprint.measure_construction(StringSynonym) to add the
+        allocations traced while loading.
+
+        Returns:
+            dict: bytes per structure (df_dict, other) and in total
+        """
+        return footprint_report(self, {"df_dict": self.df_dict})
+
+    def segment_content(self):
+        """
+        Flat content of the synonym frame for utils.shared_segment (e.g. string_snapshot.py).
+
+        Returns:
+            dict: string tables (index, columns and the cells row by row) and meta data
+        """
+        return {"strings": {"index": [str(ind) for ind in self.df_dict.index],
+                            "columns": [str(col) for col in self.df_dict.columns],
+                            "cells": [str(value) for value in self.df_dict.to_numpy().ravel()]},
+                "meta": {"component": "StringSynonym"}}
+
+    @classmethod
+    def from_segment(cls, segment):
+        """
+        Creates the object from a segment of segment_content without reading the yaml file.
+
+        Parameters:
+            segment (utils.shared_segment.Segment): segment (or view) with the synonym frame
+        Returns:
+            StringSynonym
+        """
+        synonym = cls.__new__(cls)
+        synonym.logger = LogStyle(module_name=cls.__name__, file_name="string_synonym.py").logger
+        index = segment.strings["index"].tolist()
+        columns = segment.strings["columns"].tolist()
+        cells = np.array(segment.strings["cells"].tolist(), dtype=object)
+        synonym.df_dict = pd.DataFrame(cells.reshape(len(index), len(columns)), index=index,
+                                       columns=columns)
+        return synonym
+
     def _read_synonyms(self, synonyms_path :str):
         '''Reads synonyms from an yaml file and returns a DataFrame.
 
@@ -134,6 +227,16 @@ class StringSynonym:
             str: The normalized string based on the specified dictionary.
             '' : if the test string is empty or no match is found in the dictionaries.
         """
+        if not METRICS.enabled:
+            return self._normalize(test_str, specific_dict_name)
+        with METRICS.timer("synonym_normalize", dictionary=specific_dict_name or "all"):
+            master_word = self._normalize(test_str, specific_dict_name)
+        METRICS.count("synonym_lookups", dictionary=specific_dict_name or "all",
+                      hit=bool(len(master_word)))
+        return master_word
+
+    def _normalize(self, test_str: str, specific_dict_name: str = ""):
+        """Lookup of normalize (without instrumentation)."""
         if not test_str:
             self.logger.warning("WARNING: No input string to normalize. ")
             return ""
@@ -148,9 +251,8 @@ class StringSynonym:
         elif len(match):
             self.logger.info(f"Use specific column {match[0]}. ")
             if match[0] == "Manufacturer":
-                data = pd.DataFrame({'vendor': [test_str], "vendor_modified": [""]})
-                return self._get_master_word_from_dictionary(PrecleaningVendor(data).result["vendor_modified"][0],
-                                                                               pd.DataFrame(self.df_dict[match[0]]))
+                return self._get_master_word_from_dictionary(normalize_vendor(test_str),
+                                                             pd.DataFrame(self.df_dict[match[0]]))
             else:
                 return self._get_master_word_from_dictionary(test_str,
                                                              pd.DataFrame(self.df_dict[match[0]]))
@@ -183,45 +285,5 @@ if __name__ == "__main__":
     # initialize the StringNormalizer class with default parameters
     sn = StringSynonym()
 
-    # Test self synonyms
-    test("Hersteller")
-    test("device role")
-    test("device-role")
-
-    #Test multiple hits
-    test("LS")
-    test("ge")
-
-    # Test "Manufacturer"
-    test("io device")
-    test("SIEMENS")
-    test("Phoenix Contact GmbH")
-    test("PxC")
-    test("Asea Brown Boveri")
-    test('Dräger')
-
-    # Test "Manufacturer" synonyms under restriction of the search space
-    test("SIEMENS", "Device Role")  # returns '' because of lookup in wrong search space
-    test("SIEMENS", "Manufacturer")
-    test("siemens.com", "Manufacturer")
-    test("Phoenix Contact GmbH", "Manufacturer")
-    test("PxC", "Manufacturer")
-    test("Asea Brown Boveri", "Manufacturer")
-
-    # Test "Device Role" synonyms
-    test("PLC")
-    test("SPS")
-    test("io device")
-    test("Firewall")
-    test("switch")
-    test("bus coupler")
-    test("BK")
-    test("Human Machine Interface")
-    test("Domain-Controller")
-
-    # Test "Device Role" synonyms under restriction of the search space
-    test("SPS", "Device Role")
-    test("io device", "Device Role")
-    test("Firewall", "Device Role")
-    test("switch", "Device Role")
-    test("bus coupler", "Device Role")
+    for case_str, case_dict in TEST_SYNONYM_CASES:
+        test(case_str, case_dict)
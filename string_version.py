@@ -0,0 +1,258 @@
+"""Module provides the parsing of versions into fixed-width keys and an interval index over
+version ranges.
+
+    A version is encoded as VERSION_PARTS unsigned 32-bit integers (big endian), which are
+    viewed as one fixed-width byte string. Byte strings of equal width compare like the integer
+    tuples, so a batch of versions is compared with numpy without parsing per pair.
+
+    Version ranges are read in the vers notation of CSAF product_version_range, e.g.
+    "vers:generic/>=1.2|<2.0", and in the short form "<V2.0". Every constraint is one
+    comparator and one version token, free text such as "all versions < V3.1" is not parsed.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from utils.log_class import LogStyle
+
+# Number of numeric parts of a version key (further parts are ignored)
+VERSION_PARTS = 6
+# Largest value of a version part (larger parts are saturated)
+VERSION_PART_MAX = np.iinfo(np.uint32).max
+# Data type of the packed version keys
+VERSION_KEY_DTYPE = f"S{4 * VERSION_PARTS}"
+# Key below all versions and key above all versions
+VERSION_MIN_KEY = np.zeros(VERSION_PARTS, dtype=">u4").view(VERSION_KEY_DTYPE)[0]
+VERSION_MAX_KEY = np.full(VERSION_PARTS, VERSION_PART_MAX, dtype=">u4").view(VERSION_KEY_DTYPE)[0]
+# Numeric parts of a version
+VERSION_NUMBERS = re.compile(r'\d+')
+# Prefix of the vers notation with the versioning scheme, e.g. vers:generic/
+VERS_PREFIX = re.compile(r'^vers:([^/]*)/', re.IGNORECASE)
+# Versioning scheme of ranges without vers prefix
+VERS_DEFAULT_SCHEME = "generic"
+# Comparator and version token (no whitespace, no further comparator) of a single constraint
+VERS_CONSTRAINT = re.compile(r'^\s*(>=|<=|!=|>|<|=)?\s*([^\s<>=!|]+)\s*$')
+# Version token of a constraint: numeric parts with an optional leading "V", versions with
+# letters (pre-releases such as 1.2.3-rc1, service packs) are rejected since their order
+# relative to the release is not known
+VERS_VERSION = re.compile(r'^[vV]?\d+(?:\.\d+)*$')
+# Wildcard of vers for all versions
+VERS_ALL = "*"
+# Minimum number of parts of the written versions per versioning scheme (semver needs
+# major.minor.patch)
+VERS_SCHEME_PARTS = {"semver": 3, "npm": 3}
+
+
+def version_parts(version: str):
+    """
+    Numeric parts of a version, e.g. "V3.2 SP1" -> (3, 2, 1).
+
+    Letters are dropped like in remove_letters_from_string of string_normalization.py.
+    Returns None if the version contains no number.
+    """
+    if not isinstance(version, str):
+        return None
+    parts = tuple(min(int(number), VERSION_PART_MAX)
+                  for number in VERSION_NUMBERS.findall(version)[:VERSION_PARTS])
+    return parts or None
+
+
+def encode_versions(versions):
+    """
+    Packed fixed-width keys of the versions.
+
+    Parameters:
+    - versions: iterable of version strings
+
+    Returns:
+    - keys: np.ndarray of VERSION_KEY_DTYPE, versions without number get VERSION_MIN_KEY
+    - valid: np.ndarray of bool, False for versions without number
+    """
+    versions = list(versions)
+    parts = np.zeros((len(versions), VERSION_PARTS), dtype=">u4")
+    valid = np.zeros(len(versions), dtype=bool)
+    for row, version in enumerate(versions):
+        numbers = version_parts(version)
+        if numbers:
+            parts[row, :len(numbers)] = numbers
+            valid[row] = True
+    return parts.view(VERSION_KEY_DTYPE).reshape(len(versions)), valid
+
+
+def decode_version(key, min_parts: int = 1):
+    """Dotted version of a packed key (trailing zero parts removed down to min_parts)."""
+    parts = list(np.frombuffer(key.ljust(4 * VERSION_PARTS, b"\0"), dtype=">u4"))
+    while len(parts) > min_parts and parts[-1] == 0:
+        parts.pop()
+    return ".".join(str(part) for part in parts)
+
+
+def parse_version_range(version_range: str):
+    """
+    Intervals of a version range in vers notation or short form.
+
+    The constraints are separated by "|", each is an optional comparator followed by one
+    version token of numeric parts (see VERS_VERSION). They are read in ascending order of
+    their versions:
+    ">=" and ">" open an interval, "<" and "<=" close it (an interval without lower bound
+    starts at the lowest version, one without upper bound ends at the highest), "=" adds a
+    single version and "!=" excludes a version. "*" covers all versions.
+
+    Returns:
+    - intervals: list of (lower key, upper key, lower inclusive, upper inclusive), None if
+      the range can not be parsed (e.g. free text or a version with letters)
+    - excluded: list of keys of the excluded versions
+    """
+    if not isinstance(version_range, str) or not version_range.strip():
+        return None
+    text = VERS_PREFIX.sub("", version_range.strip())
+    if text == VERS_ALL:
+        return [(VERSION_MIN_KEY, VERSION_MAX_KEY, True, True)], []
+    constraints = []
+    for constraint in text.split("|"):
+        match = VERS_CONSTRAINT.match(constraint)
+        if match is None or not VERS_VERSION.match(match.group(2)):
+            return None
+        comparator, version = match.groups()
+        constraints.append((encode_versions([version])[0][0], comparator or "="))
+    constraints.sort(key=lambda constraint: constraint[0])
+    intervals, excluded = [], []
+    lower = None
+    for key, comparator in constraints:
+        if comparator == "!=":
+            excluded.append(key)
+        elif comparator == "=":
+            if lower is None:
+                intervals.append((key, key, True, True))
+        elif comparator in (">=", ">"):
+            if lower is None:
+                lower = (key, comparator == ">=")
+        else:
+            lower_key, lower_inclusive = lower if lower else (VERSION_MIN_KEY, True)
+            intervals.append((lower_key, key, lower_inclusive, comparator == "<="))
+            lower = None
+    if lower is not None:
+        intervals.append((lower[0], VERSION_MAX_KEY, lower[1], True))
+    if not intervals and excluded:
+        intervals.append((VERSION_MIN_KEY, VERSION_MAX_KEY, True, True))
+    return intervals, excluded
+
+
+def normalize_version_range(version_range: str):
+    """
+    Version range in vers notation with dotted numeric versions, e.g. "<V2.0.1" ->
+    "vers:generic/<2.0.1". The versioning scheme of the input is kept ("generic" for the
+    short form). Returns None if the range can not be parsed.
+    """
+    parsed = parse_version_range(version_range)
+    if parsed is None:
+        return None
+    prefix = VERS_PREFIX.match(version_range.strip())
+    scheme = prefix.group(1).lower() if prefix and prefix.group(1) else VERS_DEFAULT_SCHEME
+    min_parts = VERS_SCHEME_PARTS.get(scheme, 1)
+    intervals, excluded = parsed
+    constraints = []
+    for lower, upper, lower_inclusive, upper_inclusive in intervals:
+        lower_version = decode_version(lower, min_parts)
+        if lower == upper:
+            constraints.append("=" + lower_version)
+            continue
+        if lower != VERSION_MIN_KEY or not lower_inclusive:
+            constraints.append((">=" if lower_inclusive else ">") + lower_version)
+        if upper != VERSION_MAX_KEY or not upper_inclusive:
+            constraints.append(("<=" if upper_inclusive else "<") + decode_version(upper,
+                                                                                   min_parts))
+    constraints.extend("!=" + decode_version(key, min_parts) for key in excluded)
+    return f"vers:{scheme}/" + ("|".join(constraints) or VERS_ALL)
+
+
+class VersionRangeIndex:
+    """
+    Interval index of the version ranges of flattened CSAF rows grouped by product.
+    """
+
+    def __init__(self, df_csaf: pd.DataFrame, product_columns: list = None,
+                 range_column: str = "product_version_range"):
+        """
+        Parses every distinct range once and stores the intervals per product as arrays.
+
+        Parameters:
+        - df_csaf: pd.DataFrame, flattened CSAF rows
+        - product_columns: list, columns identifying a product (default: vendor, product_name)
+        - range_column: str, column with the version ranges
+        """
+        self.logger = LogStyle(module_name=self.__class__.__name__,
+                               file_name="string_version.py").logger
+        self.product_columns = product_columns or ["vendor", "product_name"]
+        parsed = {}
+        groups = {}
+        unparsed = 0
+        products = zip(*(df_csaf[column] for column in self.product_columns))
+        for position, (product, version_range) in enumerate(zip(products,
+                                                                df_csaf[range_column])):
+            if not isinstance(version_range, str):
+                continue
+            if version_range not in parsed:
+                parsed[version_range] = parse_version_range(version_range)
+            if parsed[version_range] is None:
+                unparsed += 1
+                continue
+            intervals, excluded = parsed[version_range]
+            group = groups.setdefault(product, {"lower": [], "upper": [], "lower_inclusive": [],
+                                                "upper_inclusive": [], "position": [],
+                                                "excluded": []})
+            for lower, upper, lower_inclusive, upper_inclusive in intervals:
+                group["lower"].append(lower)
+                group["upper"].append(upper)
+                group["lower_inclusive"].append(lower_inclusive)
+                group["upper_inclusive"].append(upper_inclusive)
+                group["position"].append(position)
+                group["excluded"].append(tuple(excluded))
+        self.groups = {}
+        for product, group in groups.items():
+            self.groups[product] = {
+                "lower": np.array(group["lower"], dtype=VERSION_KEY_DTYPE),
+                "upper": np.array(group["upper"], dtype=VERSION_KEY_DTYPE),
+                "lower_inclusive": np.array(group["lower_inclusive"], dtype=bool),
+                "upper_inclusive": np.array(group["upper_inclusive"], dtype=bool),
+                "position": np.array(group["position"], dtype=np.int64),
+                "excluded": group["excluded"],
+            }
+        if unparsed:
+            self.logger.info(f"{unparsed} version ranges could not be parsed.")
+
+    def contains(self, product: tuple, versions):
+        """
+        Tests a batch of versions against all ranges of a product.
+
+        Parameters:
+        - product: tuple, values of the product_columns
+        - versions: iterable of version strings
+
+        Returns:
+        - result: np.ndarray of bool with one row per version and one column per interval
+          (False for versions without number)
+        - positions: np.ndarray, position of the CSAF row per interval
+        """
+        group = self.groups.get(product)
+        keys, valid = encode_versions(versions)
+        if group is None:
+            return np.zeros((len(keys), 0), dtype=bool), np.zeros(0, dtype=np.int64)
+        keys = keys[:, None]
+        above = np.where(group["lower_inclusive"], keys >= group["lower"], keys > group["lower"])
+        below = np.where(group["upper_inclusive"], keys <= group["upper"], keys < group["upper"])
+        result = above & below & valid[:, None]
+        for interval, excluded in enumerate(group["excluded"]):
+            for key in excluded:
+                result[:, interval] &= keys[:, 0] != key
+        return result, group["position"]
+
+    def affected(self, product: tuple, versions):
+        """
+        Positions of the CSAF rows whose range contains the version, per version.
+
+        Returns:
+        - affected: list of sorted position lists, one per version
+        """
+        result, positions = self.contains(product, versions)
+        return [sorted(set(positions[row].tolist())) for row in result]
@@ -0,0 +1,130 @@
+'''Memory footprint of loaded components (StringMiner, StringChecker, StringSynonym).
+
+deep_sizeof follows containers and object attributes and counts every object once.
+pandas objects are counted by memory_usage(deep=True), numpy arrays by nbytes (arrays on
+shared segments are not counted).
+measure_construction traces the allocations while a component is built with tracemalloc.
+'''
+import sys
+import mmap
+import types
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Objects which are not followed (shared by the whole process)
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType)
+# Number of allocation sites listed per construction trace
+DEFAULT_TRACE_TOP = 10
+
+
+def deep_sizeof(obj, seen: set = None):
+    '''
+    Retained size of obj in bytes including all referenced objects.
+
+    Parameter:
+        obj         object to measure
+        seen:set    ids of objects already counted, pass the same set to count shared
+                    objects of several structures only once
+    Return:
+        size in bytes
+    '''
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+        if isinstance(current, (pd.DataFrame, pd.Series)):
+            size += int(np.sum(current.memory_usage(deep=True))) + sys.getsizeof(object())
+            continue
+        if isinstance(current, pd.Index):
+            size += current.memory_usage(deep=True)
+            continue
+        if isinstance(current, np.ndarray):
+            # arrays on mapped segments (utils.shared_segment) are shared, not retained
+            shared = isinstance(current.base, (memoryview, mmap.mmap))
+            size += (0 if shared else current.nbytes) + sys.getsizeof(np.empty(0))
+            if current.dtype == object:
+                stack.extend(current.ravel().tolist())
+            continue
+        size += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, bytearray, int, float, complex, bool)):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        if hasattr(current, "__dict__"):
+            stack.append(vars(current))
+        for slot in getattr(type(current), "__slots__", ()):
+            if isinstance(slot, str) and hasattr(current, slot):
+                stack.append(getattr(current, slot))
+    return size
+
+
+def footprint_report(component, structures: dict, excluded: tuple = ("logger", "log")):
+    '''
+    Retained memory of a component broken down by its internal structures.
+
+    Parameter:
+        component           instance to measure
+        structures:dict     name of the structure -> object (e.g. {"regex_dict": ...})
+        excluded:tuple      attributes of the component which are not counted (shared
+                            loggers)
+    Return:
+        dict with the class name, the bytes per structure, the bytes of the remaining
+        attributes (other), the total and the construction trace if the component was built
+        by measure_construction
+    '''
+    seen = set()
+    for name in excluded:
+        if hasattr(component, name):
+            seen.add(id(getattr(component, name)))
+    seen.add(id(getattr(component, "_construction_trace", None)))
+    sizes = {name: deep_sizeof(structure, seen) for name, structure in structures.items()}
+    sizes["other"] = deep_sizeof(component, seen)
+    report = {"class": type(component).__name__, "structures_bytes": sizes,
+              "total_bytes": sum(sizes.values())}
+    if getattr(component, "_construction_trace", None) is not None:
+        report["construction"] = component._construction_trace
+    return report
+
+
+def measure_construction(factory, *args, top: int = DEFAULT_TRACE_TOP, **kwargs):
+    '''
+    Builds a component while tracing the allocations with tracemalloc.
+
+    The trace (memory retained and peak while building, largest allocation sites) is kept
+    at the component and added to its footprint().
+
+    Parameter:
+        factory     class or function building the component
+        top:int     number of allocation sites in the trace
+    Return:
+        component
+    '''
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    start_current, _ = tracemalloc.get_traced_memory()
+    component = factory(*args, **kwargs)
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    if not was_tracing:
+        tracemalloc.stop()
+    statistics = after.compare_to(before, "lineno")
+    component._construction_trace = {
+        "retained_bytes": current - start_current,
+        "peak_bytes": peak - start_current,
+        "top": [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_bytes": stat.size_diff, "count": stat.count_diff}
+                for stat in statistics[:top]],
+    }
+    return component
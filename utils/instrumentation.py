@@ -0,0 +1,179 @@
+'''Opt-in timers and counters of the String-Atlas modules.
+
+The modules report stage times and counts to the registry METRICS. Collection is switched
+on by the environment variable STRING_ATLAS_METRICS (or METRICS.enable()). If it is off,
+timer() returns a shared no-op context manager and count()/observe() return immediately,
+so the instrumented code pays one attribute lookup per call.
+
+If STRING_ATLAS_METRICS_FILE is set, collection is switched on and the registry is written
+to this file at exit (.prom for the Prometheus text format, JSON otherwise).
+
+    from utils.instrumentation import METRICS
+    METRICS.enable()
+    ...
+    print(METRICS.to_prometheus())
+'''
+import os
+import json
+import time
+import atexit
+import threading
+from functools import wraps
+from contextlib import contextmanager, nullcontext
+
+# Environment variable switching the collection on ("1", "true", "yes", "on")
+METRICS_ENV = "STRING_ATLAS_METRICS"
+# Environment variable with the file the registry is written to at exit
+METRICS_FILE_ENV = "STRING_ATLAS_METRICS_FILE"
+# Prefix of the metric names in the Prometheus text format
+PROMETHEUS_PREFIX = "string_atlas_"
+# Shared context manager of disabled timers
+_NO_TIMER = nullcontext()
+
+
+def _labels_key(labels: dict):
+    '''Hashable and ordered key of the labels.'''
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _prometheus_labels(labels: tuple):
+    '''Labels in the Prometheus text format, e.g. {stage="phrases"}.'''
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class MetricsRegistry:
+    '''Thread safe registry of timers (count, sum and max of seconds) and counters.'''
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+
+    def enable(self):
+        '''Switch the collection on.'''
+        self.enabled = True
+
+    def disable(self):
+        '''Switch the collection off, collected values are kept.'''
+        self.enabled = False
+
+    def reset(self):
+        '''Remove all collected values.'''
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+
+    def observe(self, name: str, seconds: float, **labels):
+        '''Add a measured duration to the timer name with the given labels.'''
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                self.timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def count(self, name: str, value: int = 1, **labels):
+        '''Increase the counter name with the given labels.'''
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def timer(self, name: str, **labels):
+        '''Context manager measuring the time of its block (no-op if disabled).
+
+            with METRICS.timer("vendor_stage", stage="phrases"):
+                ...
+        '''
+        if not self.enabled:
+            return _NO_TIMER
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        '''Decorator measuring every call of a function.'''
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timer(name, labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        '''Collected values as dict with the lists timers and counters.'''
+        with self._lock:
+            timers = [{"name": name, "labels": dict(labels), "count": count,
+                       "sum_seconds": total, "max_seconds": maximum}
+                      for (name, labels), (count, total, maximum) in sorted(self.timers.items())]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {"timers": timers, "counters": counters}
+
+    def to_json(self, indent: int = 2):
+        '''Collected values as JSON string.'''
+        return json.dumps(self.snapshot(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self):
+        '''Collected values in the Prometheus text format. A timer is written as summary
+        (<name>_seconds_count, _sum and a gauge _max), a counter as <name>_total.'''
+        lines = []
+        with self._lock:
+            timers = sorted(self.timers.items())
+            counters = sorted(self.counters.items())
+        written = set()
+        for (name, labels), (count, total, maximum) in timers:
+            metric = f"{PROMETHEUS_PREFIX}{name}_seconds"
+            if metric not in written:
+                written.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count{_prometheus_labels(labels)} {count}")
+            lines.append(f"{metric}_sum{_prometheus_labels(labels)} {total}")
+        for (name, labels), (count, total, maximum) in timers:
+            metric = f"{PROMETHEUS_PREFIX}{name}_seconds_max"
+            if metric not in written:
+                written.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{_prometheus_labels(labels)} {maximum}")
+        for (name, labels), value in counters:
+            metric = f"{PROMETHEUS_PREFIX}{name}_total"
+            if metric not in written:
+                written.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        '''Write the collected values to path, Prometheus text format for .prom files,
+        JSON otherwise.'''
+        content = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+
+METRICS = MetricsRegistry(
+    enabled=os.environ.get(METRICS_ENV, "").lower() in ("1", "true", "yes", "on")
+    or bool(os.environ.get(METRICS_FILE_ENV)))
+if os.environ.get(METRICS_FILE_ENV):
+    atexit.register(METRICS.dump, os.environ[METRICS_FILE_ENV])
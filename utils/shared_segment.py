@@ -0,0 +1,357 @@
+'''Flat read-only segments of strings and arrays, shared by processes without copying.
+
+A segment is built once (e.g. in the parent of a process pool) from string lists and numpy
+arrays and placed in shared memory or in a file. Workers attach to it (shared memory by
+name, files by mmap) and read the strings and arrays directly from the mapped pages, so
+adding workers does not add copies of the data.
+
+Layout (little endian, sections aligned to 8 bytes):
+
+    magic b"SATLSEG\\0" | uint32 format version | uint32 header length | header (json)
+    | sections
+
+The header lists every string table (count, position of the uint64 offset array and of
+the UTF-8 data), every array (dtype, shape, position) and the meta data of the builder.
+A string table listed in indexes gets an open addressing hash table (<name>#slots), so
+StringIndex finds a string in O(1) without building a dict in the worker.
+
+    segment = create_shared_segment({"words": words}, {"counts": counts}, indexes=["words"])
+    # worker
+    view = Segment.from_shared_memory(segment.name)
+    count = view.arrays["counts"][view.index("words").find("Siemens")]
+'''
+import os
+import json
+import mmap
+import zlib
+from collections.abc import Mapping
+from multiprocessing import shared_memory
+import numpy as np
+
+# Magic bytes at the start of every segment
+SEGMENT_MAGIC = b"SATLSEG\0"
+# Version of the layout, segments of other versions are rejected
+SEGMENT_FORMAT_VERSION = 1
+# Alignment of the sections in bytes
+ALIGNMENT = 8
+# Suffix of the hash slots of an indexed string table
+INDEX_SUFFIX = "#slots"
+# Slots per key of the hash tables (load factor <= 0.5)
+INDEX_SLOTS_PER_KEY = 2
+# Size of magic, version and header length in bytes
+_PREFIX_SIZE = len(SEGMENT_MAGIC) + 8
+
+
+def _aligned(position: int):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def _fast_view(array: np.ndarray):
+    '''Memoryview of an integer array, indexing it is several times faster than indexing
+    the numpy array. The array itself on big endian machines.'''
+    if not array.dtype.isnative:
+        return array
+    return memoryview(array).cast("B").cast(array.dtype.char)
+
+
+def _hash(data: bytes):
+    '''Hash of a UTF-8 string, equal in all processes (unlike hash()).'''
+    return zlib.crc32(data)
+
+
+class StringTable:
+    '''Read-only sequence of strings stored as UTF-8 data and an offset array.'''
+
+    def __init__(self, offsets: np.ndarray, data: memoryview) -> None:
+        self.offsets = offsets
+        self.data = data
+        self._offsets = _fast_view(offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i: int):
+        '''UTF-8 bytes of the i-th string (a view, no copy).'''
+        return self.data[self._offsets[i]:self._offsets[i + 1]]
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.raw(i), "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield str(self.raw(i), "utf-8")
+
+    def tolist(self):
+        return list(self)
+
+
+class StringIndex:
+    '''Hash index of a string table (positions of the strings by value).'''
+
+    def __init__(self, table: StringTable, slots: np.ndarray) -> None:
+        self.table = table
+        self.slots = slots
+        self.mask = len(slots) - 1
+        self._slots = _fast_view(slots)
+
+    def find(self, key: str):
+        '''Position of key in the table or -1.'''
+        if not isinstance(key, str):
+            return -1
+        encoded = key.encode("utf-8")
+        slots = self._slots
+        offsets = self.table._offsets  # pylint: disable=protected-access
+        data = self.table.data
+        slot = _hash(encoded) & self.mask
+        while True:
+            position = slots[slot]
+            if position < 0:
+                return -1
+            if data[offsets[position]:offsets[position + 1]] == encoded:
+                return position
+            slot = (slot + 1) & self.mask
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        return iter(self.table)
+
+
+class SegmentCounter(Mapping):
+    '''Read-only mapping string -> count of an indexed string table and a count array.
+
+    Like collections.Counter, missing keys have the count 0.
+    '''
+
+    def __init__(self, index: StringIndex, counts: np.ndarray) -> None:
+        self.index = index
+        self.counts = counts
+
+    def __getitem__(self, key):
+        position = self.index.find(key)
+        return int(self.counts[position]) if position >= 0 else 0
+
+    def __contains__(self, key):
+        return self.index.find(key) >= 0
+
+    def __iter__(self):
+        return iter(self.index.table)
+
+    def __len__(self):
+        return len(self.index)
+
+
+def build_index_slots(strings: list):
+    '''Open addressing hash table (linear probing) of the positions of unique strings.'''
+    size = 1
+    while size < max(len(strings) * INDEX_SLOTS_PER_KEY, 1):
+        size *= 2
+    slots = np.full(size, -1, dtype=np.int64)
+    mask = size - 1
+    for position, string in enumerate(strings):
+        slot = _hash(string.encode("utf-8")) & mask
+        while slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        slots[slot] = position
+    return slots
+
+
+def _sections(strings: dict, arrays: dict, meta: dict, indexes: list):
+    '''Header and sections (position, bytes-like) of a segment.'''
+    arrays = dict(arrays or {})
+    for name in indexes or []:
+        if len(set(strings[name])) != len(strings[name]):
+            raise ValueError(f"Indexed string table {name} contains duplicates.")
+        arrays[name + INDEX_SUFFIX] = build_index_slots(strings[name])
+    parts = []
+    for name, values in (strings or {}).items():
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        parts.append(("strings", name, offsets, b"".join(encoded)))
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise TypeError(f"Array {name} has dtype object, store strings as string table.")
+        parts.append(("arrays", name, array.astype(array.dtype.newbyteorder("<")), None))
+
+    # positions in the header are relative to the end of the header, so they do not
+    # depend on its length
+    header = {"meta": meta or {}, "strings": {}, "arrays": {}}
+    position = 0
+    sections = []
+    for kind, name, first, second in parts:
+        if kind == "strings":
+            header["strings"][name] = {"count": len(first) - 1, "offsets": position,
+                                       "data": _aligned(position + first.nbytes),
+                                       "nbytes": len(second)}
+            sections.append((position, first))
+            position = _aligned(position + first.nbytes)
+            sections.append((position, second))
+            position = _aligned(position + len(second))
+        else:
+            header["arrays"][name] = {"dtype": first.dtype.str, "shape": list(first.shape),
+                                      "offset": position}
+            sections.append((position, first))
+            position = _aligned(position + first.nbytes)
+    encoded_header = json.dumps(header).encode("utf-8")
+    base = _aligned(_PREFIX_SIZE + len(encoded_header))
+    prefix = (SEGMENT_MAGIC + SEGMENT_FORMAT_VERSION.to_bytes(4, "little")
+              + len(encoded_header).to_bytes(4, "little") + encoded_header)
+    return [(0, prefix)] + [(base + pos, part) for pos, part in sections], base + position
+
+
+def _write_sections(buffer, sections: list):
+    for position, part in sections:
+        data = part.tobytes() if isinstance(part, np.ndarray) else part
+        buffer[position:position + len(data)] = data
+
+
+def create_shared_segment(strings: dict, arrays: dict = None, meta: dict = None,
+                          indexes: list = None, name: str = None):
+    '''
+    Build a segment in a new shared memory block.
+
+    Parameter:
+        strings:dict    name -> list of str
+        arrays:dict     name -> numpy array (no object dtype)
+        meta:dict       json serializable data of the builder
+        indexes:list    names of string tables (unique strings) to index
+        name:str        name of the block, a random name if None
+    Return:
+        multiprocessing.shared_memory.SharedMemory, the creator has to close() and
+        unlink() it when the workers are finished
+    '''
+    sections, size = _sections(strings, arrays, meta, indexes)
+    block = shared_memory.SharedMemory(name=name, create=True, size=size)
+    _write_sections(block.buf, sections)
+    return block
+
+
+def write_segment_file(path: str, strings: dict, arrays: dict = None, meta: dict = None,
+                       indexes: list = None):
+    '''Build a segment in a file (see create_shared_segment), the file is replaced
+    atomically.'''
+    sections, size = _sections(strings, arrays, meta, indexes)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.truncate(size)
+        for position, part in sections:
+            file.seek(position)
+            file.write(part.tobytes() if isinstance(part, np.ndarray) else part)
+    os.replace(temp_path, path)
+    return path
+
+
+def _attach_shared_memory(name: str):
+    '''Attach to a block without handing it to the resource tracker (Python >= 3.13).
+    Before, workers of a pool share the resource tracker of their parent, so the block is
+    unlinked by the creator only.'''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class Segment:
+    '''Attached segment with the string tables (strings), arrays and meta data.
+
+    Use Segment.from_shared_memory(name) or Segment.from_file(path).
+    '''
+
+    def __init__(self, buffer, owner=None) -> None:
+        self._owner = owner
+        self._buffer = memoryview(buffer)
+        if bytes(self._buffer[:len(SEGMENT_MAGIC)]) != SEGMENT_MAGIC:
+            raise ValueError("Buffer is no String-Atlas segment.")
+        version = int.from_bytes(self._buffer[8:12], "little")
+        if version != SEGMENT_FORMAT_VERSION:
+            raise ValueError(f"Segment format version {version} is not supported "
+                             f"(expected {SEGMENT_FORMAT_VERSION}).")
+        length = int.from_bytes(self._buffer[12:16], "little")
+        self.header = json.loads(bytes(self._buffer[_PREFIX_SIZE:_PREFIX_SIZE + length]))
+        base = _aligned(_PREFIX_SIZE + length)
+        self.meta = self.header["meta"]
+        self.strings = {}
+        self.arrays = {}
+        for name, table in self.header["strings"].items():
+            offsets = np.frombuffer(self._buffer, dtype="<u8", count=table["count"] + 1,
+                                    offset=base + table["offsets"])
+            data = self._buffer[base + table["data"]:base + table["data"] + table["nbytes"]]
+            self.strings[name] = StringTable(offsets, data)
+        for name, array in self.header["arrays"].items():
+            count = int(np.prod(array["shape"]))
+            self.arrays[name] = np.frombuffer(self._buffer, dtype=array["dtype"], count=count,
+                                              offset=base + array["offset"]
+                                              ).reshape(array["shape"])
+
+    @classmethod
+    def from_shared_memory(cls, name: str):
+        block = _attach_shared_memory(name)
+        # the segment keeps the mapping of the block and the block is closed, otherwise its
+        # finalizer fails while views of the segment are still in use
+        mapped = block._mmap  # pylint: disable=protected-access
+        block._buf.release()  # pylint: disable=protected-access
+        block._buf = block._mmap = None  # pylint: disable=protected-access
+        block.close()
+        return cls(mapped, mapped)
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    def view(self, prefix: str, meta: dict = None):
+        '''Segment of the string tables and arrays whose names start with prefix (without
+        the prefix), e.g. the part of one component in a segment of several components.
+
+        Parameter:
+            prefix:str      prefix of the names, e.g. "miner/"
+            meta:dict       meta data of the view, the meta data of the segment if None
+        '''
+        view = Segment.__new__(Segment)
+        view._owner = None
+        view._buffer = None
+        view.header = self.header
+        view.meta = self.meta if meta is None else meta
+        view.strings = {name[len(prefix):]: table for name, table in self.strings.items()
+                        if name.startswith(prefix)}
+        view.arrays = {name[len(prefix):]: array for name, array in self.arrays.items()
+                       if name.startswith(prefix)}
+        return view
+
+    def index(self, name: str):
+        '''Hash index of an indexed string table.'''
+        return StringIndex(self.strings[name], self.arrays[name + INDEX_SUFFIX])
+
+    def counter(self, name: str, counts: str):
+        '''Read-only mapping of an indexed string table to the values of an array.'''
+        return SegmentCounter(self.index(name), self.arrays[counts])
+
+    @property
+    def nbytes(self):
+        return len(self._buffer) if self._buffer is not None else 0
+
+    def close(self):
+        '''Detach from the segment. Strings, arrays and indexes taken from the segment
+        must be released before, otherwise the mapping stays open until they are.'''
+        self.strings = {}
+        self.arrays = {}
+        if self._buffer is None:  # view of another segment
+            return
+        try:
+            self._buffer.release()
+            if self._owner is not None:
+                self._owner.close()
+        except BufferError:
+            pass
+        self._owner = None
@@ -0,0 +1,320 @@
+"""Module provides a polling watcher for the continuous ingestion of a CSAF directory.
+
+    The directory is scanned every --interval seconds (os.scandir, modification time and
+    size per file, no OS specific notification API). New or changed json files (plain or
+    compressed) are ingested once their signature has not changed for --debounce seconds,
+    so files still being written or synchronized in bursts are read once.
+
+    Ready files are collected into batches of at most --max-batch files. A batch is started
+    as soon as no other file is settling, at the latest --max-latency seconds after its
+    first file became ready. The batch is parsed and flattened by process_csaf_sources in a
+    process pool (off the event loop) and appended to the parquet store by
+    write_csaf_store. One batch is processed at a time, the scanning goes on meanwhile.
+
+    Files of a failed batch are not recorded as ingested, they are ready again after
+    --retry-backoff seconds, doubled with every further failure up to MAX_RETRY_BACKOFF
+    (at once if they change meanwhile).
+
+    The signatures of the ingested files are kept in the state file (--state), so a
+    restarted watcher only ingests files added or changed in between. Changed documents
+    are appended again, the store keeps the rows of the former revision as well.
+
+    python watch_csaf_files.py <path to directory> --store <path to store> --state watch.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from process_csaf_files import is_json_source, process_csaf_sources, write_csaf_store
+from process_csaf_files import DEFAULT_STORE_PATH
+from utils.string_helperfunctions import LogStyle
+from utils.instrumentation import METRICS
+
+# Seconds between two scans of the directory
+DEFAULT_POLL_INTERVAL = 2.0
+# Seconds the signature of a file has to be unchanged before it is ingested
+DEFAULT_DEBOUNCE = 1.0
+# Maximum seconds between a file being ready and the start of its batch
+DEFAULT_MAX_LATENCY = 10.0
+# Maximum number of files per batch
+DEFAULT_MAX_BATCH = 500
+# Number of worker processes flattening a batch
+DEFAULT_WORKERS = 2
+# Seconds before the files of a failed batch are ready again (doubled per failure)
+DEFAULT_RETRY_BACKOFF = 30.0
+# Maximum seconds before the files of a failed batch are ready again
+MAX_RETRY_BACKOFF = 3600.0
+
+
+def scan_directory(directory: str):
+    '''Signatures of all json files below directory.
+
+    Return:
+        dict path -> (modification time in ns, size in bytes)
+    '''
+    signatures = {}
+    stack = [directory]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except (FileNotFoundError, PermissionError, NotADirectoryError):
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and is_json_source(entry.name):
+                    stat = entry.stat()
+                    signatures[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                # removed between listing and stat
+                continue
+    return signatures
+
+
+def flatten_files(file_paths: list):
+    '''Parse and flatten the given CSAF files (run in the worker processes).'''
+    sources = pd.DataFrame({'path': file_paths,
+                            'file': [os.path.basename(path) for path in file_paths]})
+    return process_csaf_sources(sources)
+
+
+class CsafWatcher:
+    '''Polls a directory and appends new or changed CSAF documents to the parquet store.
+
+    Parameter:
+        directory:str           directory of the CSAF mirror
+        store_path:str          parquet store of write_csaf_store
+        state_path:str          json file with the signatures of the ingested files,
+                                nothing is kept between runs if None
+        poll_interval:float     seconds between two scans
+        debounce:float          seconds a file has to be unchanged before it is ingested
+        max_latency:float       maximum seconds between a file being ready and its batch
+        max_batch:int           maximum number of files per batch
+        workers:int             number of worker processes
+        retry_backoff:float     seconds before the files of a failed batch are ready again
+        ingest_existing:bool    ingest the files found by the first scan, otherwise they
+                                are only recorded (e.g. the store is already built by a
+                                full run of process_csaf_sources)
+    '''
+
+    def __init__(self, directory: str, store_path: str = DEFAULT_STORE_PATH,
+                 state_path: str = None, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 debounce: float = DEFAULT_DEBOUNCE, max_latency: float = DEFAULT_MAX_LATENCY,
+                 max_batch: int = DEFAULT_MAX_BATCH, workers: int = DEFAULT_WORKERS,
+                 retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+                 ingest_existing: bool = True) -> None:
+        formatting = "[%(asctime)s - %(levelname)s - watch_csaf_files  %(funcName)s] %(message)s"
+        self.log = LogStyle(formatting)
+        self.directory = os.path.normpath(directory)
+        self.store_path = store_path
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self.workers = workers
+        self.retry_backoff = retry_backoff
+        self.ingest_existing = ingest_existing
+        # path -> signature of the ingested files
+        self.ingested = self._load_state()
+        # path -> (signature, time since the signature is unchanged) of changed files
+        self.settling = {}
+        # path -> (signature, time the file became ready), in the order of readiness
+        self.ready = {}
+        # path -> (signature, number of failures, time of the next try or None if ready
+        # again) of the files of failed batches
+        self.failed = {}
+        self.batches = 0
+        self.rows = 0
+        self._first_scan = not self.ingested
+        self._stop = None
+        self._batch_task = None
+        self._pool = None
+
+    def _load_state(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, encoding="utf-8") as file:
+            return {path: tuple(signature) for path, signature in json.load(file).items()}
+
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.ingested, file)
+        os.replace(temp_path, self.state_path)
+
+    def update(self, signatures: dict, now: float):
+        '''Compare a scan with the known files and move settled files to ready.
+
+        Parameter:
+            signatures:dict     result of scan_directory
+            now:float           time of the scan (time.monotonic)
+        '''
+        if self._first_scan:
+            self._first_scan = False
+            if not self.ingest_existing:
+                self.ingested.update(signatures)
+                self._save_state()
+                self.log.logger.info("%s existing files recorded, not ingested.",
+                                     len(signatures))
+                return
+        for path, signature in signatures.items():
+            if self.ingested.get(path) == signature:
+                continue
+            if path in self.ready:
+                if self.ready[path][0] == signature:
+                    continue
+                # changed again before its batch started
+                del self.ready[path]
+            if path in self.failed:
+                if self.failed[path][0] == signature:
+                    continue
+                # changed after a failed batch, ingested like a new revision
+                del self.failed[path]
+            settled = self.settling.get(path)
+            if settled is None or settled[0] != signature:
+                if settled is None:
+                    METRICS.count("watcher_files",
+                                  status="changed" if path in self.ingested else "new")
+                self.settling[path] = (signature, now)
+        for path in [path for path in self.settling if path not in signatures]:
+            # removed while settling
+            del self.settling[path]
+        for path, (signature, failures, retry_at) in list(self.failed.items()):
+            if path not in signatures:
+                del self.failed[path]
+            elif retry_at is not None and now >= retry_at:
+                # queued for the retry, the next failure sets the time of the next try
+                self.failed[path] = (signature, failures, None)
+                self.ready[path] = (signature, now)
+        for path, (signature, since) in list(self.settling.items()):
+            if now - since >= self.debounce:
+                del self.settling[path]
+                self.ready[path] = (signature, now)
+
+    def next_batch(self, now: float):
+        '''Ready files to ingest now, an empty list if the batch should wait.'''
+        if not self.ready:
+            return []
+        oldest = next(iter(self.ready.values()))[1]
+        if (len(self.ready) < self.max_batch and self.settling
+                and now - oldest < self.max_latency):
+            return []
+        batch = list(self.ready.items())[:self.max_batch]
+        for path, _ in batch:
+            del self.ready[path]
+        return batch
+
+    async def ingest(self, batch: list):
+        '''Flatten the files of a batch in the pool and append them to the store.'''
+        loop = asyncio.get_running_loop()
+        paths = [path for path, _ in batch]
+        start = time.perf_counter()
+        try:
+            chunk_size = -(-len(paths) // self.workers)
+            frames = await asyncio.gather(*[
+                loop.run_in_executor(self._pool, flatten_files, paths[i:i + chunk_size])
+                for i in range(0, len(paths), chunk_size)])
+            frames = [frame for frame in frames if not frame.empty]
+            if frames:
+                df = pd.concat(frames, ignore_index=True)
+                await loop.run_in_executor(None, write_csaf_store, df, self.store_path)
+                self.rows += len(df)
+        except Exception as e:  # pylint: disable=broad-except
+            duration = time.perf_counter() - start
+            METRICS.observe("watcher_batch", duration)
+            METRICS.count("watcher_batches", status="failed")
+            self._retry_later(batch)
+            self.log.logger.error("Batch of %s files could not be ingested: %s", len(paths), e)
+            return
+        duration = time.perf_counter() - start
+        METRICS.observe("watcher_batch", duration)
+        METRICS.count("watcher_batches", status="ingested")
+        self.batches += 1
+        for path, (signature, _) in batch:
+            self.ingested[path] = signature
+            self.failed.pop(path, None)
+        await loop.run_in_executor(None, self._save_state)
+        self.log.logger.info("%s files ingested in %.2f s.", len(paths), duration)
+
+    def _retry_later(self, batch: list):
+        '''Keep the files of a failed batch for a retry after the backoff.'''
+        now = time.monotonic()
+        for path, (signature, _) in batch:
+            previous = self.failed.get(path)
+            failures = previous[1] + 1 if previous and previous[0] == signature else 1
+            backoff = min(self.retry_backoff * 2 ** (failures - 1), MAX_RETRY_BACKOFF)
+            self.failed[path] = (signature, failures, now + backoff)
+
+    async def poll_once(self):
+        '''Scan the directory once and start the next batch if no batch is running.'''
+        loop = asyncio.get_running_loop()
+        signatures = await loop.run_in_executor(None, scan_directory, self.directory)
+        self.update(signatures, time.monotonic())
+        if self._batch_task is not None and self._batch_task.done():
+            self._batch_task = None
+        if self._batch_task is None:
+            batch = self.next_batch(time.monotonic())
+            if batch:
+                self._batch_task = asyncio.create_task(self.ingest(batch))
+
+    async def run(self):
+        '''Poll until stop() is called, the running batch is finished before returning.'''
+        self._stop = asyncio.Event()
+        self._pool = ProcessPoolExecutor(self.workers)
+        self.log.logger.info("Watching %s every %s s.", self.directory, self.poll_interval)
+        try:
+            while not self._stop.is_set():
+                await self.poll_once()
+                try:
+                    await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if self._batch_task is not None:
+                await self._batch_task
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+
+    def stop(self):
+        '''Stop the polling (call from the event loop).'''
+        if self._stop is not None:
+            self._stop.set()
+
+
+def main(argv: list = None):
+    """Command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(description="Continuous ingestion of a CSAF directory.")
+    parser.add_argument("directory", help="directory of the CSAF files")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="parquet store")
+    parser.add_argument("--state", help="json file with the signatures of the ingested files")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE)
+    parser.add_argument("--max-latency", type=float, default=DEFAULT_MAX_LATENCY)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--retry-backoff", type=float, default=DEFAULT_RETRY_BACKOFF)
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="only record the files found at start")
+    args = parser.parse_args(argv)
+    watcher = CsafWatcher(args.directory, args.store, args.state, args.interval, args.debounce,
+                          args.max_latency, args.max_batch, args.workers, args.retry_backoff,
+                          ingest_existing=not args.skip_existing)
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        pass
+    print(f"{watcher.batches} batches with {watcher.rows} rows written to {args.store}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())